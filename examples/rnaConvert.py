@@ -14,6 +14,8 @@
 
 import forgi.graph.bulge_graph as fgb
 import forgi.utilities.commandline_utils as fuc
+import forgi.threedee.utilities.atom_array as ftuaa
+import forgi.threedee.utilities.graph_pdb as ftug
 import forgi.threedee.utilities.pdb as ftup
 
 log = logging.getLogger(__name__)
@@ -38,6 +40,9 @@ def bg_to_elem_string(cg):
 
 
 def to_pdb(cg):
+    if not cg.chains:
+        # No all-atom structure (e.g. a *.cg file). Export the virtual atoms.
+        return ftuaa.to_pdb_string(ftug.virtual_atom_array(cg))
     chains = ftup.rename_chains_for_pdb(cg.chains)
     f = StringIO()
     ftup.output_multiple_chains(chains.values(), f, "pdb")
@@ -2,6 +2,14 @@
 Code for reading and writing the forgi configuration files.
 
 To configure forgi, run forgi_config.py
+
+Besides the keys in ALLOWED_KEY_VALUES, the following keys are used:
+
+* CACHE_DIR: The directory used for caching (e.g. of PDB annotations).
+  Defaults to the user cache directory.
+* ANNOTATION_CACHE_SIZE: The maximal size of the annotation cache in MB.
+  0 disables the cache. The environment variable FORGI_ANNOTATION_CACHE_SIZE
+  takes precedence over this value.
 """
 
 
@@ -44,3 +52,13 @@ def read_config():
             log.debug("Reading configuration from {}".format(filename))
             config.update(conf)
     return config
+
+
+def get_cache_dir():
+    """
+    The directory forgi uses for caching.
+
+    :returns: The value of "CACHE_DIR" in the configuration or
+              the user cache directory.
+    """
+    return read_config().get("CACHE_DIR", dirs.user_cache_dir)
@@ -12,4 +12,8 @@
 functions built on top of the before mentioned functions, responsible for calculating the optimal 
 alignment of a CoarseGrainRNA and an image, so that the Hausdorff distance between the projection
 of the RNA and the image is minimal.
+
+The module forgi.projection.features calculates descriptors of the projections
+of many RNAs in many directions and stores them in a table, which can be used
+to discard candidates before the Hausdorff distance based fitting.
 """
@@ -0,0 +1,202 @@
+"""
+Descriptors of 2D projections of many RNAs in many projection directions.
+
+Fitting a CoarseGrainRNA to an image with the Hausdorff distance
+(see forgi.projection.hausdorff) is expensive. The descriptors of the
+projections (the longest axis, the number of branchpoints, ...) are
+cheap to compare, so they can be used to discard candidates before the fit.
+
+`extract_features` calculates the descriptors for every pair of RNA and
+projection direction and returns them as a `FeatureTable`, which can be
+stored in a compressed numpy file::
+
+    table = extract_features(filenames, num_directions=40, processes=4)
+    table.save("features.npz")
+    ...
+    table = FeatureTable.load("features.npz")
+    rna_index, direction_index = np.nonzero(
+        table.mask(longest_axis=(80, 100), branchpoint_count=(2, 4)))
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import logging
+import multiprocessing
+
+import numpy as np
+
+import forgi.threedee.model.coarse_grain as ftmc
+from . import hausdorff as fph
+from . import projection2d as fpp
+
+log = logging.getLogger(__name__)
+
+__all__ = ["FEATURES", "projection_features", "extract_features", "FeatureTable"]
+
+#: The names of the descriptors, in the order of the last axis of
+#: FeatureTable.features
+FEATURES = ("longest_axis", "branchpoint_count", "cyclebasis_len",
+            "total_length", "longest_arm_length")
+
+
+def projection_features(proj, condense=None):
+    """
+    The descriptors of a single projection.
+
+    :param proj: A Projection2D object. If condense is given,
+                 it is condensed in place.
+    :param condense: None or the cutoff for `Projection2D.condense`
+    :returns: An array with the values in the order of FEATURES.
+              Descriptors that are not defined for the projection
+              (e.g. the longest arm, if there are no leaves) are NaN.
+    """
+    if condense:
+        proj.condense(condense)
+    try:
+        longest_arm = proj.get_longest_arm_length()[0]
+    except ValueError:  # No leaf nodes
+        longest_arm = float("nan")
+    return np.array([proj.longest_axis, proj.get_branchpoint_count(),
+                     proj.get_cyclebasis_len(), proj.get_total_length(),
+                     longest_arm])
+
+
+def _cg_features(cg, directions, condense, virtual_atoms):
+    """
+    :param directions: Projection directions as carthesian vectors
+    :returns: An array of shape (len(directions), len(FEATURES))
+    """
+    projector = fpp.Projector(cg, project_virtual_atoms=virtual_atoms)
+    features = np.empty((len(directions), len(FEATURES)))
+    for i, proj in enumerate(projector.projections(directions)):
+        features[i] = projection_features(proj, condense)
+    return features
+
+
+def _features_job(job):
+    cg, cg_string, directions, condense, virtual_atoms = job
+    if cg_string is not None:
+        cg = ftmc.CoarseGrainRNA.from_bg_string(cg_string)
+    elif not isinstance(cg, ftmc.CoarseGrainRNA):
+        cg = ftmc.CoarseGrainRNA.from_bg_file(cg)
+    return cg.name, _cg_features(cg, directions, condense, virtual_atoms)
+
+
+def extract_features(cgs, num_directions=40, condense=None, virtual_atoms=False,
+                     processes=1):
+    """
+    Calculate the descriptors of the projections of all RNAs in all
+    projection directions returned by `hausdorff.get_start_points`.
+
+    :param cgs: A sequence of CoarseGrainRNA objects or filenames of cg files.
+                Use filenames for many RNAs, so they are loaded in the
+                worker processes.
+    :param num_directions: Passed to `forgi.projection.hausdorff.get_start_points`
+    :param condense: None or the cutoff for `Projection2D.condense`,
+                     applied to every projection before the descriptors are
+                     calculated.
+    :param virtual_atoms: Passed to Projection2D as project_virtual_atoms.
+                          Only the longest axis depends on it.
+    :param processes: The number of worker processes. None for the number of CPUs.
+    :returns: A FeatureTable
+    """
+    directions = np.array(fph.get_start_points(num_directions)).reshape((-1, 2))
+    carthesian = np.array([fph.from_polar([1] + list(direction))
+                           for direction in directions]).reshape((-1, 3))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes == 1:
+        results = [_features_job((cg, None, carthesian, condense, virtual_atoms))
+                   for cg in cgs]
+    else:
+        # CoarseGrainRNA objects cannot be pickled, so we send the cg string.
+        jobs = ((None, cg.to_cg_string(), carthesian, condense, virtual_atoms)
+                if isinstance(cg, ftmc.CoarseGrainRNA)
+                else (cg, None, carthesian, condense, virtual_atoms)
+                for cg in cgs)
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_features_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    names = [name for name, _ in results]
+    features = np.array([cg_features for _, cg_features in results],
+                        dtype=np.float32).reshape((len(results), len(directions),
+                                                   len(FEATURES)))
+    return FeatureTable(names, directions, features)
+
+
+class FeatureTable(object):
+    """
+    The descriptors of the projections of many RNAs in many directions.
+    """
+
+    def __init__(self, names, directions, features):
+        """
+        :param names: The names of the RNAs. A list of length n
+        :param directions: The projection directions in polar coordinates
+                           (theta, phi). An array of shape (k, 2)
+        :param features: An array of shape (n, k, len(FEATURES))
+        """
+        self.names = list(names)
+        self.directions = np.asarray(directions, dtype=float)
+        self.features = np.asarray(features)
+        if self.features.shape != (len(self.names), len(self.directions), len(FEATURES)):
+            raise ValueError("Features of shape {} do not match {} RNAs and "
+                             "{} directions".format(self.features.shape,
+                                                    len(self.names),
+                                                    len(self.directions)))
+
+    def __getitem__(self, feature):
+        """
+        :param feature: One of FEATURES
+        :returns: An array of shape (n, k) with this descriptor for
+                  every RNA and direction.
+        """
+        try:
+            return self.features[:, :, FEATURES.index(feature)]
+        except ValueError:
+            raise KeyError("Unknown feature {}, use one of {}".format(feature,
+                                                                      FEATURES))
+
+    def mask(self, **ranges):
+        """
+        Select the pairs of RNA and direction, whose descriptors are
+        within the given ranges.
+
+        Use e.g. `table.mask(longest_axis=(80, 100))`.
+
+        :param ranges: Feature names as keys and tuples (minimum, maximum)
+                       as values. None for a missing bound.
+        :returns: A boolean array of shape (n, k)
+        """
+        mask = np.ones(self.features.shape[:2], dtype=bool)
+        for feature, (minimum, maximum) in ranges.items():
+            values = self[feature]
+            if minimum is not None:
+                mask &= values >= minimum
+            if maximum is not None:
+                mask &= values <= maximum
+        return mask
+
+    def save(self, filename):
+        """
+        Store the table in a compressed numpy .npz file.
+        """
+        np.savez_compressed(filename, names=np.array(self.names),
+                            directions=self.directions, features=self.features,
+                            feature_names=np.array(FEATURES))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a table stored with `save`.
+        """
+        with np.load(filename) as data:
+            if tuple(data["feature_names"]) != FEATURES:
+                raise ValueError("The file {} contains the features {}, "
+                                 "expected {}".format(filename,
+                                                      list(data["feature_names"]),
+                                                      FEATURES))
+            return cls([str(name) for name in data["names"]], data["directions"],
+                       data["features"])
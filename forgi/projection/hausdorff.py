@@ -2,14 +2,22 @@
 from builtins import range
 import sys
 import math
+import time
+import collections
+import multiprocessing
+import threading
 import numpy as np
+import scipy.ndimage
 from ..threedee.utilities import vector as ftuv
+from ..threedee.model import coarse_grain as ftmc
 from . import projection2d as fhp
 import random
 import itertools as it
 
 __all__ = ["offsets", "modified_hausdorff_distance", "hausdorff_distance",
-           "locally_minimal_distance", "globally_minimal_distance", "get_box",
+           "combined_distance", "HausdorffEngine", "StartpointReport",
+           "locally_minimal_distance", "globally_minimal_distance",
+           "pyramid_minimal_distance", "PyramidLevelReport", "downsample_image", "get_box",
            "get_longest_img_diameter", "try_parameters"]
 __author__ = "Bernhard Thiel"
 __copyright__ = "Copyright 2016"
@@ -45,73 +53,110 @@ def norm(offset):
     return math.sqrt(offset[0]**2 + offset[1]**2)
 
 
-def offsets(skip=0, to_iterate=[], toskip={}):  # pylint: disable=W0102
+#: The table of offsets sorted by their norm is cached up to this radius
+#: (in grid cells). Offsets further away are generated when needed,
+#: without being cached.
+OFFSET_TABLE_MAX_RADIUS = 512
+
+#: hausdorff_helperdist compares at most this many points with the
+#: offsets at once.
+HELPERDIST_POINT_CHUNK = 256
+
+#: The offsets, sorted by their norm and, for equal norms, by dx and dy.
+#: radius is an integer and the table contains all offsets with a norm
+#: smaller than radius.
+_OffsetTable = collections.namedtuple("_OffsetTable",
+                                      ["radius", "dx", "dy", "sq_norms", "norms"])
+
+_offset_table = _OffsetTable(0, *([np.zeros(0, dtype=int)] * 3 + [np.zeros(0)]))
+_offset_table_lock = threading.Lock()
+
+
+def _offset_ring(inner, outer):
+    """
+    All offsets with inner <= norm((dx,dy)) < outer, sorted like offsets().
+
+    :param inner, outer: Integers
+    :returns: An _OffsetTable with radius outer.
+    """
+    r = np.arange(-outer + 1, outer)
+    dx, dy = (a.ravel() for a in np.meshgrid(r, r, indexing="ij"))
+    sq_norms = dx**2 + dy**2
+    in_ring = (sq_norms >= inner**2) & (sq_norms < outer**2)
+    dx, dy, sq_norms = dx[in_ring], dy[in_ring], sq_norms[in_ring]
+    order = np.lexsort((dy, dx, sq_norms))
+    return _OffsetTable(outer, dx[order], dy[order], sq_norms[order],
+                        np.sqrt(sq_norms[order]))
+
+
+def _get_offset_table(radius):
+    """
+    The cached offset table, containing at least all offsets with a norm
+    smaller than min(radius, OFFSET_TABLE_MAX_RADIUS).
+
+    The table is never modified in place, but replaced by a larger table,
+    so it can be used while other threads extend it.
+    """
+    global _offset_table
+    radius = min(radius, OFFSET_TABLE_MAX_RADIUS)
+    table = _offset_table
+    if table.radius >= radius:
+        return table
+    with _offset_table_lock:
+        table = _offset_table
+        if table.radius < radius:
+            # Grow geometrically, to extend the table only a few times.
+            new_radius = min(max(radius, 2 * table.radius, 32),
+                             OFFSET_TABLE_MAX_RADIUS)
+            ring = _offset_ring(table.radius, new_radius)
+            table = _OffsetTable(new_radius, *(np.concatenate([old, new])
+                                               for old, new in zip(table[1:], ring[1:])))
+            _offset_table = table
+        return table
+
+
+def _offset_chunks(skip=0, max_chunk=4096):
+    """
+    Iterate over the offsets in the order of offsets(), in chunks of arrays.
+
+    The first chunk contains 64 offsets, the size of the following chunks
+    doubles up to max_chunk.
+
+    :param skip: See offsets()
+    :yields: Tuples (dx, dy, sq_norms, norms) of 1D arrays
+    """
+    inner = 0
+    chunk = 64
+    while True:
+        if inner < OFFSET_TABLE_MAX_RADIUS:
+            table = _get_offset_table(2 * max(inner, 16))
+        else:
+            table = _offset_ring(inner, inner + 64)
+        start = np.searchsorted(table.sq_norms, max(skip, inner**2))
+        while start < len(table.sq_norms):
+            end = start + chunk
+            yield tuple(a[start:end] for a in table[1:])
+            start = end
+            chunk = min(2 * chunk, max_chunk)
+        inner = table.radius
+
+
+def offsets(skip=0):
     """
     An iterator over offsets and their length ((dx,dy), norm((dx,dy))) in the order 
     of increasing norm((dx,dy))
     dx and dy are integers, starting at (0,0).
 
-    :param skip: A float. The iterator may skip cell up to SKIP away from (0,0) 
-                 before returning the first value.
-    :param to_iterate: Do not use this. The mutable default parameter is used as a hack for caching.
-    :param toskip: Do not use this. The mutable default parameter is used as a hack for caching.
+    The offsets are read from a table which is shared by all iterators.
+
+    :param skip: A number. The iterator may skip offsets with a squared norm
+                 dx**2+dy**2 smaller than skip.
 
     :yields: A tuple ((dx,dy), n) where dx and dy are integers and n=norm((dx,dy)).
     """
-    # We take advatage of mutable default parameter: to_iterate=[] in the function declaration.
-    # If we iterate several times over offsets(), we only build to_iterate once!
-    if skip == 0:
-        i = 0
-    else:
-        i = toskip[skip]
-    while True:
-        # Iterate over to_iterate.
-        # If we reached the end, increase to_iterate and
-        # continue iteration with first added element.
-        len_to_iterate = len(to_iterate)
-        while i < len_to_iterate:
-            yield to_iterate[i]
-            i += 1
-        increase_range(to_iterate, toskip)
-
-
-def increase_range(to_iterate, to_skip):
-    """
-    Increase the range of offsets, which are ordered by their norm. Used by offsets().
-
-    :param to_iterate: The list of offsets to be increased. 
-                       A list of coordinates and lengths ((dx,dy), norm((dx,dy))),
-                       ordered by increasing norm((dx,dy))
-    """
-    dists = {}
-    if to_iterate:
-        length = to_iterate[-1][1]
-        newlength = int(length + 25)  # 25 could be anything.
-        for dx in range(-newlength, newlength + 1):
-            for dy in range(-newlength, newlength + 1):
-                dd = (dx, dy)
-                if dd not in dists:
-                    dists[dd] = norm(dd)
-        oldlen = to_iterate[-1][0][0]**2 + to_iterate[-1][0][1]**2
-        #print ("sorting {} elements for newlength {}".format(len(dists.keys()), newlength))
-        for x in sorted(dists.keys(), key=lambda x: dists[x]):
-            if length < dists[x] < newlength:
-                to_iterate.append((x, dists[x]))
-                if x[0]**2 + x[1]**2 > oldlen:
-                    to_skip[x[0]**2 + x[1]**2] = len(to_iterate) - 2
-    else:
-        length = 25  # 25 could be anything.
-        for dx in range(-length, length + 1):
-            for dy in range(-length, length + 1):
-                dd = (dx, dy)
-                dists[dd] = norm(dd)
-        oldlen = 0
-        for x in sorted(dists.keys(), key=lambda x: dists[x]):
-            if not dists[x] < length:
-                continue
-            to_iterate.append((x, dists[x]))
-            if x[0]**2 + x[1]**2 > oldlen:
-                to_skip[x[0]**2 + x[1]**2] = len(to_iterate) - 2
+    for dx, dy, _, norms in _offset_chunks(skip):
+        for offset in zip(zip(dx.tolist(), dy.tolist()), norms.tolist()):
+            yield offset
 
 ##############################################################################
 # Grid based distances
@@ -122,26 +167,60 @@ def increase_range(to_iterate, to_skip):
 def hausdorff_helperdist(p, img, cutoff=float("inf"), skip=0):
     """
     Returns the shorthest distance from a given point p to any non-zero cell in img.
-    This is used by hausdorff_distance()
+    This is used by hausdorff_distance_new()
+
+    Many points can be given at once, they are compared to the offsets
+    (see offsets()) in chunks of HELPERDIST_POINT_CHUNK points.
 
-    :param p: a point in matrix coordinates
+    :param p: a point in matrix coordinates or an array of shape (n, 2)
+              of points in matrix coordinates.
     :param img: A binary matrix
     :param cutoff: If the distance is larger cutoff, return float("inf"). 
                    Increases execution speed
-    :param skip: The function does not have to search for a distance smaller than skip 
-                 (used for speedup)
-    """
-    dpi = len(img)
-    p0 = p[0]
-    p1 = p[1]
-    for dd, n in offsets(skip):
-        x = p0 + dd[0]
-        y = p1 + dd[1]
-        if 0 <= x < dpi and 0 <= y < dpi and img[x, y]:
-            return n
-        if n > cutoff:
-            return float("inf")
-    return float('inf')
+    :param skip: The function does not have to search for a squared distance
+                 smaller than skip (used for speedup)
+    :returns: A float or, if an array of points was given, an array of n floats.
+              float("inf") if img contains no non-zero cell.
+    """
+    points = np.asarray(p, dtype=int)
+    dists = np.full(len(points.reshape((-1, 2))), float("inf"))
+    img = np.asarray(img, dtype=bool)
+    if img.any():
+        for start in range(0, len(dists), HELPERDIST_POINT_CHUNK):
+            end = start + HELPERDIST_POINT_CHUNK
+            dists[start:end] = _helperdists(points.reshape((-1, 2))[start:end],
+                                            img, cutoff, skip)
+    if points.ndim == 1:
+        return float(dists[0])
+    return dists
+
+
+def _helperdists(points, img, cutoff, skip):
+    """
+    hausdorff_helperdist for an array of points and an image with at least
+    one non-zero cell.
+    """
+    dists = np.full(len(points), float("inf"))
+    width, height = img.shape
+    # No cell is further away than the furthest corner of the image.
+    max_sq_norm = np.max(np.maximum(points[:, 0]**2, (points[:, 0] - width + 1)**2) +
+                         np.maximum(points[:, 1]**2, (points[:, 1] - height + 1)**2))
+    active = np.arange(len(points))
+    for dx, dy, sq_norms, norms in _offset_chunks(skip):
+        x = points[active, 0, np.newaxis] + dx
+        y = points[active, 1, np.newaxis] + dy
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        hits = np.zeros(x.shape, dtype=bool)
+        hits[inside] = img[x[inside], y[inside]]
+        # The first offset longer than cutoff is still checked for a hit.
+        beyond_cutoff = np.flatnonzero(norms > cutoff)
+        if len(beyond_cutoff):
+            hits = hits[:, :beyond_cutoff[0] + 1]
+        found = hits.any(axis=1)
+        dists[active[found]] = norms[np.argmax(hits[found], axis=1)]
+        active = active[~found]
+        if len(beyond_cutoff) or not len(active) or sq_norms[-1] > max_sq_norm:
+            return dists
 
 
 def hausdorff_distance(img, ref_img, cutoff=float("inf")):
@@ -152,7 +231,7 @@ def hausdorff_distance(img, ref_img, cutoff=float("inf")):
     :param cutoff: A float. If the distance is greater than cutoff, return float("inf").
                    (Used to increase execution speed in certain cases)
     """
-    return hausdorff_distance_new(img, ref_img, cutoff)
+    return HausdorffEngine(ref_img).hausdorff_distance(img, cutoff)
     # Source: https://de.wikipedia.org/wiki/Hausdorff-Metrik
     # h1=max(hausdorff_helperdist([x,y], img, cutoff) for x,y in np.transpose(np.where(ref_img) ))
     # if h1==float("inf"):
@@ -164,8 +243,11 @@ def hausdorff_distance(img, ref_img, cutoff=float("inf")):
 @profile
 def hausdorff_distance_new(img, ref_img, cutoff=float("inf")):
     """
-    A faster implementation using skip, called by hausdorff_distance().
+    A search-based implementation using skip.
     This implementation is faster for high Hausdorff distances.
+
+    hausdorff_distance() uses the HausdorffEngine instead,
+    which returns the same values.
     """
     x = 0
     y = 0
@@ -228,14 +310,8 @@ def modified_hausdorff_distance(img, ref_img, _=None):
     Return the grid-based Modified Hausdorff distance between two aligned boolean matrices.
     This distance was proposed in the following paper: TODO
     It uses the mean of all distances instead of the max.
-    The current implementation is not optimized
     """
-    # Source:
-    h1 = sum(hausdorff_helperdist([x, y], img)
-             for x, y in np.transpose(np.where(ref_img))) / np.sum(ref_img)
-    h2 = sum(hausdorff_helperdist([x, y], ref_img)
-             for x, y in np.transpose(np.where(img))) / np.sum(img)
-    return max(h1, h2)
+    return HausdorffEngine(ref_img).modified_hausdorff_distance(img)
 
 
 def tp_fp_distance(img, ref_img, _=None):
@@ -245,7 +321,157 @@ def tp_fp_distance(img, ref_img, _=None):
 
 
 def combined_distance(img, ref_img, _=None):
-    return tp_fp_distance(img, ref_img) + hausdorff_distance(img, ref_img)
+    return HausdorffEngine(ref_img).combined_distance(img)
+
+
+def _distance_transform(img):
+    """
+    For every cell, the Euclidean distance to the closest True cell of img.
+    If img has no True cells, all distances are infinite.
+    """
+    if not img.any():
+        return np.full(img.shape, float("inf"))
+    return scipy.ndimage.distance_transform_edt(~img)
+
+
+class HausdorffEngine(object):
+    """
+    Grid-based distances of many images to one reference image.
+
+    The Euclidean distance transform of the reference image (for every
+    cell the distance to the closest True cell) is calculated only once.
+    The distances from all True cells of an image to the reference image
+    are then read from it at once. For the other direction, the distance
+    transform of the image is calculated by scipy.ndimage.
+
+    All distance functions accept a single image or a stack of
+    images (a 3D array) and return a float or an array of floats.
+    The distances are the same as the ones found by the search in
+    hausdorff_distance_new and hausdorff_helperdist.
+
+    Usage::
+
+        engine = HausdorffEngine(ref_img)
+        scores = engine.hausdorff_distance(np.array(candidate_imgs))
+    """
+
+    def __init__(self, ref_img):
+        """
+        :param ref_img: The reference image. A boolean matrix.
+        """
+        self._source = ref_img
+        self.ref_img = np.asarray(ref_img, dtype=bool)
+        self._ref_dt = _distance_transform(self.ref_img)
+
+    def _as_stack(self, imgs):
+        imgs = np.asarray(imgs, dtype=bool)
+        single = (imgs.ndim == 2)
+        if single:
+            imgs = imgs[np.newaxis]
+        if imgs.shape[1:] != self.ref_img.shape:
+            raise ValueError("Image of shape {} cannot be compared to a reference "
+                             "image of shape {}".format(imgs.shape[1:],
+                                                        self.ref_img.shape))
+        return imgs, single
+
+    def _result(self, values, single):
+        if single:
+            return float(values[0])
+        return values
+
+    def directed_distances(self, imgs, mean=False, cutoff=float("inf")):
+        """
+        The directed distances between images and the reference image.
+
+        :param imgs: A boolean matrix or a stack of boolean matrices.
+        :param mean: If True, average the distances of all True cells
+                     (for the Modified Hausdorff distance), else use the maximum.
+        :param cutoff: Images whose distance to the reference is larger
+                       than cutoff get an infinite distance from the reference,
+                       without calculating it.
+        :returns: A tuple of arrays (to_ref, from_ref)
+        """
+        imgs, _ = self._as_stack(imgs)
+        dists = np.where(imgs, self._ref_dt, 0)
+        if mean:
+            counts = np.maximum(np.sum(imgs, axis=(1, 2)), 1)
+            to_ref = np.sum(dists, axis=(1, 2)) / counts
+        else:
+            to_ref = np.max(dists, axis=(1, 2))
+        from_ref = np.full(len(imgs), float("inf"))
+        for i in np.flatnonzero(to_ref <= cutoff):
+            dists = _distance_transform(imgs[i])[self.ref_img]
+            if len(dists) == 0:
+                from_ref[i] = 0
+            elif mean:
+                from_ref[i] = np.mean(dists)
+            else:
+                from_ref[i] = np.max(dists)
+        return to_ref, from_ref
+
+    def hausdorff_distance(self, imgs, cutoff=float("inf")):
+        """
+        See hausdorff_distance
+        """
+        imgs, single = self._as_stack(imgs)
+        dists = np.maximum(*self.directed_distances(imgs, cutoff=cutoff))
+        dists[dists > cutoff] = float("inf")
+        return self._result(dists, single)
+
+    def modified_hausdorff_distance(self, imgs, _=None):
+        """
+        See modified_hausdorff_distance
+        """
+        imgs, single = self._as_stack(imgs)
+        return self._result(np.maximum(*self.directed_distances(imgs, mean=True)),
+                            single)
+
+    def tp_fp_distance(self, imgs, _=None):
+        imgs, single = self._as_stack(imgs)
+        tp = np.sum(imgs & self.ref_img, axis=(1, 2))
+        alle = np.sum(imgs | self.ref_img, axis=(1, 2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._result(alle / tp, single)
+
+    def combined_distance(self, imgs, _=None):
+        """
+        See combined_distance
+        """
+        imgs, single = self._as_stack(imgs)
+        dists = self.tp_fp_distance(imgs) + self.hausdorff_distance(imgs)
+        return self._result(dists, single)
+
+    def distance_function(self, distance):
+        """
+        Wrap one of the module level distance functions, so it uses this
+        engine, whenever it is called with the reference image.
+
+        :param distance: One of hausdorff_distance, modified_hausdorff_distance
+                         and combined_distance.
+        :returns: A function with the same signature as distance.
+        """
+        method = getattr(self, distance.__name__)
+
+        def engine_distance(img, ref_img, cutoff=float("inf")):
+            if ref_img is self._source:
+                return method(img, cutoff)
+            elif img is self._source:
+                return method(ref_img, cutoff)
+            return distance(img, ref_img, cutoff)
+        return engine_distance
+
+
+def _with_engine(distance, ref_img):
+    """
+    Use a HausdorffEngine for ref_img, if distance is one of
+    the distance functions supported by it.
+    """
+    if distance in (hausdorff_distance, modified_hausdorff_distance,
+                    combined_distance):
+        return HausdorffEngine(ref_img).distance_function(distance)
+    return distance
+
+
 ##############################################################################
 # Helper functions for working with projections
 ##############################################################################
@@ -272,7 +498,7 @@ def get_box(projection, width, offset=np.array((0, 0))):
 def locally_minimal_distance(ref_img, scale, cg,
                              start_rot=None, offset=None, proj_dir=None,
                              maxiter=50, advanced=False, virtual_atoms=True,
-                             distance=hausdorff_distance):
+                             distance=hausdorff_distance, projector=None):
     """
     Local optimization of the Hausdorff distance between a image and a CoarseGrainRNA
 
@@ -295,11 +521,14 @@ def locally_minimal_distance(ref_img, scale, cg,
     :param distance: a function with signature like hausdorff_distance 
     :param advanced: Try steps in more directions (takes longer)
     :param virtual_atoms: Whether or not to project the virtual atoms. A boolean.
+    :param projector: A forgi.projection.projection2d.Projector for cg and virtual_atoms
+                      or None. Pass it to reuse the gathered coordinates of cg.
 
     :returns: A triple: (distance, image, parameters)
               Where distance is a float,image a matrix and params is a triple:
               np.array([theta, phi]), degrees, np.array([x_offset, y_offset])
     """
+    distance = _with_engine(distance, ref_img)
     dpi = len(ref_img)
     cell_length = scale / dpi
     # Heuristical parameters
@@ -321,9 +550,11 @@ def locally_minimal_distance(ref_img, scale, cg,
     else:
         curr_best_pro = to_polar(cg.project_from)[1:]
 
+    if projector is None:
+        projector = fhp.Projector(cg, project_virtual_atoms=virtual_atoms)
+
     # Initial projection object and initial score
-    projection = fhp.Projection2D(cg, from_polar([1] + list(curr_best_pro)),
-                                  project_virtual_atoms=virtual_atoms)
+    projection = projector.projection(from_polar([1] + list(curr_best_pro)))
     box = get_box(projection, scale, curr_best_offs)
     img, _ = projection.rasterize(dpi, bounding_square=box, warn=False,
                                   rotate=curr_best_rotation)
@@ -413,8 +644,8 @@ def locally_minimal_distance(ref_img, scale, cg,
             cp = (cp[0] * scale_projectionsteps, cp[1] * scale_projectionsteps)
             # print("=======================================")
             for i in range(10):
-                tmp_projection = fhp.Projection2D(cg, from_polar([1] + list(curr_best_pro + cp)),
-                                                  project_virtual_atoms=virtual_atoms)
+                tmp_projection = projector.projection(
+                    from_polar([1] + list(curr_best_pro + cp)))
                 box = get_box(tmp_projection, scale, curr_best_offs)
                 img, _ = tmp_projection.rasterize(dpi, bounding_square=box, warn=False,
                                                   rotate=curr_best_rotation)
@@ -447,8 +678,7 @@ def locally_minimal_distance(ref_img, scale, cg,
         #print("Max-iter reached:", maxiter)
 
     # This is just to detect bugs:
-    tmp_projection = fhp.Projection2D(cg, from_polar([1] + list(curr_best_pro)),
-                                      project_virtual_atoms=virtual_atoms)
+    tmp_projection = projector.projection(from_polar([1] + list(curr_best_pro)))
     box = get_box(tmp_projection, scale, curr_best_offs)
     img, _ = tmp_projection.rasterize(dpi, bounding_square=box, warn=False,
                                       rotate=curr_best_rotation)
@@ -491,11 +721,13 @@ def try_parameters(ref_img, scale, cg,
     best_distance = float("inf")
     params = [np.array([0, 0]), 0, np.array([0, 0])]
     best_img = None
+    projector = fhp.Projector(cg, project_virtual_atoms=virtual_atoms)
     for rot in rotations:
         for offset in offsets:
             for proj in proj_directions:
                 dist, img, params = locally_minimal_distance(ref_img, scale, cg,  rot, offset, proj,
-                                                             maxiter=6, virtual_atoms=virtual_atoms)
+                                                             maxiter=6, virtual_atoms=virtual_atoms,
+                                                             projector=projector)
                 if dist < best_distance:
                     best_distance = dist
                     best_params = params
@@ -555,81 +787,251 @@ def get_longest_img_diameter(img, scale):
     return math.sqrt(maxl) * scale / len(img)
 
 
+#: The result of screening (and optimizing) one starting projection direction
+#: in the global search.
+#: heuristic is "longest_axis" or "score", if the direction was skipped by
+#: this heuristic, or None, if a local optimization was performed.
+#: start_score is the best score of the starting rotations and offsets
+#: and score the score after local optimization (or None).
+StartpointReport = collections.namedtuple("StartpointReport",
+                                          ["direction", "heuristic", "start_score",
+                                           "score", "seconds"])
+
+# The read-only inputs of a worker process of _try_startpoints
+_startpoint_worker_args = None
+
+
+def _init_startpoint_worker(ref_img, scale, cg_string, local_maxiter,
+                            virtual_atoms, use_heuristic, distance):
+    global _startpoint_worker_args
+    cg = ftmc.CoarseGrainRNA.from_bg_string(cg_string)
+    projector = fhp.Projector(cg, project_virtual_atoms=virtual_atoms)
+    _startpoint_worker_args = (ref_img, scale, cg, projector, local_maxiter,
+                               virtual_atoms, use_heuristic,
+                               _with_engine(distance, ref_img),
+                               get_longest_img_diameter(ref_img, scale))
+
+
+def _startpoint_job(job):
+    project_dir, score_bound, starting_rotations, starting_offsets = job
+    (ref_img, scale, cg, projector, local_maxiter, virtual_atoms, use_heuristic,
+     distance, longest_distance_image) = _startpoint_worker_args
+    return _evaluate_startpoint(project_dir, score_bound, ref_img, scale, cg,
+                                projector, starting_rotations, starting_offsets,
+                                local_maxiter, virtual_atoms, use_heuristic,
+                                distance, longest_distance_image)
+
+
+def _startpoint_pool(ref_img, scale, cg, local_maxiter, virtual_atoms,
+                     use_heuristic, distance, processes):
+    """
+    A multiprocessing.Pool for _try_startpoints.
+
+    Every worker receives the read-only inputs once, the starting rotations
+    and offsets are sent with every job, so one pool can be used for
+    several calls to _try_startpoints.
+    The distance function has to be picklable.
+    """
+    return multiprocessing.Pool(processes, initializer=_init_startpoint_worker,
+                                initargs=(ref_img, scale, cg.to_cg_string(),
+                                          local_maxiter, virtual_atoms,
+                                          use_heuristic, distance))
+
+
+def _longest_axis_tolerance(ref_img, scale):
+    # 4 pixels is arbitrary heuristic
+    return 6 * scale / len(ref_img)
+
+
+def _longest_axis_bounds_reject(projector, project_dir, longest_distance_image,
+                                tolerance):
+    """
+    Whether the bounds of the longest axis of the projection in direction
+    project_dir show, that it differs by more than tolerance from the
+    longest distance in the image, without creating the projection.
+    """
+    lower, upper = projector.longest_axis_bounds(from_polar([1] + list(project_dir)))
+    return (lower[0] - longest_distance_image > tolerance or
+            longest_distance_image - upper[0] > tolerance)
+
+
+def _evaluate_startpoint(project_dir, score_bound, ref_img, scale, cg, projector,
+                         starting_rotations, starting_offsets, local_maxiter,
+                         virtual_atoms, use_heuristic, distance,
+                         longest_distance_image):
+    """
+    Try all starting rotations and offsets for one projection direction
+    and optimize the best one locally, if it is not skipped by a heuristic.
+
+    The bounds of the longest axis are checked by the caller,
+    see `_longest_axis_bounds_reject`.
+
+    :param score_bound: Skip the local optimization, if the best score of the
+                        starting rotations and offsets is larger than this.
+    :returns: A tuple (report, result), where report is a StartpointReport
+              and result the result of locally_minimal_distance or None.
+    """
+    t0 = time.time()
+    dpi = len(ref_img)
+    proj = projector.projection(from_polar([1] + list(project_dir)))
+    if use_heuristic:
+        tolerance = _longest_axis_tolerance(ref_img, scale)
+        if abs(proj.longest_axis - longest_distance_image) > tolerance:
+            return StartpointReport(project_dir, "longest_axis", None, None,
+                                    time.time() - t0), None
+    loc_best_rot = 0
+    loc_best_offs = np.array([0, 0])
+    loc_best_score = float("inf")
+    # Rasterize all starting rotations and offsets at once.
+    params = list(it.product(starting_rotations, starting_offsets))
+    imgs, _ = proj.rasterize_batch(dpi, [get_box(proj, scale, offset)
+                                         for rot, offset in params],
+                                   [rot for rot, offset in params])
+    for (rot, offset), img in zip(params, imgs):
+        score = distance(ref_img, img)
+        if score < loc_best_score:
+            loc_best_score = score
+            loc_best_rot = rot
+            loc_best_offs = offset
+    if use_heuristic and loc_best_score > score_bound:
+        return StartpointReport(project_dir, "score", loc_best_score, None,
+                                time.time() - t0), None
+    result = locally_minimal_distance(ref_img, scale, cg,
+                                      loc_best_rot, loc_best_offs, project_dir,
+                                      maxiter=local_maxiter,
+                                      virtual_atoms=virtual_atoms, distance=distance,
+                                      projector=projector)
+    return StartpointReport(project_dir, None, loc_best_score, result[0],
+                            time.time() - t0), result
+
+
 def _try_startpoints(ref_img, scale, cg, start_points, starting_rotations,
-                     starting_offsets, local_maxiter, virtual_atoms, use_heuristic, distance, verbose):
+                     starting_offsets, local_maxiter, virtual_atoms, use_heuristic,
+                     distance, verbose, processes=1, report=None, pool=None):
+    """
+    :param processes: The number of worker processes. None for the number
+                      of CPUs. Up to `processes` directions are evaluated
+                      at the same time. For the score heuristic, every
+                      direction uses the best score of the directions
+                      scheduled at least `processes` directions earlier.
+                      Directions rejected by the bounds of the longest axis
+                      are never scheduled. The results are merged in the
+                      order of start_points, so the result does not depend
+                      on the scheduling. With 1 process, the directions are
+                      evaluated one after the other.
+    :param report: None or a list. If it is a list, a StartpointReport is
+                   appended for every evaluated direction.
+    :param pool: None or a pool created by `_startpoint_pool` with the
+                 same arguments. If it is None and processes > 1,
+                 a new pool is created.
+    """
     # Longest extention in the image
     longest_distance_image = get_longest_img_diameter(ref_img, scale)
     if longest_distance_image == 0:
         raise ValueError("Reference image probably empty")
-
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if report is None:
+        report = []
+    own_pool = None
+    if pool is None and processes > 1:
+        pool = own_pool = _startpoint_pool(ref_img, scale, cg, local_maxiter,
+                                           virtual_atoms, use_heuristic,
+                                           distance, processes)
+    projector = fhp.Projector(cg, project_virtual_atoms=virtual_atoms)
+    if pool is None:
+        distance = _with_engine(distance, ref_img)
     # We count, how often certain heuristics kicked in
     la_heur = 0
     no_heur = 0
     score_heur = 0
     #
-    dpi = len(ref_img)
     best_score = float('inf')
     decrease = float("inf")
-    for i, project_dir in enumerate(start_points):
-        sys.stdout.write("{:2.0%}\r".format(i / len(start_points)))  # Progress
-        sys.stdout.flush()
-        proj = fhp.Projection2D(cg, from_polar([1] + list(project_dir)),
-                                project_virtual_atoms=virtual_atoms)
-
-        if use_heuristic:
-            # 4 pixels is arbitrary heuristic
-            if abs(proj.longest_axis - longest_distance_image) > 6 * scale / dpi:
-                #print("abs({}-{})={}>{}".format(proj.longest_axis, longest_distance_image, abs(proj.longest_axis-longest_distance_image), 6*scale/dpi))
-                # proj.plot(show=True)
+    t0 = time.time()
+    # The bounds of the longest axis do not depend on earlier results,
+    # so directions rejected by them are never scheduled.
+    tolerance = _longest_axis_tolerance(ref_img, scale)
+
+    def iter_candidates():
+        for project_dir in start_points:
+            t1 = time.time()
+            if use_heuristic and _longest_axis_bounds_reject(
+                    projector, project_dir, longest_distance_image, tolerance):
+                yield project_dir, StartpointReport(project_dir, "longest_axis",
+                                                    None, None, time.time() - t1)
+            else:
+                yield project_dir, None
+    # Directions submitted to the pool, but not yet merged, in the order
+    # of start_points. A new direction is submitted, whenever the oldest
+    # one is merged, so no worker waits for a whole round to finish.
+    pending = collections.deque()
+    candidates = iter_candidates()
+
+    def submit():
+        for project_dir, rejected in candidates:
+            if rejected is not None:
+                pending.append(rejected)
+                continue
+            score_bound = best_score + (decrease * 1.75)
+            if pool is None:
+                pending.append(_evaluate_startpoint(
+                    project_dir, score_bound, ref_img, scale, cg, projector,
+                    starting_rotations, starting_offsets, local_maxiter,
+                    virtual_atoms, use_heuristic, distance,
+                    longest_distance_image))
+            else:
+                pending.append(pool.apply_async(
+                    _startpoint_job, ((project_dir, score_bound,
+                                       starting_rotations, starting_offsets),)))
+            return
+
+    try:
+        for i in range(processes):
+            submit()
+        done = 0
+        while pending:
+            sys.stdout.write("{:2.0%}\r".format(done / len(start_points)))  # Progress
+            sys.stdout.flush()
+            done += 1
+            item = pending.popleft()
+            if isinstance(item, StartpointReport):
+                report.append(item)
                 la_heur += 1
                 continue
-        loc_best_rot = 0
-        loc_best_offs = np.array([0, 0])
-        loc_best_score = float("inf")
-        for rot, offset in it.product(starting_rotations, starting_offsets):
-            box = get_box(proj, scale, offset)
-            img, _ = proj.rasterize(
-                dpi, bounding_square=box, warn=False, rotate=rot)
-            score = distance(ref_img, img)
-            if score < loc_best_score:
-                loc_best_score = score
-                loc_best_rot = rot
-                loc_best_offs = offset
-                # loc_best_img=img
-        #print("HEUR?", loc_best_score, best_score, best_score+(decrease*1.5))
-        if use_heuristic and loc_best_score > best_score + (decrease * 1.75):
-            score_heur += 1
-            # print("Score")
-            # proj.plot(show=True)
-            continue
-        #import matplotlib.pyplot as plt
-        #fig, ax=plt.subplots(3)
-        #ax[0].imshow(ref_img, interpolation="none", cmap='gray')
-        #ax[1].imshow(loc_best_img, interpolation="none", cmap='gray')
-        # ax[0].set_title("Reference")
-        #ax[1].set_title("Initial distance {}".format(loc_best_score))
-        no_heur += 1
-        score, img, params = locally_minimal_distance(ref_img, scale, cg,
-                                                      loc_best_rot, loc_best_offs, project_dir,
-                                                      maxiter=local_maxiter,
-                                                      virtual_atoms=virtual_atoms, distance=distance)
-        #ax[2].imshow(img, interpolation="none", cmap='gray')
-        #ax[2].set_title("Optimized to {}".format(score))
-        # plt.show()
-        if score < best_score:
-            best_score = score
-            best_img = img
-            best_params = params
-            decrease = loc_best_score - score  # Can increase or decrease
-            #print("Decrease {} to {}".format(loc_best_score, score), decrease)
-        if best_score == 0:
-            break
+            if pool is not None:
+                item = item.get()
+            startpoint_report, result = item
+            report.append(startpoint_report)
+            if startpoint_report.heuristic == "longest_axis":
+                la_heur += 1
+            elif startpoint_report.heuristic == "score":
+                score_heur += 1
+            else:
+                no_heur += 1
+                score, img, params = result
+                if score < best_score:
+                    best_score = score
+                    best_img = img
+                    best_params = params
+                    # Can increase or decrease
+                    decrease = startpoint_report.start_score - score
+                if best_score == 0:
+                    break
+            submit()
+    finally:
+        if own_pool is not None:
+            own_pool.close()
+            own_pool.join()
     sys.stdout.write("   \r")
     if verbose:
-        print("Global optimization performe!\n"
-              "\t{} local optimizations performed\n"
+        optimized = [r.seconds for r in report if r.heuristic is None]
+        print("Global optimization performe in {:.1f} seconds!\n"
+              "\t{} local optimizations performed ({:.2f} seconds per direction)\n"
               "\t{} skipped (longest distance)\n"
-              "\t{} skipped (score)".format(no_heur, la_heur, score_heur))
+              "\t{} skipped (score)".format(time.time() - t0, no_heur,
+                                            np.mean(optimized) if optimized else 0,
+                                            la_heur, score_heur))
     if no_heur == 0:
         if verbose:
             print("During global optimization, NO SMALL DISTANCE could be found.\n"
@@ -643,7 +1045,8 @@ def globally_minimal_distance(ref_img, scale, cg,
                               starting_rotations=(0, 180),
                               starting_offsets=(np.array([0, 0]), ),
                               local_maxiter=5, use_heuristic=True, virtual_atoms=True,
-                              verbose=False, distance=hausdorff_distance):
+                              verbose=False, distance=hausdorff_distance,
+                              processes=1, report=None):
     """
     Global minimization of Hausdorff distance.
 
@@ -662,6 +1065,14 @@ def globally_minimal_distance(ref_img, scale, cg,
     :param use_heuristic: A Boolean
     :param virtual_atoms: Boolean. If False, do not project virtual atoms (faster)
     :param verbose: If True, print a summary at the end.
+    :param processes: The number of processes used to evaluate the starting
+                      projection directions in parallel. None for the number
+                      of CPUs. The result is the same for every run with the
+                      same number of processes.
+    :param report: None or a list. If it is a list, a StartpointReport
+                   (with the time needed and the heuristic that skipped
+                   the direction) is appended for every projection direction
+                   evaluated during the global search.
 
     :returns: A triple: (best_distance, best_image, best_parameters)
               Where best_distance is a float, best_image a matrix and best params is a triple:
@@ -678,25 +1089,39 @@ def globally_minimal_distance(ref_img, scale, cg,
     r.shuffle(sp)
     # random.shuffle(sp)
 
-    best_score, best_img, best_params = _try_startpoints(ref_img, scale, cg, sp,
-                                                         starting_rotations, starting_offsets, local_maxiter, virtual_atoms,
-                                                         use_heuristic, distance, verbose)
-    #import matplotlib.pyplot as plt
-    #fig, ax=plt.subplots(2)
-    #ax[0].imshow(ref_img, interpolation="none", cmap='gray')
-    #ax[1].imshow(best_img, interpolation="none", cmap='gray')
-    # ax[0].set_title("Reference")
-    #ax[1].set_title("distance {}".format(best_score))
-    # plt.show()
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    # Both global searches use the same worker processes.
+    pool = None
+    if processes > 1:
+        pool = _startpoint_pool(ref_img, scale, cg, local_maxiter, virtual_atoms,
+                                use_heuristic, distance, processes)
+    try:
+        best_score, best_img, best_params = _try_startpoints(ref_img, scale, cg, sp,
+                                                             starting_rotations, starting_offsets, local_maxiter, virtual_atoms,
+                                                             use_heuristic, distance, verbose,
+                                                             processes, report, pool)
+        #import matplotlib.pyplot as plt
+        #fig, ax=plt.subplots(2)
+        #ax[0].imshow(ref_img, interpolation="none", cmap='gray')
+        #ax[1].imshow(best_img, interpolation="none", cmap='gray')
+        # ax[0].set_title("Reference")
+        #ax[1].set_title("distance {}".format(best_score))
+        # plt.show()
 
-    # Global search in vicinity of best match
-    sp = get_start_points_near(
-        10 * start_points, best_params[0][0], best_params[0][1])
-    print("Current best score {}, refining on {} points".format(best_score, len(sp)))
-    best_score1, best_img1, best_params1 = _try_startpoints(ref_img, scale, cg, sp,
-                                                            [best_params[1]], [
-                                                                best_params[2]], local_maxiter, virtual_atoms,
-                                                            use_heuristic, distance, verbose)
+        # Global search in vicinity of best match
+        sp = get_start_points_near(
+            10 * start_points, best_params[0][0], best_params[0][1])
+        print("Current best score {}, refining on {} points".format(best_score, len(sp)))
+        best_score1, best_img1, best_params1 = _try_startpoints(ref_img, scale, cg, sp,
+                                                                [best_params[1]], [
+                                                                    best_params[2]], local_maxiter, virtual_atoms,
+                                                                use_heuristic, distance, verbose,
+                                                                processes, report, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
     if best_score1 < best_score:
         best_score = best_score1
         best_params = best_params1
@@ -718,3 +1143,146 @@ def globally_minimal_distance(ref_img, scale, cg,
                                                   virtual_atoms=virtual_atoms, distance=distance)
 
     return score, img, params
+
+
+#: Statistics about one level of pyramid_minimal_distance.
+#: evaluated is the number of candidates evaluated at this level (the
+#: starting parameters are only compared to the coarsest image, candidates
+#: at finer levels are optimized locally), promoted the number of candidates
+#: passed on to the next finer level and saved the number of evaluations
+#: saved compared to evaluating all starting candidates at this level.
+PyramidLevelReport = collections.namedtuple("PyramidLevelReport",
+                                            ["level", "resolution", "evaluated",
+                                             "promoted", "saved", "seconds"])
+
+
+def downsample_image(img, resolution):
+    """
+    Reduce the resolution of a square boolean image.
+
+    The downsampled image covers the same area as img, so it can be compared
+    to projections rasterized with the same bounding square.
+    A pixel is True, if any pixel of img inside it is True.
+
+    :param img: A square matrix
+    :param resolution: The number of pixels in each direction of the result.
+    :returns: A boolean matrix of shape (resolution, resolution)
+    """
+    img = np.asarray(img)
+    x, y = np.nonzero(img)
+    small_img = np.zeros((resolution, resolution), dtype=bool)
+    small_img[x * resolution // len(img), y * resolution // len(img)] = True
+    return small_img
+
+
+def _pyramid_report(report, verbose, level, resolution, evaluated,
+                    num_candidates, promote, seconds):
+    promoted = max(1, int(math.ceil(evaluated * promote)))
+    report.append(PyramidLevelReport(level, resolution, evaluated, promoted,
+                                     num_candidates - evaluated, seconds))
+    if verbose:
+        print("Level {} ({}x{} pixels): {} candidates evaluated in {:.1f} seconds, "
+              "{} evaluations saved".format(level, resolution, resolution, evaluated,
+                                            seconds, num_candidates - evaluated))
+
+
+def pyramid_minimal_distance(ref_img, scale, cg, levels=3,
+                             start_points=40,
+                             starting_rotations=(0, 180),
+                             starting_offsets=(np.array([0, 0]), ),
+                             promote=0.1, local_maxiter=5, virtual_atoms=True,
+                             verbose=False, distance=hausdorff_distance,
+                             report=None):
+    """
+    Global minimization of the Hausdorff distance on an image pyramid.
+
+    All starting parameters are first compared to the reference image with
+    the lowest resolution. Only the best fraction of them (given by promote)
+    is passed on to the next finer level, where it is optimized locally.
+    Again the best fraction of the optimized candidates is passed on to the
+    next level. The resolution doubles from level to level.
+    The best result at full resolution is refined like in
+    globally_minimal_distance.
+
+    :param ref_img: The reference image. A boolean square matrix.
+    :param scale: The edge length in Angstrom of the reference image.
+    :param cg: The coarse grain RNA to match to the projection.
+    :param levels: The number of levels of the pyramid, including the full
+                   resolution. Levels with less than 8 pixels are not used.
+    :param start_points: Number of starting projection directions.
+    :param starting_rotations: A list of in-plane rotations in degrees.
+    :param starting_offsets: A list/array of np.arrays of the type np.array([x,y]).
+    :param promote: The fraction of candidates passed on to the next level
+                    (at least one).
+    :param local_maxiter: Maximal iteration for each local optimization
+    :param virtual_atoms: Boolean. If False, do not project virtual atoms (faster)
+    :param verbose: If True, print a summary of every level.
+    :param distance: a function with signature like hausdorff_distance
+    :param report: None or a list. If it is a list, a PyramidLevelReport is
+                   appended for every level, starting with the coarsest.
+
+    :returns: A triple: (best_distance, best_image, best_parameters)
+              like globally_minimal_distance.
+    """
+    if report is None:
+        report = []
+    dpi = len(ref_img)
+    resolutions = [dpi // 2**level for level in range(levels)
+                   if level == 0 or dpi // 2**level >= 8]
+    pyramid = [np.asarray(ref_img)] + [downsample_image(ref_img, resolution)
+                                       for resolution in resolutions[1:]]
+    projector = fhp.Projector(cg, project_virtual_atoms=virtual_atoms)
+
+    # Compare all starting parameters to the coarsest image
+    t0 = time.time()
+    level_img = pyramid[-1]
+    level_distance = _with_engine(distance, level_img)
+    candidates = []
+    for project_dir in get_start_points(start_points):
+        proj = projector.projection(from_polar([1] + list(project_dir)))
+        params = list(it.product(starting_rotations, starting_offsets))
+        imgs, _ = proj.rasterize_batch(len(level_img),
+                                       [get_box(proj, scale, offset)
+                                        for rot, offset in params],
+                                       [rot for rot, offset in params])
+        for (rot, offset), img in zip(params, imgs):
+            candidates.append((level_distance(level_img, img),
+                               [np.array(project_dir), rot, offset]))
+    num_candidates = len(candidates)
+    if num_candidates == 0:
+        raise ValueError("No starting parameters given")
+    _pyramid_report(report, verbose, len(pyramid) - 1, resolutions[-1], num_candidates,
+                    num_candidates, promote, time.time() - t0)
+
+    # The candidates are only optimized locally at the finer levels.
+    if len(pyramid) > 1:
+        optimization_levels = range(len(pyramid) - 2, -1, -1)
+    else:
+        optimization_levels = [0]
+    for level in optimization_levels:
+        t0 = time.time()
+        # Sorting is stable, so ties are resolved deterministically.
+        candidates.sort(key=lambda candidate: candidate[0])
+        candidates = candidates[:max(1, int(math.ceil(len(candidates) * promote)))]
+        level_img = pyramid[level]
+        level_distance = _with_engine(distance, level_img)
+        optimized = []
+        for _, (project_dir, rot, offset) in candidates:
+            score, img, params = locally_minimal_distance(level_img, scale, cg,
+                                                          rot, offset, project_dir,
+                                                          maxiter=local_maxiter,
+                                                          virtual_atoms=virtual_atoms,
+                                                          distance=level_distance,
+                                                          projector=projector)
+            optimized.append((score, params))
+        candidates = optimized
+        _pyramid_report(report, verbose, level, resolutions[level], len(candidates),
+                        num_candidates, promote if level > 0 else 0, time.time() - t0)
+
+    best_score, best_params = min(candidates, key=lambda candidate: candidate[0])
+    # Refinement of the best match at full resolution
+    return locally_minimal_distance(ref_img, scale, cg,
+                                    best_params[1], best_params[2], best_params[0],
+                                    maxiter=20 * local_maxiter, advanced=True,
+                                    virtual_atoms=virtual_atoms, distance=distance,
+                                    projector=projector)
@@ -125,10 +125,17 @@ def rotatingCalipers(Points):
 between two parallel lines that touch one point each, and yields the sequence
 of pairs of points touched by each pair of lines.'''
     U, L = hulls(Points)
+    for i, j in _calipers(U, L):
+        yield U[i], L[j]
+
+
+def _calipers(U, L):
+    '''The rotating calipers of rotatingCalipers for the upper and lower hull
+U and L, yielding the indices (i, j) of the pairs U[i], L[j].'''
     i = 0
     j = len(L) - 1
     while i < len(U) - 1 or j > 0:
-        yield U[i], L[j]
+        yield i, j
 
         # if all the way through one side of hull, advance the other side
         if i == len(U) - 1:
@@ -159,6 +166,110 @@ def diameter(Points):
 
 # END David Eppstein
 
+
+def convex_hull(points):
+    """
+    An array based version of `hulls`.
+
+    The points are sorted with numpy and scanned like in `hulls`, but on
+    python floats. For many points, the points strictly inside the octagon
+    of the extreme points in the directions 0, 45, ... 315 degrees are
+    discarded with numpy first (Akl-Toussaint heuristic), because they cannot
+    be part of the hull.
+
+    :param points: An array of shape (n, 2)
+    :returns: A tuple of lists (U, L) of indices into points.
+              points[U] and points[L] are the upper and lower hulls returned by
+              `hulls`.
+    """
+    points = np.asarray(points, dtype=float).reshape((-1, 2))
+    x = points[:, 0]
+    y = points[:, 1]
+    order = np.lexsort((y, x))
+    if len(points) > 64:
+        # The extreme points in counterclockwise order
+        octagon = points[[order[0], np.argmin(x + y), np.argmin(y),
+                          np.argmax(x - y), order[-1], np.argmax(x + y),
+                          np.argmax(y), np.argmin(x - y)]]
+        edges = octagon[[1, 2, 3, 4, 5, 6, 7, 0]] - octagon
+        # Edges of length 0 would make every point lie on the boundary.
+        nonzero = np.any(edges != 0, axis=1)
+        if np.sum(nonzero) > 2:
+            octagon = octagon[nonzero]
+            edges = edges[nonzero]
+            inside = np.all(edges[:, 0, np.newaxis] * (y - octagon[:, 1, np.newaxis]) -
+                            edges[:, 1, np.newaxis] * (x - octagon[:, 0, np.newaxis]) > 0,
+                            axis=0)
+            order = order[~inside[order]]
+    coords = points.tolist()
+    U = []
+    L = []
+    for k in order.tolist():
+        r0, r1 = coords[k]
+        # orientation(), inlined for speed
+        while len(U) > 1:
+            p0, p1 = coords[U[-2]]
+            q0, q1 = coords[U[-1]]
+            if (q1 - p1) * (r0 - p0) - (q0 - p0) * (r1 - p1) > 0:
+                break
+            U.pop()
+        while len(L) > 1:
+            p0, p1 = coords[L[-2]]
+            q0, q1 = coords[L[-1]]
+            if (q1 - p1) * (r0 - p0) - (q0 - p0) * (r1 - p1) < 0:
+                break
+            L.pop()
+        U.append(k)
+        L.append(k)
+    return U, L
+
+
+def diameter_indices(points, hull=None):
+    """
+    An array based version of `diameter`.
+
+    :param points: An array of shape (n, 2)
+    :param hull: None or the result of `convex_hull(points)`, if it is known already.
+    :returns: A tuple (i, j), where points[i], points[j] is the pair
+              returned by `diameter`.
+    """
+    points = np.asarray(points, dtype=float).reshape((-1, 2))
+    if hull is None:
+        hull = convex_hull(points)
+    U, L = hull
+    pairs = np.array([(U[i], L[j]) for i, j in _calipers(points[U].tolist(),
+                                                         points[L].tolist())])
+    if len(pairs) == 0:  # A single point
+        return U[0], L[0]
+    p = points[pairs[:, 0]]
+    q = points[pairs[:, 1]]
+    best = np.argmax((p[:, 0] - q[:, 0])**2 + (p[:, 1] - q[:, 1])**2)
+    return pairs[best, 0], pairs[best, 1]
+
+
+def diameter_bounds(points, num_directions=8):
+    """
+    A lower and an upper bound for the diameter of one or many sets of 2D points.
+
+    The points are projected onto num_directions directions sampled evenly
+    from a half circle. The largest extent along these directions is a lower
+    bound of the diameter. The direction of the diameter differs from a
+    sampled direction by at most pi/(2*num_directions), which gives the
+    upper bound.
+
+    :param points: An array of shape (..., n, 2)
+    :param num_directions: The number of sampled directions.
+    :returns: A tuple of arrays (lower, upper) of shape (...)
+    """
+    angles = np.arange(num_directions) * math.pi / num_directions
+    directions = np.array([np.cos(angles), np.sin(angles)])
+    extents = np.matmul(np.asarray(points, dtype=float), directions)
+    width = np.max(np.max(extents, axis=-2) - np.min(extents, axis=-2), axis=-1)
+    # Allow for rounding errors, so these are bounds of the diameter
+    # calculated with ftuv.vec_distance as well.
+    return (width * (1 - 1e-9),
+            width * (1 + 1e-9) / math.cos(math.pi / (2 * num_directions)))
+
 #@profile
 def rotate2D(vector, cosPhi, sinPhi):
     x = vector[0] * cosPhi - vector[1] * sinPhi
@@ -218,6 +329,213 @@ def bresenham(start, end):
     return points
 
 
+def bresenham_segments(starts, ends):
+    """
+    Rasterize many lines at once. The same points as with `bresenham`
+    are returned, but calculated with array operations.
+
+    :param starts, ends: Integer arrays of shape (n, 2) with the start
+                         and end points of the lines.
+    :returns: A tuple (points, line_index). points is an integer array
+              of shape (m, 2) with the points of all lines
+              (in the order of `bresenham`) and line_index an array of
+              length m with the index of the line every point belongs to.
+    """
+    starts = np.asarray(starts, dtype=int).reshape((-1, 2))
+    ends = np.asarray(ends, dtype=int).reshape((-1, 2))
+    delta = ends - starts
+    step = np.sign(delta)
+    dx, dy = np.abs(delta).T
+    x_major = dx > dy
+    major = np.where(x_major, dx, dy)
+    minor = np.where(x_major, dy, dx)
+    line_index = np.repeat(np.arange(len(starts)), major + 1)
+    first = np.cumsum(major + 1) - (major + 1)
+    # The number of steps along the major axis
+    k = np.arange(len(line_index)) - first[line_index]
+    major = major[line_index]
+    minor = minor[line_index]
+    # The error term of the Bresenham algorithm stays in [0, major), so the
+    # number of steps along the minor axis after k steps along the major axis
+    # is ceil((2 * k * minor - major) / (2 * major)).
+    denominator = np.maximum(2 * major, 1)
+    minor_steps = -((major - 2 * k * minor) // denominator)
+    is_x_major = x_major[line_index]
+    points = starts[line_index] + step[line_index] * np.where(
+        is_x_major[:, np.newaxis],
+        np.array([k, minor_steps]).T,
+        np.array([minor_steps, k]).T)
+    return points, line_index
+
+
+def segment_intersection_candidates(segments, cell_size=None):
+    """
+    Find all pairs of 2D line segments with overlapping bounding boxes.
+
+    The segments are sorted into the buckets of a regular grid, so only
+    segments sharing a bucket are compared with each other.
+
+    :param segments: An array of shape (n, 2, 2), with the start and end
+                     point of every segment.
+    :param cell_size: The edge length of the grid cells. Defaults to the
+                      mean extent of the segments' bounding boxes.
+    :returns: A sorted list of index pairs (i, j) with i < j. All pairs of
+              segments, which intersect, are part of this list.
+    """
+    segments = np.asarray(segments, dtype=float).reshape((-1, 2, 2))
+    # Slightly enlarged, so segments which only touch are never missed.
+    lower = segments.min(axis=1) - 1e-9
+    upper = segments.max(axis=1) + 1e-9
+    if cell_size is None:
+        cell_size = np.mean(upper - lower) if len(segments) else 1.
+    buckets = col.defaultdict(list)
+    for i in range(len(segments)):
+        for cell in _grid_cells(lower[i], upper[i], cell_size):
+            buckets[cell].append(i)
+    pairs = set()
+    for bucket in buckets.values():
+        for i, j in it.combinations(bucket, 2):
+            if np.all(lower[i] <= upper[j]) and np.all(lower[j] <= upper[i]):
+                pairs.add((i, j))
+    return sorted(pairs)
+
+
+def _grid_cells(lower, upper, cell_size):
+    """
+    All cells of a grid with the given cell_size, which overlap the
+    rectangle from lower to upper.
+    """
+    lo = np.floor(np.asarray(lower) / cell_size).astype(int)
+    hi = np.floor(np.asarray(upper) / cell_size).astype(int)
+    return it.product(range(lo[0], hi[0] + 1), range(lo[1], hi[1] + 1))
+
+
+class _SpatialHash(object):
+    """
+    A set of 2D points (tuples), sorted into the buckets of a grid
+    with cells of size cutoff.
+    """
+
+    def __init__(self, cutoff, points=()):
+        self.cutoff = cutoff
+        self._buckets = col.defaultdict(set)
+        self._len = 0
+        for point in points:
+            self.add(point)
+
+    def _cell(self, point):
+        return (int(math.floor(point[0] / self.cutoff)),
+                int(math.floor(point[1] / self.cutoff)))
+
+    def add(self, point):
+        bucket = self._buckets[self._cell(point)]
+        if point not in bucket:
+            bucket.add(point)
+            self._len += 1
+
+    def discard(self, point):
+        bucket = self._buckets.get(self._cell(point))
+        if bucket is not None and point in bucket:
+            bucket.remove(point)
+            self._len -= 1
+
+    def near(self, point):
+        """
+        All points, which could be closer than cutoff to point
+        (and maybe some more).
+        """
+        x, y = self._cell(point)
+        for dx, dy in it.product((-1, 0, 1), repeat=2):
+            for other in self._buckets.get((x + dx, y + dy), ()):
+                yield other
+
+    def in_rectangle(self, lower, upper):
+        """
+        All points inside the rectangle from lower to upper (and maybe some more).
+        """
+        lo = [int(math.floor(c / self.cutoff)) for c in lower]
+        hi = [int(math.floor(c / self.cutoff)) for c in upper]
+        if (hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) > self._len:
+            # Cheaper to check all points
+            cells = list(self._buckets)
+        else:
+            cells = it.product(range(lo[0], hi[0] + 1), range(lo[1], hi[1] + 1))
+        for cell in cells:
+            for point in self._buckets.get(cell, ()):
+                if all(lower[d] <= point[d] <= upper[d] for d in range(2)):
+                    yield point
+
+
+def _point_distances(coords, index1, index2):
+    """
+    The distances between coords[index1] and coords[index2],
+    calculated like ftuv.vec_distance.
+    """
+    direction = coords[index2] - coords[index1]
+    return np.sqrt(direction[..., 0] * direction[..., 0] +
+                   direction[..., 1] * direction[..., 1])
+
+
+class _NodeOrder(object):
+    """
+    The nodes of the projection graph in the order of graph.nodes(),
+    kept up to date while nodes are added and removed.
+
+    Removed nodes leave a gap (None) in `nodes`, so the positions of all
+    other nodes stay valid. Like in networkx, new nodes are appended.
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self.position = {node: i for i, node in enumerate(self.nodes)}
+
+    def __contains__(self, node):
+        return node in self.position
+
+    def add(self, node):
+        if node not in self.position:
+            self.position[node] = len(self.nodes)
+            self.nodes.append(node)
+
+    def remove(self, node):
+        self.nodes[self.position.pop(node)] = None
+
+
+def _first_close_pair(order, start, spatial_hash, cutoff):
+    """
+    The first pair of positions (i, j), i >= start, j > i, (in lexicographic
+    order) of nodes closer than cutoff or None.
+    """
+    for i in range(start, len(order.nodes)):
+        node = order.nodes[i]
+        if node is None:
+            continue
+        partners = [order.position[other] for other in spatial_hash.near(node)
+                    if order.position[other] > i and ftuv.vec_distance(node, other) < cutoff]
+        if partners:
+            return i, min(partners)
+    return None
+
+
+def _first_close_pair_with(order, spatial_hash, node, cutoff, start):
+    """
+    The minimum of start and the first position of all pairs of node with
+    another node closer than cutoff.
+    """
+    for other in spatial_hash.near(node):
+        if other != node and ftuv.vec_distance(node, other) < cutoff:
+            start = min(start, order.position[node], order.position[other])
+    return start
+
+
+#: A compact representation of the projection graph.
+#: nodes is a list of all nodes (coordinate tuples), coords a (n, 2) array
+#: of the same coordinates, neighbors a list with a list of neighbor
+#: indices for every node and degrees an array with the degree of every
+#: node (self-loops counting twice, like in networkx).
+_Adjacency = col.namedtuple("_Adjacency", ["nodes", "coords", "neighbors", "degrees"])
+
+
 class Projection2D(object):
     """
     A 2D Projection of a CoarseGrainRNA unto a 2D-plane
@@ -240,13 +558,6 @@ def __init__(self, cg, proj_direction=None, rotation=0, project_virtual_atoms=Fa
         :param rotate: Degrees. Rotate the projection by this amount.
 
         """
-        #: The projected coordinates of all stems
-        self._coords = dict()
-
-        self._cross_points = None
-        self._proj_graph = None
-
-        # Calculate orthonormal basis of projection plane.
         # Compare to none, because `if np.array:` raises ValueError.
         if proj_direction is not None:
             proj_direction = np.array(proj_direction, dtype=np.float)
@@ -257,29 +568,57 @@ def __init__(self, cg, proj_direction=None, rotation=0, project_virtual_atoms=Fa
         else:
             raise ValueError(
                 "No projection direction given and none present in the cg Object.")
+        projector = Projector(cg, project_virtual_atoms, project_virtual_residues)
+        points = projector.project_points(proj_direction)[0]
+        self._init_from_points(projector, proj_direction, points, rotation)
+
+    @classmethod
+    def _from_points(cls, projector, proj_direction, points, rotation=0):
+        """
+        Create a projection from the coordinates of projector.coords,
+        already projected onto the projection plane.
+        """
+        self = cls.__new__(cls)
+        self._init_from_points(projector, proj_direction, points, rotation)
+        return self
+
+    def _init_from_points(self, projector, proj_direction, points, rotation):
+        self._cross_points = None
+        self._proj_graph = None
+        self._proj_direction = proj_direction
         _, unit_vec1, unit_vec2 = ftuv.create_orthonormal_basis(proj_direction)
         self._unit_vec1 = unit_vec1
         self._unit_vec2 = unit_vec2
-        self._proj_direction = proj_direction
+        self.virtual_residue_numbers = projector.virtual_residue_numbers
+        #: The projected coordinates of all stems
+        self._coords = dict()
+        for i, key in enumerate(projector.elements):
+            self._coords[key] = (points[2 * i], points[2 * i + 1])
+        self._virtual_atoms = []
         self._virtual_residues = []
-        self.virtual_residue_numbers = project_virtual_residues
-        self._project(cg, project_virtual_atoms, project_virtual_residues)
+        if projector.project_virtual_atoms:
+            self._virtual_atoms = points[projector._virtual_atom_slice]
+        if self.virtual_residue_numbers:
+            self._virtual_residues = points[projector._virtual_residue_slice]
 
         # Rotate and translate projection into a standard orientation
-        points = list(self.points)
-        v1, v2 = diameter(points)
+        outline = points[projector._outline_indices]
+        #: The indices of the convex hull into list(self.points).
+        #: Rotations and translations do not change it.
+        self._hull = convex_hull(outline)
+        i, j = diameter_indices(outline, self._hull)
+        v1 = outline[i]
+        v2 = outline[j]
         #: The longest distance between any two points of the projection.
         self.longest_axis = ftuv.vec_distance(v1, v2)
 
-        v1 = np.array(v1)
-        v2 = np.array(v2)
         shift = (v1 + v2) / 2
         for key, edge in self._coords.items():
             self._coords[key] = (edge[0] - shift, edge[1] - shift)
 
-        if project_virtual_atoms:
+        if projector.project_virtual_atoms:
             self._virtual_atoms = self._virtual_atoms - shift
-        if project_virtual_residues:
+        if self.virtual_residue_numbers:
             self._virtual_residues = self._virtual_residues - shift
         rot = math.atan2(*(v2 - v1))
         rot = math.degrees(rot)
@@ -290,9 +629,9 @@ def __init__(self, cg, proj_direction=None, rotation=0, project_virtual_atoms=Fa
         for key, edge in self._coords.items():
             self._coords[key] = (edge[0] - mean, edge[1] - mean)
         # Thanks to numpy broadcasting, this works without a loop.
-        if project_virtual_atoms:
+        if projector.project_virtual_atoms:
             self._virtual_atoms = self._virtual_atoms - mean
-        if project_virtual_residues:
+        if self.virtual_residue_numbers:
             self._virtual_residues = self._virtual_residues - mean
         # From this, further rotate if requested by the user.
         if rotation != 0:
@@ -335,9 +674,64 @@ def condense_points(self, cutoff=1):
         """
         if cutoff <= 0:
             return
-        while self._condense_one(cutoff):
-            pass
-        self.proj_graph.remove_edges_from(self.proj_graph.selfloop_edges())
+        graph = self.proj_graph
+        order = _NodeOrder(graph.nodes())
+        spatial_hash = _SpatialHash(cutoff, graph.nodes())
+        self._condense_close_points(order, spatial_hash, cutoff, 0)
+        self._remove_selfloops(list(graph.nodes()))
+
+    def _condense_close_points(self, order, spatial_hash, cutoff, start):
+        """
+        Used by `condense_points` and `condense`.
+
+        Merge nodes closer than cutoff, until no such pair is left.
+        All nodes before position start must not have any node closer
+        than cutoff.
+        order and spatial_hash are updated with every merge.
+
+        :returns: A set of nodes, which were created or got new edges.
+        """
+        graph = self.proj_graph
+        changed = set()
+        while True:
+            # Like comparing all pairs of nodes (in the order of graph.nodes())
+            # and condensing the first pair closer than cutoff.
+            pair = _first_close_pair(order, start, spatial_hash, cutoff)
+            if pair is None:
+                return changed
+            i, j = pair
+            node1, node2 = order.nodes[i], order.nodes[j]
+            newnode = self._merge_nodes(node1, node2)
+            changed |= self._update_node_order(order, spatial_hash, (node1, node2, newnode))
+            # All nodes before position i had no partner closer than cutoff.
+            # Only the new node can be a partner for them now.
+            start = _first_close_pair_with(order, spatial_hash, newnode, cutoff, i)
+
+    def _update_node_order(self, order, spatial_hash, nodes):
+        """
+        Add or remove the nodes to/from order and spatial_hash, if they were added
+        to or removed from the projection graph.
+        The last node has to be the node all modified edges are attached to.
+
+        :returns: A set with this last node and its neighbors.
+        """
+        graph = self.proj_graph
+        for node in nodes:
+            if node in graph and node not in order:
+                order.add(node)
+                spatial_hash.add(node)
+            elif node not in graph and node in order:
+                order.remove(node)
+                spatial_hash.discard(node)
+        return set(graph.adj[nodes[-1]]) | set([nodes[-1]])
+
+    def _remove_selfloops(self, nodes):
+        """
+        Remove the self-loops of all given nodes from the projection graph.
+        """
+        graph = self.proj_graph
+        graph.remove_edges_from([(node, node) for node in nodes
+                                 if node in graph and graph.has_edge(node, node)])
 
     def condense(self, cutoff):
         """
@@ -360,9 +754,33 @@ def condense(self, cutoff):
         """
         if cutoff <= 0:
             return
-        self.condense_points(cutoff)
-        while self._condense_pointWithLine_step(cutoff):
-            self.condense_points(cutoff)
+        graph = self.proj_graph
+        order = _NodeOrder(graph.nodes())
+        spatial_hash = _SpatialHash(cutoff, graph.nodes())
+        self._condense_close_points(order, spatial_hash, cutoff, 0)
+        self._remove_selfloops(list(graph.nodes()))
+        start = 0
+        while True:
+            # Like condensing the first node close to a line segment
+            # and then all close nodes, starting at the first node every time.
+            size = len(order.nodes)
+            step = self._condense_pointWithLine_step(order, spatial_hash, cutoff, start)
+            if step is None:
+                break
+            start, newnode, changed = step
+            # Before the line step, no two nodes were closer than cutoff.
+            if newnode in graph:
+                changed |= self._condense_close_points(
+                    order, spatial_hash, cutoff,
+                    _first_close_pair_with(order, spatial_hash, newnode, cutoff,
+                                           len(order.nodes)))
+            changed = [node for node in changed if node in graph]
+            self._remove_selfloops(changed)
+            # The line segments of all nodes before start were not close to any node.
+            # This changes only for nodes with new edges and lines close to new nodes.
+            new_nodes = [node for node in changed if order.position[node] >= size]
+            start = min([start] + [order.position[node] for node in changed])
+            start = self._first_line_close_to(order, new_nodes, cutoff, start)
 
     ### Get virtual residues ###
     @property
@@ -395,13 +813,15 @@ def crossingPoints(self):
         """
         if self._cross_points is None:
             self._cross_points = col.defaultdict(list)
-            for key1, key2 in it.combinations(self._coords, 2):
+            keys = list(self._coords)
+            segments = np.array([self._coords[key] for key in keys])
+            for i, j in segment_intersection_candidates(segments):
+                key1, key2 = keys[i], keys[j]
                 for cr in ftuv.seg_intersect(self._coords[key1], self._coords[key2]):
                     self._cross_points[key1].append((cr, key2))
                     self._cross_points[key2].append((cr, key1))
         return self._cross_points
 
-    # Note: This is SLOW the first time it is called. Should be avoided as much as possible.
     @property
     def proj_graph(self):
         """A graph describing the projected RNA.
@@ -427,6 +847,19 @@ def points(self):
         return (p for k, x in self._coords.items() for p in x if k[0] != "i" and k[0] != "m")
     ### Functions returning descriptors of the projection, mostly independent on the resolution ###
 
+    def get_convex_hull(self):
+        """
+        The corners of the convex hull of the projection.
+
+        The hull is calculated once, when the projection is created.
+
+        :returns: An array of shape (m, 2), the corners in clockwise order,
+                  starting with the leftmost point.
+        """
+        U, L = self._hull
+        points = np.array(list(self.points))
+        return points[U + L[-2:0:-1]]
+
     ### Function returning descriptors of the projection, dependent on the resolution ###
     def get_bounding_box(self, margin=0.):
         """
@@ -504,10 +937,13 @@ def get_total_length(self):
             Whether this code will stay in the library or not depends
             on future evaluation of the usefulness of this and similar descriptors.
         """
+        adjacency = self._adjacency()
+        edges = np.array([(i, j) for i, nbs in enumerate(adjacency.neighbors)
+                          for j in nbs if j >= i], dtype=int).reshape((-1, 2))
         l = 0
-        for edge in self.proj_graph.edges():
-            l += ftuv.vec_distance(edge[0], edge[1])
-        return l
+        for length in _point_distances(adjacency.coords, edges[:, 0], edges[:, 1]):
+            l += length
+        return float(l)
 
     def get_longest_arm_length(self):
         """
@@ -525,28 +961,26 @@ def get_longest_arm_length(self):
 
         :returns: The length and a tuple of points `(leaf_node, corresponding_branch_point)`
         """
-        import networkx as nx
+        adjacency = self._adjacency()
         lengths = {}
         target = {}
-        for leaf, degree in nx.degree(self.proj_graph):
-            if degree != 1:
-                continue
+        for leaf in np.flatnonzero(adjacency.degrees == 1):
             lengths[leaf] = 0
             previous = None
             current = leaf
             while True:
-                next = [x for x in self.proj_graph[current].keys() if x !=
-                        previous]
+                next = [x for x in adjacency.neighbors[current] if x != previous]
                 assert len(next) == 1
                 next = next[0]
-                lengths[leaf] += ftuv.vec_distance(current, next)
-                if self.proj_graph.degree(next) != 2:
+                lengths[leaf] += _point_distances(adjacency.coords, current, next)
+                if adjacency.degrees[next] != 2:
                     break
                 previous = current
                 current = next
             target[leaf] = next
         best_leaf = max(lengths, key=lambda x: lengths[x])
-        return lengths[best_leaf], (best_leaf, target[best_leaf])
+        return (float(lengths[best_leaf]),
+                (adjacency.nodes[best_leaf], adjacency.nodes[target[best_leaf]]))
 
     def get_leaf_leaf_distances(self):
         """
@@ -559,11 +993,7 @@ def get_leaf_leaf_distances(self):
 
         :returns: a list of floats (lengths in Angstrom)
         """
-        lengths = []
-        leaves = [leaf for leaf in self.proj_graph.nodes(
-        ) if self.proj_graph.degree(leaf) == 1]
-        for leaf1, leaf2 in it.combinations(leaves, 2):
-            lengths.append(ftuv.vec_distance(leaf1, leaf2))
+        lengths = [l for l, _, _ in self._leaf_leaf_distances()]
         lengths.sort(reverse=True)
         return lengths
 
@@ -578,11 +1008,7 @@ def get_some_leaf_leaf_distances(self):
 
         :returns: a list of floats (lengths in Angstrom)
         """
-        lengths = []
-        leaves = [leaf for leaf in self.proj_graph.nodes(
-        ) if self.proj_graph.degree(leaf) == 1]
-        for leaf1, leaf2 in it.combinations(leaves, 2):
-            lengths.append((ftuv.vec_distance(leaf1, leaf2), leaf1, leaf2))
+        lengths = self._leaf_leaf_distances()
         lengths.sort(reverse=True, key=lambda x: x[0])
         newlengths = []
         visited = set()
@@ -608,18 +1034,39 @@ def get_maximal_path_length(self):
             on future evaluation of the usefulness of this and similar descriptors.
 
         """
-        import networkx as nx
+        adjacency = self._adjacency()
+        neighbors = [sorted(set(nbs) - set([i]))
+                     for i, nbs in enumerate(adjacency.neighbors)]
+        edge_lengths = {}
+        for i, nbs in enumerate(neighbors):
+            for j, length in zip(nbs, _point_distances(adjacency.coords, i, nbs)):
+                edge_lengths[i, j] = length
         maxl = 0
-        for i, node1 in enumerate(self.proj_graph.nodes()):
-            for j, node2 in enumerate(self.proj_graph.nodes()):
-                if j <= i:
-                    continue
-                all_paths = nx.all_simple_paths(self.proj_graph, node1, node2)
-                for path in all_paths:
-                    l = self._get_path_length(path)
-                    if l > maxl:
-                        maxl = l
-        return maxl
+        # Depth first search of all simple paths starting at every node.
+        # Like in _get_path_length, the length of every path is summed up
+        # from the node with the lower index.
+        for start in range(len(neighbors)):
+            stack = [(start, 0, (start,))]
+            while stack:
+                node, l, path = stack.pop()
+                if node > start and l > maxl:
+                    maxl = l
+                for neighbor in neighbors[node]:
+                    if neighbor not in path:
+                        stack.append((neighbor, l + edge_lengths[node, neighbor],
+                                      path + (neighbor,)))
+        return float(maxl)
+
+    def _leaf_leaf_distances(self):
+        """
+        :returns: A list of tuples (distance, leaf1, leaf2) for all pairs of leaves.
+        """
+        adjacency = self._adjacency()
+        leaves = np.flatnonzero(adjacency.degrees == 1)
+        index1, index2 = np.triu_indices(len(leaves), 1)
+        distances = _point_distances(adjacency.coords, leaves[index1], leaves[index2])
+        return [(float(l), adjacency.nodes[leaves[i]], adjacency.nodes[leaves[j]])
+                for l, i, j in zip(distances, index1, index2)]
 
     ### Functions for graphical representations of the projection ###
     @profile
@@ -627,7 +1074,8 @@ def rasterize(self, resolution=50, bounding_square=None, warn=True,
                   virtual_atoms=True, rotate=0, virtual_residues=True):
         """
         Rasterize the projection to a square image of the given resolution.
-        Uses the Bresenham algorithm for line rasterization.
+        Uses the Bresenham algorithm for line rasterization
+        (see `bresenham_segments`).
 
         :param resolution:
                         The number of pixels in each direction.
@@ -658,42 +1106,19 @@ def rasterize(self, resolution=50, bounding_square=None, warn=True,
         steplength = (box[1] - box[0]) / resolution
         image = np.zeros([resolution, resolution], dtype=np.float32)
         img_length = len(image)
-        angle = math.radians(rotate)
-        c = np.cos(angle)
-        s = np.sin(angle)
-        starts = []
-        ends = []
-        for label in self._coords:
-            if virtual_atoms and len(self._virtual_atoms):
-                if label[0] == "s":
-                    continue
-            starts.append(self._coords[label][0])
-            ends.append(self._coords[label][1])
-        starts = np.array(starts)
-        ends = np.array(ends)
-        starts = rasterized_2d_coordinates(
-            starts, steplength, np.array([box[0], box[2]]), rotate)
-        ends = rasterized_2d_coordinates(
-            ends, steplength, np.array([box[0], box[2]]), rotate)
-        for i in range(len(starts)):
-            points = bresenham(tuple(starts[i]), tuple(ends[i]))
-            for p in points:
-                if 0 <= p[0] < img_length and 0 <= p[1] < img_length:
-                    image[p[0], p[1]] = 1
-                else:
-                    if warn:
-                        warnings.warn("WARNING during rasterization of the 2D Projection: "
-                                      "Parts of the projection are cropped off.")
-        if virtual_atoms and len(self._virtual_atoms):
-            rot_virtual_atoms = rasterized_2d_coordinates(
-                self._virtual_atoms, steplength, np.array([box[0], box[2]]), rotate)
-            rot_virtual_atoms_clip = crop_coordinates_to_bounds(
-                rot_virtual_atoms, img_length)
-            if warn and (rot_virtual_atoms_clip != rot_virtual_atoms).any():
+        lines, atoms = self._rasterized_points(steplength, np.array([box[0], box[2]]),
+                                               rotate, virtual_atoms)
+        in_bounds = np.all((lines >= 0) & (lines < img_length), axis=1)
+        if warn and not np.all(in_bounds):
+            warnings.warn("WARNING during rasterization of the 2D Projection: "
+                          "Parts of the projection are cropped off.")
+        image[lines[in_bounds, 0], lines[in_bounds, 1]] = 1
+        if atoms is not None:
+            atoms_clip = crop_coordinates_to_bounds(atoms, img_length)
+            if warn and (atoms_clip != atoms).any():
                 warnings.warn("WARNING during rasterization of virtual atoms: "
                               "Parts of the projection are cropped off.")
-            image[rot_virtual_atoms_clip[:, 0],
-                  rot_virtual_atoms_clip[:, 1]] = 1
+            image[atoms_clip[:, 0], atoms_clip[:, 1]] = 1
         if virtual_residues and self.virtual_residue_numbers:
             image = to_rgb(image)
             rot_virtual_res = rasterized_2d_coordinates(
@@ -709,6 +1134,82 @@ def rasterize(self, resolution=50, bounding_square=None, warn=True,
                                       "Parts of the projection are cropped off.")
         return image, steplength
 
+    def _line_coords(self, virtual_atoms):
+        """
+        The start and end points of all lines drawn by rasterize.
+        Stems are not drawn, if they are represented by virtual atoms.
+        """
+        starts = []
+        ends = []
+        for label in self._coords:
+            if virtual_atoms and len(self._virtual_atoms):
+                if label[0] == "s":
+                    continue
+            starts.append(self._coords[label][0])
+            ends.append(self._coords[label][1])
+        return np.array(starts).reshape((-1, 2)), np.array(ends).reshape((-1, 2))
+
+    def _rasterized_points(self, steplength, origin, rotate, virtual_atoms,
+                           line_coords=None):
+        """
+        The grid cells of all lines and virtual atoms, not cropped to the image.
+
+        :returns: A tuple (line_points, atom_points). atom_points is None,
+                  if no virtual atoms are rasterized.
+        """
+        if line_coords is None:
+            line_coords = self._line_coords(virtual_atoms)
+        starts, ends = line_coords
+        starts = rasterized_2d_coordinates(starts, steplength, origin, rotate)
+        ends = rasterized_2d_coordinates(ends, steplength, origin, rotate)
+        lines, _ = bresenham_segments(starts, ends)
+        if virtual_atoms and len(self._virtual_atoms):
+            atoms = rasterized_2d_coordinates(self._virtual_atoms, steplength,
+                                              origin, rotate)
+        else:
+            atoms = None
+        return lines, atoms
+
+    def rasterize_batch(self, resolution, bounding_squares, rotations=0,
+                        virtual_atoms=True):
+        """
+        Rasterize the projection for many bounding squares (i.e. offsets)
+        and in-plane rotations at once.
+
+        The images are the same as the ones returned by `rasterize`
+        (with warn=False and virtual_residues=False), but as a boolean stack.
+
+        :param resolution: The number of pixels in each direction.
+        :param bounding_squares: A sequence of n bounding squares or a single
+                                 bounding square used for all images.
+        :param rotations: A sequence of n in-plane rotations in degrees or
+                          a single rotation used for all images.
+        :param virtual_atoms: If True, virtual atoms are also rasterized.
+        :returns: A tuple `(images, steplengths)`, where images is a boolean
+                  array of shape (n, resolution, resolution) and steplengths
+                  an array with the length of one pixel in every image.
+        """
+        bounding_squares = np.asarray(bounding_squares, dtype=float)
+        if bounding_squares.ndim == 1:
+            bounding_squares = bounding_squares[np.newaxis]
+        rotations = np.atleast_1d(np.asarray(rotations, dtype=float))
+        n = max(len(bounding_squares), len(rotations))
+        bounding_squares = np.broadcast_to(bounding_squares, (n, 4))
+        rotations = np.broadcast_to(rotations, (n,))
+        steplengths = (bounding_squares[:, 1] - bounding_squares[:, 0]) / resolution
+        line_coords = self._line_coords(virtual_atoms)
+        images = np.zeros((n, resolution, resolution), dtype=bool)
+        for i in range(n):
+            lines, atoms = self._rasterized_points(
+                steplengths[i], bounding_squares[i, [0, 2]], rotations[i],
+                virtual_atoms, line_coords)
+            in_bounds = np.all((lines >= 0) & (lines < resolution), axis=1)
+            images[i, lines[in_bounds, 0], lines[in_bounds, 1]] = True
+            if atoms is not None:
+                atoms = crop_coordinates_to_bounds(atoms, resolution)
+                images[i, atoms[:, 0], atoms[:, 1]] = True
+        return images, steplengths
+
     def plot(self, ax=None, show=False, margin=5,
              linewidth=None, add_labels=False,
              line2dproperties={}, xshift=0, yshift=0,
@@ -1012,123 +1513,121 @@ def _build_proj_graph(self):
             for point in sortedCrs:
                 point = (point[0], point[1])  # Tuple, to be hashable
                 if oldpoint is not None:
-                    proj_graph.add_edge(
-                        oldpoint, point, attr_dict={"label": key})
+                    proj_graph.add_edge(oldpoint, point, label=key)
                 oldpoint = point
         self._proj_graph = proj_graph
         self.condense_points(0.00000000001)  # To avoid floating point problems
 
-    @profile
-    def _project(self, cg, project_virtual_atoms, project_virtual_residues):
+    def _merge_nodes(self, node1, node2):
         """
-        Calculates the 2D coordinates of all coarse grained elements by vector rejection.
-        Stores them inside self._coords
+        Replace two nodes of the projection graph by a new node in the
+        middle between them, connected to all their neighbors.
+
+        :returns: The new node
         """
-        self._coords = dict()
-        self._virtual_atoms = []
-        basis = np.array([self._unit_vec1, self._unit_vec2]).T
-        # Project all coordinates to this plane
-        for key in cg.sorted_element_iterator():
-            val = cg.coords[key]
-            start = np.dot(val[0], basis)
-            end = np.dot(val[1], basis)
-            self._coords[key] = (start, end)
-        va = []
-        if project_virtual_atoms:
-            for residuePos in range(1, cg.seq_length + 1):
-                residue = cg.virtual_atoms(residuePos)
-                if project_virtual_atoms == "selected":
-                    try:
-                        va.append(residue['P'])
-                    except KeyError:
-                        pass
-                    try:
-                        va.append(residue["C1'"])
-                    except KeyError:
-                        assert False  # Should never happen
-                    try:
-                        va.append(residue['C1'])
-                    except KeyError:
-                        pass
-                    try:
-                        va.append(residue["O3'"])
-                    except KeyError:
-                        pass
-                else:
-                    for pos in residue.values():
-                        va.append(pos)
-            if va:
-                self._virtual_atoms = np.dot(np.array(va), basis)
-            else:
-                warnings.warn("No virtual atoms present in {} of length {}!".format(
-                    cg.name, len(cg.seq)))
-        vr = []
-        for res in project_virtual_residues:
-            vr.append(np.dot(cg.get_virtual_residue(res, True), basis))
-        assert len(vr) == len(project_virtual_residues)
-        if vr:
-            self._virtual_residues = np.array(vr)
+        graph = self.proj_graph
+        newnode = ftuv.middlepoint(node1, node2)
+        for neighbor in list(graph.adj[node1].keys()):
+            graph.add_edge(newnode, neighbor, **graph.adj[node1][neighbor])
+        for neighbor in list(graph.adj[node2].keys()):
+            graph.add_edge(newnode, neighbor, **graph.adj[node2][neighbor])
+        if newnode != node1:  # Equality can happen because of floating point inaccuracy
+            graph.remove_node(node1)
+        if newnode != node2:
+            graph.remove_node(node2)
+        return newnode
+
+    def _condense_pointWithLine_step(self, order, spatial_hash, cutoff, start):
+        """
+        Used by `self.condense(cutoff)` as a single condensation step of a point
+        with a line segment.
+
+        Only line segments starting at a position >= start in order are searched.
+        order and spatial_hash are updated.
 
-    def _condense_one(self, cutoff):
+        :returns: None, if no node was close to a line segment, else a tuple
+                  (position of the line start, new node, set of nodes with new edges)
+        """
+        graph = self.proj_graph
+        position = order.position
+        for i in range(start, len(order.nodes)):
+            source = order.nodes[i]
+            if source is None:
+                continue
+            for j in sorted(position[target] for target in graph.adj[source]
+                            if position[target] > i):
+                target = order.nodes[j]
+                for k in self._nodes_near_line(order, spatial_hash, source, target, cutoff):
+                    if k == i or k == j:
+                        continue
+                    node = order.nodes[k]
+                    nearest = ftuv.closest_point_on_seg(source, target, node)
+                    nearest = tuple(nearest)
+                    if nearest == source or nearest == target:
+                        continue
+                    if (ftuv.vec_distance(nearest, node) < cutoff):
+                        newnode = ftuv.middlepoint(node, tuple(nearest))
+                        attr_dict = dict(graph.adj[source][target])
+                        graph.remove_edge(source, target)
+                        if source != newnode:
+                            graph.add_edge(source, newnode, **attr_dict)
+                        if target != newnode:
+                            graph.add_edge(target, newnode, **attr_dict)
+                        if newnode != node:  # Equality possible bcse of floating point inaccuracy
+                            for neighbor in list(graph.adj[node].keys()):
+                                attr_dict = graph.adj[node][neighbor]
+                                graph.add_edge(newnode, neighbor, **attr_dict)
+                            graph.remove_node(node)
+                        changed = self._update_node_order(order, spatial_hash,
+                                                          (node, newnode))
+                        return i, newnode, changed
+        return None
+
+    @staticmethod
+    def _nodes_near_line(order, spatial_hash, source, target, cutoff):
+        """
+        The sorted positions of all nodes, which could be closer than cutoff
+        to the line segment from source to target.
         """
-        Condenses two adjacent projection points into one.
+        # Slightly larger than cutoff, to account for rounding errors.
+        margin = cutoff * (1 + 1e-9) + 1e-9
+        lower = np.minimum(source, target) - margin
+        upper = np.maximum(source, target) + margin
+        return sorted(order.position[node] for node in spatial_hash.in_rectangle(lower, upper))
 
-        :returns: True if a condensation was done, False if no condenstaion is possible.
+    def _first_line_close_to(self, order, nodes, cutoff, start):
         """
-        for i, node1 in enumerate(self.proj_graph.nodes()):
-            for j, node2 in enumerate(self.proj_graph.nodes()):
-                if j <= i:
-                    continue
-                if ftuv.vec_distance(node1, node2) < cutoff:
-                    newnode = ftuv.middlepoint(node1, node2)
-                    # self.proj_graph.add_node(newnode)
-                    for neighbor in list(self.proj_graph.adj[node1].keys()):
-                        self.proj_graph.add_edge(newnode, neighbor,
-                                                 attr_dict=self.proj_graph.adj[node1][neighbor])
-                    for neighbor in list(self.proj_graph.adj[node2].keys()):
-                        self.proj_graph.add_edge(newnode, neighbor,
-                                                 attr_dict=self.proj_graph.adj[node2][neighbor])
-                    if newnode != node1:  # Equality can happen because of floating point inaccuracy
-                        self.proj_graph.remove_node(node1)
-                    if newnode != node2:
-                        self.proj_graph.remove_node(node2)
-                    return True
-        return False
-
-    def _condense_pointWithLine_step(self, cutoff):
+        The minimum of start and the position of the first line segment
+        (by the position of its first node), which could be closer than
+        cutoff to one of the given nodes.
         """
-        Used by `self.condense(cutoff)` as a single condensation step of a point
-        with a line segment.
+        if not nodes:
+            return start
+        graph = self.proj_graph
+        position = order.position
+        spatial_hash = _SpatialHash(cutoff, nodes)
+        for i in range(start):
+            source = order.nodes[i]
+            if source is None:
+                continue
+            for target in graph.adj[source]:
+                if (position[target] > i and
+                        self._nodes_near_line(order, spatial_hash, source, target, cutoff)):
+                    return i
+        return start
+
+    def _adjacency(self):
+        """
+        :returns: The projection graph as an _Adjacency
         """
-        for i, source in enumerate(self.proj_graph.nodes()):
-            for j, target in enumerate(self.proj_graph.nodes()):
-                if j > i and self.proj_graph.has_edge(source, target):
-                    for k, node in enumerate(self.proj_graph.nodes()):
-                        if k == i or k == j:
-                            continue
-                        nearest = ftuv.closest_point_on_seg(
-                            source, target, node)
-                        nearest = tuple(nearest)
-                        if nearest == source or nearest == target:
-                            continue
-                        if (ftuv.vec_distance(nearest, node) < cutoff):
-                            newnode = ftuv.middlepoint(node, tuple(nearest))
-                            attr_dict = self.proj_graph.adj[source][target]
-                            self.proj_graph.remove_edge(source, target)
-                            if source != newnode:
-                                self.proj_graph.add_edge(
-                                    source, newnode, attr_dict=attr_dict)
-                            if target != newnode:
-                                self.proj_graph.add_edge(target, newnode,
-                                                         attr_dict=attr_dict)
-                            if newnode != node:  # Equality possible bcse of floating point inaccuracy
-                                for neighbor in self.proj_graph.adj[node].keys():
-                                    attr_dict = self.proj_graph.adj[node][neighbor]
-                                    self.proj_graph.add_edge(newnode, neighbor,
-                                                             attr_dict=attr_dict)
-                                self.proj_graph.remove_node(node)
-                            return True
-        return False
+        nodes = list(self.proj_graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        neighbors = [[index[neighbor] for neighbor in self.proj_graph.adj[node]]
+                     for node in nodes]
+        degrees = np.array([len(nbs) + nbs.count(i) for i, nbs in enumerate(neighbors)],
+                           dtype=int)
+        coords = np.array(nodes, dtype=float).reshape((-1, 2))
+        return _Adjacency(nodes, coords, neighbors, degrees)
 
     def _get_path_length(self, path):
         """
@@ -1138,3 +1637,124 @@ def _get_path_length(self, path):
         for i in range(len(path) - 1):
             l += ftuv.vec_distance(path[i], path[i + 1])
         return l
+
+
+class Projector(object):
+    """
+    Project one CoarseGrainRNA onto many directions.
+
+    The 3D coordinates needed for a Projection2D (the start and end points
+    of all coarse grained elements, the virtual atoms and the virtual residues)
+    are gathered only once into the (n x 3) array `coords`.
+    All projection directions are then projected with a single matrix
+    multiplication.
+    """
+
+    def __init__(self, cg, project_virtual_atoms=False, project_virtual_residues=[]):
+        """
+        :param cg: a CoarseGrainRNA object with 3D coordinates for every element.
+                   Like for Projection2D, later changes of the cg are not
+                   reflected in the projections.
+        :param project_virtual_atoms: See Projection2D
+        :param project_virtual_residues: See Projection2D
+        """
+        #: The coarse grained elements, in the order of their coordinates
+        self.elements = list(cg.sorted_element_iterator())
+        self.project_virtual_atoms = project_virtual_atoms
+        self.virtual_residue_numbers = project_virtual_residues
+        coords = [cg.coords[key][i] for key in self.elements for i in range(2)]
+        va = []
+        if project_virtual_atoms:
+            va = self._gather_virtual_atoms(cg, project_virtual_atoms)
+            if not va:
+                warnings.warn("No virtual atoms present in {} of length {}!".format(
+                    cg.name, len(cg.seq)))
+        vr = [cg.get_virtual_residue(res, True)
+              for res in project_virtual_residues]
+        self._virtual_atom_slice = slice(len(coords), len(coords) + len(va))
+        self._virtual_residue_slice = slice(len(coords) + len(va),
+                                            len(coords) + len(va) + len(vr))
+        #: The 3D coordinates of all points, which are projected.
+        self.coords = np.array(coords + va + vr, dtype=float).reshape((-1, 3))
+        # The rows of the points of Projection2D.points, which define
+        # the outline (and longest_axis) of a projection.
+        # Interior loops and multiloops are always flanked by stems.
+        self._outline_indices = np.array([2 * i + j
+                                          for i, key in enumerate(self.elements)
+                                          if key[0] != "i" and key[0] != "m"
+                                          for j in range(2)], dtype=int)
+
+    @staticmethod
+    def _gather_virtual_atoms(cg, project_virtual_atoms):
+        va = []
+        for residuePos in range(1, cg.seq_length + 1):
+            residue = cg.virtual_atoms(residuePos)
+            if project_virtual_atoms == "selected":
+                try:
+                    va.append(residue['P'])
+                except KeyError:
+                    pass
+                try:
+                    va.append(residue["C1'"])
+                except KeyError:
+                    assert False  # Should never happen
+                try:
+                    va.append(residue['C1'])
+                except KeyError:
+                    pass
+                try:
+                    va.append(residue["O3'"])
+                except KeyError:
+                    pass
+            else:
+                for pos in residue.values():
+                    va.append(pos)
+        return va
+
+    def project_points(self, proj_directions):
+        """
+        Project `coords` onto the projection planes of many directions.
+
+        :param proj_directions: An array of shape (k, 3) or a single direction.
+        :returns: An array of shape (k, n, 2) with the coordinates in the
+                  orthonormal basis of every projection plane.
+        """
+        proj_directions = np.asarray(proj_directions, dtype=float).reshape((-1, 3))
+        bases = np.array([ftuv.create_orthonormal_basis(direction)[1:]
+                          for direction in proj_directions]).reshape((-1, 2, 3))
+        return np.matmul(self.coords, bases.transpose((0, 2, 1)))
+
+    def longest_axis_bounds(self, proj_directions, num_directions=8):
+        """
+        Lower and upper bounds for the `longest_axis` of the projections onto
+        many directions, without creating the Projection2D objects.
+
+        :param proj_directions: An array of shape (k, 3) or a single direction.
+        :param num_directions: See `diameter_bounds`
+        :returns: A tuple of arrays (lower, upper) of shape (k,)
+        """
+        points = self.project_points(proj_directions)[:, self._outline_indices]
+        return diameter_bounds(points, num_directions)
+
+    def projections(self, proj_directions, rotation=0):
+        """
+        Create the Projection2D objects for many directions.
+
+        The projections only hold the projected coordinates and are
+        identical to the ones created with
+        `Projection2D(cg, proj_direction, rotation, ...)`
+
+        :param proj_directions: An array of shape (k, 3)
+        :param rotation: Degrees. Rotate all projections by this amount.
+        :returns: A list of k Projection2D objects.
+        """
+        proj_directions = np.array(proj_directions, dtype=float).reshape((-1, 3))
+        points = self.project_points(proj_directions)
+        return [Projection2D._from_points(self, direction, direction_points, rotation)
+                for direction, direction_points in zip(proj_directions, points)]
+
+    def projection(self, proj_direction, rotation=0):
+        """
+        Like `projections`, but for a single direction.
+        """
+        return self.projections([proj_direction], rotation)[0]
@@ -0,0 +1,196 @@
+"""
+The scikit-learn compatible AMinorClassifier.
+
+scikit-learn is only imported, when a classifier is fitted or scored,
+so classifying interactions with the pre-fitted default classifiers
+(see forgi.threedee.classification.aminor) does not need it.
+Use it as `forgi.threedee.classification.aminor.AMinorClassifier`.
+"""
+
+from __future__ import print_function, division, absolute_import
+
+import logging
+import warnings
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+P_INTERACTION = 0.05  # 0.03644949066213922
+
+
+def _interaction_probability(clf, X):
+    """
+    The probability of an interaction, given the log-densities of the
+    fitted classifier clf. See AMinorClassifier.
+    """
+    log.debug("Predicting for {}".format(X))
+    numerator = np.exp(clf.ame_kde_(X)) * clf.p_I
+    denom = numerator + np.exp(clf.non_ame_kde_(X)) * (1 - clf.p_I)
+    with warnings.catch_warnings():  # division by 0
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nan_to_num(numerator / denom)
+
+
+class AMinorClassifier(object):
+    """
+    A classifier that predicts A-Minor interactions based on the following formula:
+
+    .. math:: P(I|geo)=f(geo|I)/f(geo)*P(I)
+
+    where :math:`f` is a probability density and :math:`P` is a probability
+    and :math:`I` means interaction.
+
+    Since there are no interactions with more than 30 Angstrom distance,
+    interactions require an A in the loop sequence and estimating numerator
+    and denominator seperately could lead to probabilities greater than 1,
+    we use the following formula:
+
+    .. math:: P(I| (geo, d<30, A in seq)) = num/denom
+
+    where
+    .. math::
+
+        num=f(geo|I)*P(I|(d<30, A \\in seq))
+
+        denom=num+f(geo|(\\not I, d<30))*(1-P(I|(d<30, A \\in seq))
+
+    We estimate the probability densities as kernel density estimates.
+    For :math:`f(geo|I)` we use annotations created by FR3D-searches for
+    all 4 types of A-minor motifs.
+    We assume that :math:`f(geo|(\\not I, A \\in seq))== f(geo|(\\not I, A \\in seq))`
+    and that FR3D might miss some true interactions. Thus we estimate
+    :math:`f(geo|(\\not I, A \\in seq, d<30))` as
+    :math:`f(geo|(\\not I, A \\notin seq, d<30))`
+
+    Since both densities are normalized, it does not matter that we use a
+    different number of datapoints for their estimation.
+
+    We estimate P(I|(d<30, A \\in seq)) as the number of occurrences where
+    a loop with A is in an A-minor interaction, over the number of all
+    loop-stem pairs with less than 30 angstrom distance and an A in the sequence.
+
+    The classifier implements the scikit-learn estimator interface
+    (get_params, set_params, fit, predict and score), so it can be used
+    with e.g. sklearn.model_selection.GridSearchCV.
+    """
+    _estimator_type = "classifier"
+    _param_names = ("bandwidth", "kernel", "p_I", "symmetric")
+
+    def __init__(self, kernel="linear", bandwidth=0.3, symmetric=True, p_I=P_INTERACTION):
+        self.p_I = p_I
+        self.symmetric = symmetric
+        self.kernel = kernel
+        self.bandwidth = bandwidth
+
+    def fit(self, X, y):
+        """
+        Train the model.
+
+        :param X: A Nx3 array, where the features are
+                  distance(Angstrom)/10, angle1(rad), angle2(rad)
+                  The **distance** is the closest distance between the two line
+                  segments (i.e. coarse grained elementts)
+                  **angle1** is the angle between the line along the stem vector
+                  and the line along the shortest connection between the two
+                  elements. A an angle between two straight lines, it is
+                  defined between 0 and 90 degrees.
+                  **angle2** is the angle between the connecting vector
+                  (pointing from the stem to the loop), projected onto the
+                  plane normal to the stem direction and the twist vector
+                  (location of minor groove) at the point closest to the
+                  interaction. As an angle between two vectors, it is
+                  defined between 0 and 180 degrees.
+        :param y: An array of length N. 0 means no interaction,
+                  1 means interaction.
+        """
+        from sklearn.utils.validation import check_X_y
+        # Check that X and y have correct shape
+        X, y = check_X_y(X, y)
+        log.info("Trainings-data has shape {}".format(X.shape))
+        log.info("We have {} known interactions ".format(sum(y)))
+        if X.shape[1] != 3:
+            raise TypeError(
+                "Expect exactly 3 features, found {}".format(X.shape[1]))
+        if not all(yi in [0, 1] for yi in y):
+            raise ValueError("y should only contain the values 1 and 0")
+        ame = X[np.where(y)]
+        non_ame = X[np.where(y == 0)]
+        if self.symmetric:
+            ame = self._make_symmetric(ame)
+            non_ame = self._make_symmetric(non_ame)
+        log.info("Fitting. First positive sample: {}".format(X[np.where(y)][0]))
+        from sklearn.neighbors import KernelDensity
+        self.ame_ = ame
+        self.non_ame_ = non_ame
+        self.ame_kde_ = KernelDensity(kernel=self.kernel,
+                                      bandwidth=self.bandwidth).fit(ame).score_samples
+        self.non_ame_kde_ = KernelDensity(kernel=self.kernel,
+                                          bandwidth=self.bandwidth).fit(non_ame).score_samples
+        self.X_ = X
+        self.y_ = y
+
+    @staticmethod
+    def _make_symmetric(geos):
+        """
+        Make the trainingsdata symmetric around those bounds of the radial
+        variables, where we expect a high density.
+
+        Kernel density estimation does not work too well out of the box on
+        bounded support: Samples close to the boundary have create a
+        significant density outside the support. Due to symmetry considerations
+        of angular data, we can avoid this issue by adding symmetric datapoints
+        the following way: Mirror all datapoints along the plane
+        angle1=180 degrees (both angles between the two lines are equivalent) and
+        around the plane angle2==0 degrees (both rotational
+        directions are equivalent).
+        By creating 4 times as many datapoints, we avoid bias near the boundary.
+        """
+        geos = np.concatenate([geos,
+                               [(d, np.pi - a1, a2) for d, a1, a2 in geos]])
+        # We allow negative angles for angle2, so there is no need to make it symmetric.
+        # geos = np.concatenate([geos,
+        #                       [(d, a1, -a2) for d, a1, a2 in geos]])
+        return geos
+
+    def predict(self, X):
+        return self.predict_proba(X) > 0.5
+
+    def score(self, X, y):
+        """
+        The average between specificity and sensitivity
+        """
+        from sklearn.metrics import confusion_matrix
+        y_pred = self.predict(X)
+        tn, fp, fn, tp = confusion_matrix(y, y_pred).ravel()
+        specificity = tn / (tn + fp)
+        sensitivity = tp / (tp + fn)
+        return (0.8 * sensitivity + 0.2 * specificity)
+
+    def predict_proba(self, X):
+        # A fitted classifier has already imported scikit-learn.
+        from sklearn.utils.validation import check_array, check_is_fitted
+        check_is_fitted(self, ['ame_kde_', 'non_ame_kde_'])
+        X = check_array(X)
+        return _interaction_probability(self, X)
+
+    def get_params(self, deep=True):
+        return {name: getattr(self, name) for name in self._param_names}
+
+    def set_params(self, **kwargs):
+        """"""
+        for name, value in kwargs.items():
+            if name not in self._param_names:
+                raise ValueError("Invalid parameter {} for estimator "
+                                 "{}".format(name, self))
+            setattr(self, name, value)
+        # If it was fitted, we must propagate the parameter changes
+        # to the child-KDEs by refitting to the same data
+        if hasattr(self, "X_"):
+            self.fit(self.X_, self.y_)
+        return self
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__,
+                               ", ".join("{}={!r}".format(name, value)
+                                         for name, value in sorted(self.get_params().items())))
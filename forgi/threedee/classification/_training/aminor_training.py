@@ -91,6 +91,22 @@ def tune_model(geometry_file, trainset, testset):
                                                      pI, trainset, testset)
     return all_params
 
+def fit_models(geometry_file, hyper_params):
+    """
+    Fit the final classifiers on all geometries in the geometry file.
+
+    :param hyper_params: A dictionary {loop_type: params}, as
+                         returned by `tune_model`.
+    :returns: A dictionary {loop_type: AMinorClassifier}
+    """
+    df = pd.read_csv(geometry_file, comment="#", sep=" ")
+    clfs = {}
+    for loop_type, params in hyper_params.items():
+        clf = ftca.AMinorClassifier(**params)
+        clf.fit(*ftca.df_to_data_labels(df, loop_type))
+        clfs[loop_type] = clf
+    return clfs
+
 ################################################################################
 # Validate Model
 ################################################################################
@@ -8,6 +8,7 @@
 
 import forgi.utilities.commandline_utils as fuc
 import forgi.threedee.classification._training.aminor_training as ftcta
+import forgi.threedee.classification.aminor as ftca
 log = logging.getLogger(__name__)
 
 
@@ -42,6 +43,10 @@ def main():
                         default="forgi/threedee/data/aminor_params.json",
                         help="File that will be written for the "
                              "model's hyper-parameters.")
+    parser.add_argument("--model-out", type=str,
+                        default="forgi/threedee/data/aminor_model.npz",
+                        help="File that will be written for the pre-fitted "
+                             "models, which are used as default classifiers.")
     parser.add_argument("--test-set", type=str, help="':'-separated PDB-ids"
                                                      " for the test-set.")
     parser.add_argument("--train-set", type=str,
@@ -59,6 +64,8 @@ def main():
         args.trainingsdata_out, args.train_set, args.test_set)
     with open(args.model_params_out, "w") as f:
         json.dump(hyper_params, f)
+    clfs = ftcta.fit_models(args.trainingsdata_out, hyper_params)
+    ftca.write_model_file(args.model_out, clfs)
 
 
 if __name__ == "__main__":
@@ -15,6 +15,12 @@
 
 Access the default trainings data with the get_trainings_data(loop_type)
 function.
+
+The default classifiers are loaded from a pre-fitted model file
+(`threedee/data/aminor_model.npz`), which only requires numpy and scipy.
+Only if this file is missing or outdated, the classifiers are fitted to the
+trainings data (which requires pandas and scikit-learn).
+scikit-learn is imported only when an AMinorClassifier is fitted.
 """
 
 from __future__ import print_function, division, absolute_import
@@ -23,24 +29,24 @@
 import logging
 import warnings
 import json
+from collections import namedtuple
 
 try:
-    from io import StringIO
+    from io import StringIO, BytesIO
 except ImportError:
     from StringIO import StringIO
+    from io import BytesIO
 
 import numpy as np
-
-import pandas as pd
-
-from sklearn.base import BaseEstimator, ClassifierMixin
-from sklearn.utils.validation import check_X_y, check_array, check_is_fitted
-from sklearn.neighbors.kde import KernelDensity
-from sklearn.metrics import confusion_matrix
+from scipy.special import logsumexp
+from scipy.interpolate import RegularGridInterpolator
 
 import forgi.threedee.utilities.vector as ftuv
 import forgi.threedee.utilities.graph_pdb as ftug
 
+from ._aminor_classifier import (AMinorClassifier, P_INTERACTION,
+                                 _interaction_probability)
+
 
 log = logging.getLogger(__name__)
 
@@ -49,8 +55,12 @@
 ANGLEWEIGHT = 10
 
 
+#: The bounds of the features dist/ANGLEWEIGHT, angle1 and angle2 for all
+#: loop-stem pairs passed to the classifier.
+FEATURE_DOMAIN = ((0, CUTOFFDIST / ANGLEWEIGHT), (0, np.pi / 2), (-np.pi, np.pi))
 
-P_INTERACTION = 0.05  # 0.03644949066213922
+# Increase this, whenever the layout of the pre-fitted model file changes.
+MODEL_FORMAT_VERSION = 1
 
 ################# Just classify my structure ############################
 
@@ -92,8 +102,61 @@ def potential_interactions(cg, loop_type, domain=None):
               `geos` can be passed to the AMinor classifier.
               `labels` is an Nx2 array, where the inner dimension is loopname, stemname
     """
-    labels = []
-    geos = []
+    geos, labels, _ = ensemble_potential_interactions([cg], loop_type, domain)
+    return geos, labels
+
+
+def ensemble_potential_interactions(cgs, loop_type, domain=None):
+    """
+    Like `potential_interactions`, but for a list of structures.
+    The geometries of all loop-stem pairs of all structures are
+    calculated together in a vectorized way.
+
+    :returns: A tuple `geos`, `labels`, `cg_indices`. `geos` and `labels` are
+              like in `potential_interactions`, `cg_indices` is an array of
+              length N with the index of the cg (in cgs), each
+              potential interaction belongs to.
+    """
+    pairs = []
+    cg_indices = []
+    loop_coords = []
+    stem_coords = []
+    stem_twists = []
+    stem_lengths = []
+    for i, cg in enumerate(cgs):
+        cg_pairs = _candidate_pairs(cg, loop_type, domain)
+        if not cg_pairs:
+            continue
+        loops, stems = map(list, zip(*cg_pairs))
+        pairs.extend(cg_pairs)
+        cg_indices.extend([i] * len(cg_pairs))
+        loop_coords.append(cg.coords[loops].reshape(-1, 2, 3))
+        stem_coords.append(cg.coords[stems].reshape(-1, 2, 3))
+        stem_twists.append(cg.twists[stems].reshape(-1, 2, 3))
+        stem_lengths.extend(cg.stem_length(stem) for stem in stems)
+    if not pairs:
+        return np.array([]), np.array([]), np.array([], dtype=int)
+    geos = relative_orientations(np.concatenate(loop_coords),
+                                 np.concatenate(stem_coords),
+                                 np.concatenate(stem_twists),
+                                 stem_lengths)
+    # Pairs further apart than CUTOFFDIST are ruled out beforehand.
+    mask = geos[:, 0] < CUTOFFDIST
+    geos = geos[mask]
+    geos[:, 0] /= ANGLEWEIGHT
+    return geos, np.array(pairs)[mask], np.array(cg_indices)[mask]
+
+
+def _candidate_pairs(cg, loop_type, domain=None):
+    """
+    All loop-stem pairs of the given loop type, that are not adjacent
+    and where the loop contains an Adenine.
+    """
+    if domain is not None:
+        stems = [s for s in domain if s[0] == "s"]
+    else:
+        stems = list(cg.stem_iterator())
+    pairs = []
     for loop in cg.defines:
         if domain is not None and loop not in domain:
             continue
@@ -101,13 +164,12 @@ def potential_interactions(cg, loop_type, domain=None):
             continue
         if 'A' not in "".join(cg.get_define_seq_str(loop)):
             continue
-        loop_geos, loop_labels = loop_potential_interactions(cg, loop, domain)
-        geos.extend(loop_geos)
-        labels.extend(loop_labels)
-    return np.array(geos), np.array(labels)
+        pairs.extend((loop, stem) for stem in stems
+                     if stem not in cg.edges[loop])
+    return pairs
 
 
-def all_interactions(cg, clfs=None):
+def all_interactions(cg, clfs=None, interpolated=False):
     """
     Get a list of all predicted A-Minor interactions in a cg-object.
 
@@ -118,24 +180,48 @@ def all_interactions(cg, clfs=None):
                  loop_type is one of "i", "h", "m".
                  If clfs is None or a key is missing, uses the default
                  pretrained classifier.
+    :param interpolated: If True, use an InterpolatedAMinorClassifier
+                 for the default classifiers. This is faster, if many
+                 structures are classified, but only approximate.
 
     :returns: A list of  tuples (loop, stem)
     """
     interactions = []
     for loop_type in ["i", "h"]:
-        if clfs is not None and loop_type not in clfs:
-            warnings.warn("No classifier specified for loop type {} (only for {}), "
-                          "using default classifier.".format(loop_type, ",".join(clfs.keys())))
-        if clfs is None or loop_type not in clfs:
-            clf = _get_default_clf(loop_type)
-        else:
-            clf = clfs[loop_type]
+        clf = _clf_for_loop_type(clfs, loop_type, interpolated)
         geos, labels = potential_interactions(cg, loop_type)
         interactions.extend(
             _classify_potential_interactions(clf, geos, labels))
     return interactions
 
 
+def ensemble_interactions(cgs, clfs=None, interpolated=False):
+    """
+    Like `all_interactions`, but for a list of structures.
+
+    The geometries of all structures are calculated and classified together,
+    which is much faster than calling all_interactions for every structure.
+
+    :param clfs: See `all_interactions`
+    :param interpolated: See `all_interactions`
+
+    :returns: A list (one entry per cg) of lists of tuples (loop, stem)
+    """
+    interactions = [[] for cg in cgs]
+    for loop_type in ["i", "h"]:
+        clf = _clf_for_loop_type(clfs, loop_type, interpolated)
+        geos, labels, cg_indices = ensemble_potential_interactions(
+            cgs, loop_type)
+        if len(geos) == 0:
+            continue
+        score = clf.predict_proba(geos)
+        for i in np.unique(cg_indices):
+            mask = cg_indices == i
+            interactions[i].extend(_best_interactions(score[mask],
+                                                      labels[mask]))
+    return interactions
+
+
 def classify_interaction(cg, loop, stem=None, clf=None):
     """
     Returns the interaction pair loop, stem as a tuple or False if no interaction exists.
@@ -178,148 +264,144 @@ def get_trainings_data(loop):
     return _DefaultClf._get_data(loop_type)
 
 
-class AMinorClassifier(BaseEstimator, ClassifierMixin):
+class PrefittedAMinorClassifier(object):
     """
-    A classifier that predicts A-Minor interactions based on the following formula:
+    A fitted AMinorClassifier with a gaussian kernel, as returned by
+    `read_model_file`.
 
-    .. math:: P(I|geo)=f(geo|I)/f(geo)*P(I)
-
-    where :math:`f` is a probability density and :math:`P` is a probability
-    and :math:`I` means interaction.
+    It only supports prediction and does not need scikit-learn.
+    To refit the classifier or change its parameters, use an AMinorClassifier.
+    """
 
-    Since there are no interactions with more than 30 Angstrom distance,
-    interactions require an A in the loop sequence and estimating numerator
-    and denominator seperately could lead to probabilities greater than 1,
-    we use the following formula:
+    def __init__(self, ame, non_ame, bandwidth, symmetric=True, p_I=P_INTERACTION):
+        """
+        :param ame, non_ame: The (symmetric) trainings data for the densities
+                             of interactions and non-interactions.
+        :param bandwidth, symmetric, p_I: See AMinorClassifier
+        """
+        self.kernel = "gaussian"
+        self.bandwidth = bandwidth
+        self.symmetric = symmetric
+        self.p_I = p_I
+        self.ame_ = ame
+        self.non_ame_ = non_ame
+        self.ame_kde_ = _GaussianKDE(ame, bandwidth).score_samples
+        self.non_ame_kde_ = _GaussianKDE(non_ame, bandwidth).score_samples
 
-    .. math:: P(I| (geo, d<30, A in seq)) = num/denom
+    def get_params(self, deep=True):
+        return {"kernel": self.kernel, "bandwidth": self.bandwidth,
+                "symmetric": self.symmetric, "p_I": self.p_I}
 
-    where
-    .. math::
+    def predict(self, X):
+        return self.predict_proba(X) > 0.5
 
-        num=f(geo|I)*P(I|(d<30, A \\in seq))
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2:
+            raise ValueError("Expected a 2D array, got an array of "
+                             "shape {}".format(X.shape))
+        return _interaction_probability(self, X)
 
-        denom=num+f(geo|(\\not I, d<30))*(1-P(I|(d<30, A \\in seq))
 
-    We estimate the probability densities as kernel density estimates.
-    For :math:`f(geo|I)` we use annotations created by FR3D-searches for
-    all 4 types of A-minor motifs.
-    We assume that :math:`f(geo|(\\not I, A \\in seq))== f(geo|(\\not I, A \\in seq))`
-    and that FR3D might miss some true interactions. Thus we estimate
-    :math:`f(geo|(\\not I, A \\in seq, d<30))` as
-    :math:`f(geo|(\\not I, A \\notin seq, d<30))`
+GridValidationReport = namedtuple("GridValidationReport",
+                                  ["grid_shape", "n_samples", "max_error",
+                                   "mean_error", "n_misclassified"])
 
-    Since both densities are normalized, it does not matter that we use a
-    different number of datapoints for their estimation.
 
-    We estimate P(I|(d<30, A \\in seq)) as the number of occurrences where
-    a loop with A is in an A-minor interaction, over the number of all
-    loop-stem pairs with less than 30 angstrom distance and an A in the sequence.
+class InterpolatedAMinorClassifier(object):
+    """
+    An approximation of a fitted AMinorClassifier, which is much faster
+    for large numbers of queries.
+
+    The interaction probability is precomputed on a regular grid over the
+    FEATURE_DOMAIN. Queries are answered by trilinear interpolation.
+    Queries outside of the FEATURE_DOMAIN are passed on to the exact
+    classifier.
+
+    After construction, the attribute `report_` holds a
+    GridValidationReport, which compares the interpolated probabilities
+    with the exact probabilities at random points of the domain.
+    If this maximal error is larger than `max_error`, the grid is
+    refined (up to `max_refinements` times).
     """
 
-    def __init__(self, kernel="linear", bandwidth=0.3, symmetric=True, p_I=P_INTERACTION):
-        self.p_I = p_I
-        self.symmetric = symmetric
-        self.kernel = kernel
-        self.bandwidth = bandwidth
-
-    def fit(self, X, y):
+    def __init__(self, clf, grid_shape=(16, 16, 32), max_error=0.01,
+                 max_refinements=2, n_validation=2000, random_state=0):
         """
-        Train the model.
-
-        :param X: A Nx3 array, where the features are
-                  distance(Angstrom)/10, angle1(rad), angle2(rad)
-                  The **distance** is the closest distance between the two line
-                  segments (i.e. coarse grained elementts)
-                  **angle1** is the angle between the line along the stem vector
-                  and the line along the shortest connection between the two
-                  elements. A an angle between two straight lines, it is
-                  defined between 0 and 90 degrees.
-                  **angle2** is the angle between the connecting vector
-                  (pointing from the stem to the loop), projected onto the
-                  plane normal to the stem direction and the twist vector
-                  (location of minor groove) at the point closest to the
-                  interaction. As an angle between two vectors, it is
-                  defined between 0 and 180 degrees.
-        :param y: An array of length N. 0 means no interaction,
-                  1 means interaction.
+        :param clf: A fitted AMinorClassifier
+        :param grid_shape: The initial number of grid points along the
+                           dist, angle1 and angle2 axis.
+        :param max_error: The accuracy bound. The maximal absolute
+                          difference in probability (at the validation
+                          points) we accept between the interpolated and the
+                          exact classifier.
+        :param max_refinements: How often the grid spacing may be halved to
+                                reach the accuracy bound. If the bound is not
+                                reached, a warning is issued.
+        :param n_validation: The number of random points used for validation
+        :param random_state: A seed for the validation points.
         """
-        # Check that X and y have correct shape
-        X, y = check_X_y(X, y)
-        log.info("Trainings-data has shape {}".format(X.shape))
-        log.info("We have {} known interactions ".format(sum(y)))
-        if X.shape[1] != 3:
-            raise TypeError(
-                "Expect exactly 3 features, found {}".format(X.shape[1]))
-        if not all(yi in [0, 1] for yi in y):
-            raise ValueError("y should only contain the values 1 and 0")
-        ame = X[np.where(y)]
-        non_ame = X[np.where(y == 0)]
-        if self.symmetric:
-            ame = self._make_symmetric(ame)
-            non_ame = self._make_symmetric(non_ame)
-        log.info("Fitting. First positive sample: {}".format(X[np.where(y)][0]))
-        self.ame_kde_ = KernelDensity(kernel=self.kernel,
-                                      bandwidth=self.bandwidth).fit(ame).score_samples
-        self.non_ame_kde_ = KernelDensity(kernel=self.kernel,
-                                          bandwidth=self.bandwidth).fit(non_ame).score_samples
-        self.X_ = X
-        self.y_ = y
-
-    @staticmethod
-    def _make_symmetric(geos):
-        """
-        Make the trainingsdata symmetric around those bounds of the radial
-        variables, where we expect a high density.
-
-        Kernel density estimation does not work too well out of the box on
-        bounded support: Samples close to the boundary have create a
-        significant density outside the support. Due to symmetry considerations
-        of angular data, we can avoid this issue by adding symmetric datapoints
-        the following way: Mirror all datapoints along the plane
-        angle1=180 degrees (both angles between the two lines are equivalent) and
-        around the plane angle2==0 degrees (both rotational
-        directions are equivalent).
-        By creating 4 times as many datapoints, we avoid bias near the boundary.
+        self.clf = clf
+        self.max_error = max_error
+        rng = np.random.RandomState(random_state)
+        lower, upper = np.array(FEATURE_DOMAIN).T
+        samples = rng.uniform(lower, upper, size=(n_validation, 3))
+        exact = clf.predict_proba(samples)
+        grid_shape = tuple(grid_shape)
+        for i in range(max_refinements + 1):
+            if i > 0:
+                grid_shape = tuple(2 * n - 1 for n in grid_shape)
+            self._build_grid(grid_shape)
+            self.report_ = self.validate(samples, exact)
+            log.info("Grid validation: %s", self.report_)
+            if self.report_.max_error <= max_error:
+                break
+        else:
+            warnings.warn("The interpolated A-Minor classifier did not reach "
+                          "the accuracy bound of {} (max. error {}) with a "
+                          "grid of shape {}.".format(max_error,
+                                                     self.report_.max_error,
+                                                     grid_shape))
+
+    def _build_grid(self, grid_shape):
+        axes = [np.linspace(low, high, n)
+                for (low, high), n in zip(FEATURE_DOMAIN, grid_shape)]
+        mesh = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+        values = self.clf.predict_proba(mesh.reshape(-1, 3))
+        self.grid_shape_ = grid_shape
+        self._interpolator = RegularGridInterpolator(
+            axes, values.reshape(grid_shape), method="linear")
+
+    def validate(self, X, y_exact=None):
         """
-        geos = np.concatenate([geos,
-                               [(d, np.pi - a1, a2) for d, a1, a2 in geos]])
-        # We allow negative angles for angle2, so there is no need to make it symmetric.
-        # geos = np.concatenate([geos,
-        #                       [(d, a1, -a2) for d, a1, a2 in geos]])
-        return geos
-
-    def predict(self, X):
-        return self.predict_proba(X) > 0.5
+        Compare the interpolated with the exact probabilities.
 
-    def score(self, X, y):
-        """
-        The average between specificity and sensitivity
+        :param X: A Nx3 array of geometries.
+        :param y_exact: The exact probabilities for X. If None, they are
+                        calculated with the exact classifier.
+        :returns: A GridValidationReport
         """
-        y_pred = self.predict(X)
-        tn, fp, fn, tp = confusion_matrix(y, y_pred).ravel()
-        specificity = tn / (tn + fp)
-        sensitivity = tp / (tp + fn)
-        return (0.8 * sensitivity + 0.2 * specificity)
+        X = np.asarray(X, dtype=float)
+        if y_exact is None:
+            y_exact = self.clf.predict_proba(X)
+        y_interp = self.predict_proba(X)
+        error = np.abs(y_interp - y_exact)
+        return GridValidationReport(self.grid_shape_, len(X),
+                                    float(np.max(error)), float(np.mean(error)),
+                                    int(np.sum((y_interp > 0.5) != (y_exact > 0.5))))
 
     def predict_proba(self, X):
-        check_is_fitted(self, ['ame_kde_', 'non_ame_kde_'])
-        X = check_array(X)
-        log.debug("Predicting for {}".format(X))
-        numerator = np.exp(self.ame_kde_(X)) * self.p_I
-        denom = numerator + np.exp(self.non_ame_kde_(X)) * (1 - self.p_I)
-        with warnings.catch_warnings():  # division by 0
-            warnings.simplefilter("ignore", RuntimeWarning)
-            return np.nan_to_num(numerator / denom)
-
-    def set_params(self, **kwargs):
-        """"""
-        super(AMinorClassifier, self).set_params(**kwargs)
-        # If it was fitted, we must propagate the parameter changes
-        # to the child-KDEs by refitting to the same data
-        if hasattr(self, "X_"):
-            self.fit(self.X_, self.y_)
-        return self
+        X = np.asarray(X, dtype=float)
+        lower, upper = np.array(FEATURE_DOMAIN).T
+        in_domain = np.all((X >= lower) & (X <= upper), axis=1)
+        proba = np.empty(len(X))
+        proba[in_domain] = self._interpolator(X[in_domain])
+        if not np.all(in_domain):
+            proba[~in_domain] = self.clf.predict_proba(X[~in_domain])
+        return proba
+
+    def predict(self, X):
+        return self.predict_proba(X) > 0.5
 
 
 ############## get orientation #########################
@@ -410,6 +492,51 @@ def get_relative_orientation(cg, loop, stem):
 
     return dist, angle1, angle2
 
+
+def relative_orientations(loop_coords, stem_coords, stem_twists, stem_lengths):
+    """
+    A vectorized version of `get_relative_orientation` for N loop-stem pairs.
+    The pairs can belong to different structures.
+
+    :param loop_coords: A Nx2x3 array with the coordinates of the loops
+    :param stem_coords: A Nx2x3 array with the coordinates of the stems
+    :param stem_twists: A Nx2x3 array with the twists of the stems
+    :param stem_lengths: An array of length N with the stem lengths.
+    :returns: A Nx3 array, where the columns are dist, angle1 and angle2.
+              If an angle is undefined (e.g. for dist==0), it is nan.
+    """
+    loop_coords = np.asarray(loop_coords, dtype=float)
+    stem_coords = np.asarray(stem_coords, dtype=float)
+    stem_lengths = np.asarray(stem_lengths, dtype=float)
+    point_on_stem, point_on_loop = ftuv.line_segment_distance_vectorized(
+        stem_coords[:, 0], stem_coords[:, 1],
+        loop_coords[:, 0], loop_coords[:, 1])
+    conn_vec = point_on_loop - point_on_stem
+    dist = np.linalg.norm(conn_vec, axis=1)
+    stem_vec = stem_coords[:, 1] - stem_coords[:, 0]
+    stem_mag = np.linalg.norm(stem_vec, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        angle1 = ftuv.vec_angle_vectorized(stem_vec, conn_vec)
+        # The direction of the stem vector is irrelevant.
+        angle1 = np.where(angle1 > np.pi / 2, np.pi - angle1, angle1)
+        # Where along the helix our A-residue points to the minor groove.
+        pos = (np.linalg.norm(point_on_stem - stem_coords[:, 0], axis=1)
+               / stem_mag * (stem_lengths - 1))
+        virt_twist = ftug.virtual_res_twist_vectorized(stem_coords, stem_twists,
+                                                       pos, stem_lengths)
+        conn_proj = conn_vec - (np.sum(conn_vec * stem_vec, axis=1)
+                                / stem_mag**2)[:, np.newaxis] * stem_vec
+        angle2 = ftuv.vec_angle_vectorized(virt_twist, conn_proj)
+    # Positive angle, if the cross-product of the two vectors
+    # is parallel to the stem vector, negative if it is antiparallel.
+    cr = np.cross(virt_twist, conn_proj)
+    sign = np.sign(np.sum(cr * stem_vec, axis=1))
+    sign[np.all(np.abs(cr) < 10**-7, axis=1)] = 0
+    angle2 *= sign
+    angle2[dist == 0] = float("nan")
+    return np.stack([dist, angle1, angle2], axis=-1)
+
+
 ############# Private ##########################################
 
 
@@ -425,10 +552,23 @@ def _get_masks(df, loop_type):
     return mask_ame, mask_non_ame, mask_non_fred
 
 
+def _clf_for_loop_type(clfs, loop_type, interpolated):
+    if clfs is not None and loop_type not in clfs:
+        warnings.warn("No classifier specified for loop type {} (only for {}), "
+                      "using default classifier.".format(loop_type, ",".join(clfs.keys())))
+    if clfs is None or loop_type not in clfs:
+        return _get_default_clf(loop_type, interpolated)
+    return clfs[loop_type]
+
+
 def _classify_potential_interactions(clf, geos, labels):
     if len(geos) == 0:
         return []
     score = clf.predict_proba(geos)
+    return _best_interactions(score, labels)
+
+
+def _best_interactions(score, labels):
     y = score > 0.5
     log.info("Classifying {}".format(labels))
     log.info("score {}".format(score))
@@ -450,11 +590,21 @@ def _classify_potential_interactions(clf, geos, labels):
 class _DefaultClf(object):
     """Just to put global (cached) variables into a seperate scope."""
     _clfs = {}  # The pretrained classifiers, lazily loaded.
+    _interpolated_clfs = {}
     _geo_df = None
 
     @classmethod
-    def get_default_clf(cls, loop_type):
+    def get_default_clf(cls, loop_type, interpolated=False):
+        if interpolated:
+            if loop_type not in cls._interpolated_clfs:
+                cls._interpolated_clfs[loop_type] = InterpolatedAMinorClassifier(
+                    cls.get_default_clf(loop_type))
+            return cls._interpolated_clfs[loop_type]
         if loop_type not in cls._clfs:
+            cls._clfs.update(cls._load_prefitted())
+        if loop_type not in cls._clfs:
+            log.info("No pre-fitted classifier for loop type %s. "
+                     "Fitting to the trainings data.", loop_type)
             clf = AMinorClassifier()
             rawdata = pkgutil.get_data(
                 'forgi', 'threedee/data/aminor_params.json')
@@ -465,9 +615,26 @@ def get_default_clf(cls, loop_type):
             cls._clfs[loop_type] = clf
         return cls._clfs[loop_type]
 
+    @classmethod
+    def _load_prefitted(cls):
+        """
+        Load all classifiers stored in the pre-fitted model file.
+
+        :returns: A dictionary {loop_type: AMinorClassifier}, which is empty
+                  if the model file is missing or was created for a
+                  different model format.
+        """
+        try:
+            rawdata = pkgutil.get_data('forgi', 'threedee/data/aminor_model.npz')
+        except (IOError, OSError):
+            log.info("No pre-fitted A-Minor model file found.")
+            return {}
+        return read_model_file(BytesIO(rawdata))
+
     @classmethod
     def get_dataframe(cls):
         if cls._geo_df is None:
+            import pandas as pd
             rawdata = pkgutil.get_data(
                 'forgi', 'threedee/data/aminor_geometries.csv')
             cls._geo_df = pd.read_csv(
@@ -480,12 +647,13 @@ def _get_data(cls, loop_type):
         return df_to_data_labels(df, loop_type)
 
 
-def _get_default_clf(loop):
+def _get_default_clf(loop, interpolated=False):
     """
     :param loop: A element name, e.g. "i0" or a loop-type, e.g. "i"
+    :param interpolated: Return an InterpolatedAMinorClassifier
     """
     loop_type = loop[0]
-    return _DefaultClf.get_default_clf(loop_type)
+    return _DefaultClf.get_default_clf(loop_type, interpolated)
 
 
 def df_to_data_labels(df, loop_type):
@@ -495,6 +663,7 @@ def df_to_data_labels(df, loop_type):
 
     :returns: X, y
     """
+    import pandas as pd
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
         df["loop_name"] = df.pdb_id + \
@@ -505,3 +674,99 @@ def df_to_data_labels(df, loop_type):
     data = np.array([[x.dist / ANGLEWEIGHT, x.angle1, x.angle2, x.is_interaction]
                      for x in data.itertuples()])
     return data[:, :3], data[:, 3]
+
+
+class _GaussianKDE(object):
+    """
+    A gaussian kernel density estimate, which only needs numpy and scipy.
+
+    It gives the same results as sklearn's `KernelDensity(kernel="gaussian")`
+    and is used for the pre-fitted default classifiers.
+    """
+    #: Number of query points per block, to limit the memory footprint.
+    chunksize = 256
+
+    def __init__(self, points, bandwidth):
+        self.points = np.asarray(points, dtype=float)
+        self.bandwidth = bandwidth
+        self._sq_norms = np.sum(self.points**2, axis=1)
+        n, dim = self.points.shape
+        self._log_norm = (np.log(n) + dim / 2 * np.log(2 * np.pi)
+                          + dim * np.log(bandwidth))
+
+    def score_samples(self, X):
+        """
+        :param X: A Nx3 array
+        :returns: The logarithm of the density at the positions X.
+        """
+        X = np.asarray(X, dtype=float)
+        out = np.empty(len(X))
+        for start in range(0, len(X), self.chunksize):
+            chunk = X[start:start + self.chunksize]
+            sq_dists = (np.sum(chunk**2, axis=1)[:, np.newaxis]
+                        + self._sq_norms[np.newaxis, :]
+                        - 2 * np.dot(chunk, self.points.T))
+            np.maximum(sq_dists, 0, out=sq_dists)
+            out[start:start + self.chunksize] = logsumexp(
+                -0.5 * sq_dists / self.bandwidth**2, axis=1)
+        return out - self._log_norm
+
+
+def write_model_file(file_, clfs):
+    """
+    Store fitted AMinorClassifiers in a numpy .npz file, which can be read
+    by `read_model_file` without pandas or scikit-learn.
+
+    :param file_: A filename or file-like object
+    :param clfs: A dictionary {loop_type: AMinorClassifier}. All
+                 classifiers have to be fitted and use the gaussian kernel.
+    """
+    import forgi
+    from sklearn.utils.validation import check_is_fitted
+    arrays = {"format_version": np.array(MODEL_FORMAT_VERSION),
+              "forgi_version": np.array(forgi.__version__),
+              "cutoffdist": np.array(CUTOFFDIST),
+              "angleweight": np.array(ANGLEWEIGHT),
+              "loop_types": np.array(sorted(clfs))}
+    for loop_type, clf in clfs.items():
+        check_is_fitted(clf, ['ame_', 'non_ame_'])
+        if clf.kernel != "gaussian":
+            raise ValueError("Only classifiers with a gaussian kernel can be "
+                             "stored, not '{}'".format(clf.kernel))
+        arrays[loop_type + "_ame"] = clf.ame_
+        arrays[loop_type + "_non_ame"] = clf.non_ame_
+        arrays[loop_type + "_bandwidth"] = np.array(clf.bandwidth)
+        arrays[loop_type + "_p_I"] = np.array(clf.p_I)
+        arrays[loop_type + "_symmetric"] = np.array(clf.symmetric)
+    np.savez_compressed(file_, **arrays)
+
+
+def read_model_file(file_):
+    """
+    Read AMinorClassifiers stored with `write_model_file`.
+
+    Only numpy and scipy are needed for reading the file and
+    for predictions with the returned classifiers.
+
+    :param file_: A filename or file-like object
+    :returns: A dictionary {loop_type: PrefittedAMinorClassifier}. If the file was
+              written for a different model format or different constants,
+              an empty dictionary is returned.
+    """
+    with np.load(file_, allow_pickle=False) as data:
+        if (int(data["format_version"]) != MODEL_FORMAT_VERSION or
+                float(data["cutoffdist"]) != CUTOFFDIST or
+                float(data["angleweight"]) != ANGLEWEIGHT):
+            warnings.warn("The A-Minor model file was created for a different "
+                          "version of forgi ({}) and will be "
+                          "ignored.".format(data["forgi_version"]))
+            return {}
+        clfs = {}
+        for loop_type in data["loop_types"]:
+            loop_type = str(loop_type)
+            clfs[loop_type] = PrefittedAMinorClassifier(
+                data[loop_type + "_ame"], data[loop_type + "_non_ame"],
+                bandwidth=float(data[loop_type + "_bandwidth"]),
+                symmetric=bool(data[loop_type + "_symmetric"]),
+                p_I=float(data[loop_type + "_p_I"]))
+    return clfs
@@ -58,6 +58,7 @@
 from ..utilities import pdb as ftup
 from . import descriptors as ftmd
 from ..utilities import _dssr as ftud
+from ..utilities import annotation_cache as ftuac
 from ..utilities import vector as ftuv
 from ...utilities import debug as fud
 from ...utilities import stuff as fus
@@ -70,6 +71,15 @@
 
 log = logging.getLogger(__name__)
 
+# Cutoffs for the stacking criterion of Tyagi et al. (See CoarseGrainRNA.is_stacking).
+# Distance and angle cutoffs are indexed by is_flush (0: not flush, 1: flush)
+TYAGI_DISTANCE_CUTOFF = [14, 6]
+TYAGI_ANGLE_CUTOFF = [math.acos(0.75), math.acos(0.8)]
+# Relaxed compared to 60 in the paper, because we use
+# virtual atom positions
+TYAGI_SHEAR_ANGLE_CUTOFF = math.radians(60)
+TYAGI_SHEAR_OFFSET_CUTOFF = 10
+
 class AnnotationToolNotInstalled(ValueError):
     pass
 
@@ -157,6 +167,24 @@ def _annotate_pdb(filename, annotation_tool, filetype, subprocess_kwargs={}):
     :param subprocess_kwargs: Will be passed as keyword arguments to subprocess.call/ subprcess.check_output
     :param annotation_tool: See docstring of CoarseGrainRNA.from_pdb
     """
+    executable = _annotation_executable(annotation_tool, filetype)
+    if executable == "x3dna-dssr":
+        return _cached_annotation(filename, "x3dna-dssr",
+                                  lambda: _run_dssr(filename, subprocess_kwargs))
+    elif executable == "MC-Annotate":
+        return _cached_annotation(filename, "MC-Annotate",
+                                  lambda: _run_mc_annotate_dotplot(filename, subprocess_kwargs))
+    return None
+
+
+def _annotation_executable(annotation_tool, filetype):
+    """
+    Decide which external program is used for annotating a pdb file.
+
+    :param annotation_tool: See docstring of CoarseGrainRNA.from_pdb
+    :param filetype: One of 'pdb' or 'cif'
+    :returns: "x3dna-dssr", "MC-Annotate" or None (use the forgi fallback)
+    """
     not_installed_msg = ("{} was requested as annotation tool, but {} "
                          "is not installed or not in the PATH. (Hint: run "
                          "forgi_config.py to set the preferred annotation tool)")
@@ -168,7 +196,7 @@ def _annotate_pdb(filename, annotation_tool, filetype, subprocess_kwargs={}):
     log.info("Requested annotation program is {}".format(program))
     if program == "DSSR" or program is None:
         if which("x3dna-dssr"):
-            return _run_dssr(filename, subprocess_kwargs)
+            return "x3dna-dssr"
         else:
             log.info("x3dna-dssr is not installed or not in the PATH.")
             if program is not None:
@@ -178,15 +206,7 @@ def _annotate_pdb(filename, annotation_tool, filetype, subprocess_kwargs={}):
         if filetype != "pdb":
             raise ValueError("MC-Annotate does not support MMCIF")
         if which("MC-Annotate"):
-            lines = _run_mc_annotate(filename, subprocess_kwargs)
-            try:
-                bpseq, seq_ids = ftum.get_dotplot(lines)
-                return bpseq, seq_ids, {}
-            except Exception as e:
-                log.exception(
-                    "Could not convert MC-Annotate output to dotplot")
-                raise CgConstructionError(
-                    "Could not convert MC-Annotate output to dotplot")  # from e
+            return "MC-Annotate"
         else:
             log.info("MC-Annotate is not installed or not in the PATH.")
             if program is not None:
@@ -199,39 +219,120 @@ def _annotate_pdb(filename, annotation_tool, filetype, subprocess_kwargs={}):
                          "'MC-Annotate', 'DSSR' and 'forgi', not '{}'".format(program))
 
 
-def _run_dssr(filename, subprocess_kwargs={}):
+def _cached_annotation(filename, executable, annotate):
+    """
+    Look up the annotation of filename in the on-disk annotation cache
+    and only call annotate(), if it is not cached.
+
+    :param filename: The name of the cleaned, temporary pdb file
+    :param executable: The name of the annotation program
+    :param annotate: A function without arguments, returning
+                     a tuple (bpseq, seq_ids, dssr_dict)
+    """
+    cache = ftuac.AnnotationCache()
+    if not cache.enabled:
+        return annotate()
+    key = _annotation_cache_key(cache, filename, executable)
+    annotation = cache.get(key)
+    if annotation is None:
+        annotation = annotate()
+        cache.put(key, annotation)
+    return annotation
+
+
+def _annotation_cache_key(cache, filename, executable):
+    """
+    The key of the annotation of filename in the annotation cache.
+
+    It includes the commandline arguments of the annotation program
+    (without the temporary file names), so changing them invalidates
+    the cached annotations.
+
+    :param cache: A forgi.threedee.utilities.annotation_cache.AnnotationCache
+    :param filename: The name of the cleaned, temporary pdb file
+    :param executable: The name of the annotation program
+    """
+    if executable == "x3dna-dssr":
+        options = _dssr_arguments("<input>", "<output>")
+    elif executable == "MC-Annotate":
+        options = _mc_annotate_arguments("<input>")
+    else:
+        options = None
+    return cache.key(filename, executable, ftuac.tool_version(which(executable)),
+                     options)
+
+
+def _run_mc_annotate_dotplot(filename, subprocess_kwargs={}):
+    """
+    Returns: A tuple (bpseq, seq_ids, {})
+    """
+    lines = _run_mc_annotate(filename, subprocess_kwargs)
+    return _mc_annotate_dotplot(lines)
+
+
+def _mc_annotate_dotplot(lines):
+    """
+    Returns: A tuple (bpseq, seq_ids, {})
+    """
+    try:
+        bpseq, seq_ids = ftum.get_dotplot(lines)
+        return bpseq, seq_ids, {}
+    except Exception as e:
+        log.exception(
+            "Could not convert MC-Annotate output to dotplot")
+        raise CgConstructionError(
+            "Could not convert MC-Annotate output to dotplot")  # from e
+
+
+def _dssr_arguments(filename, dssr_output_dir):
+    """
+    The commandline for running DSSR on filename.
+    All output files are written to dssr_output_dir.
+    """
     # See http://forum.x3dna.org/rna-structures/redirect-auxiliary-file-output/
-    with fus.make_temp_directory() as dssr_output_dir:
-        dssr_out = os.path.join(dssr_output_dir, "out")
+    return ['x3dna-dssr', "-i=" + filename,
+            "--prefix=" + os.path.join(dssr_output_dir, "d"),
+            "-o=" + os.path.join(dssr_output_dir, "out"), "--json"]
 
-        arguments = ['x3dna-dssr', "-i=" + filename,
-                     "--prefix=" + os.path.join(dssr_output_dir, "d"),
-                     "-o=" + dssr_out, "--json"]
+
+def _read_dssr_output(dssr_output_dir):
+    """
+    Parse the files written by DSSR.
+
+    Returns: A tuple (bpseq, seq_ids, dssr_dict)
+    """
+    try:
+        with open(os.path.join(dssr_output_dir, "d-2ndstrs.bpseq"), encoding='ascii') as f:
+            bpseq = f.read()
+        with open(os.path.join(dssr_output_dir, "out")) as f:
+            try:
+                dssr_dict = json.load(f)
+            except JSONDecodeError as e: # DSSR does not escape backslashes (see "http://forum.x3dna.org/bug-reports/json-output-should-escape-backslashes/"), which can be in windows paths. Escape them manually.
+                f.seek(0)
+                json_stri = f.read().replace('\\','\\\\')
+                log.error(json_stri)
+                dssr_dict = json.loads(json_stri)
+            nts = dssr_dict["nts"]
+            seq_ids = list(map(ftud.dssr_to_pdb_resid, [
+                           nt["nt_id"] for nt in nts]))
+    except (OSError, IOError) as e:
+        with log_to_exception(log, e):
+            log.error("Content of the directory {} is {}".format(
+                dssr_output_dir, os.listdir(dssr_output_dir)))
+        raise
+    return bpseq, seq_ids, dssr_dict
+
+
+def _run_dssr(filename, subprocess_kwargs={}):
+    with fus.make_temp_directory() as dssr_output_dir:
+        arguments = _dssr_arguments(filename, dssr_output_dir)
         # https://stackoverflow.com/a/14837250/5069869
         log.info("Running DSSR: {}".format(sp.list2cmdline(arguments)))
         with open(os.path.join(dssr_output_dir, "stderror"), "w+") as errfile:
             try:
                 ret_code = sp.call(
                     arguments, universal_newlines=True, stderr=errfile, **subprocess_kwargs)
-                try:
-                    with open(os.path.join(dssr_output_dir, "d-2ndstrs.bpseq"), encoding='ascii') as f:
-                        bpseq = f.read()
-                    with open(dssr_out) as f:
-                        try:
-                            dssr_dict = json.load(f)
-                        except JSONDecodeError as e: # DSSR does not escape backslashes (see "http://forum.x3dna.org/bug-reports/json-output-should-escape-backslashes/"), which can be in windows paths. Escape them manually.
-                            f.seek(0)
-                            json_stri = f.read().replace('\\','\\\\')
-                            log.error(json_stri)
-                            dssr_dict = json.loads(json_stri)
-                        nts = dssr_dict["nts"]
-                        seq_ids = list(map(ftud.dssr_to_pdb_resid, [
-                                       nt["nt_id"] for nt in nts]))
-                except (OSError, IOError) as e:
-                    with log_to_exception(log, e):
-                        log.error("Content of the directory {} is {}".format(
-                            dssr_output_dir, os.listdir(dssr_output_dir)))
-                    raise
+                bpseq, seq_ids, dssr_dict = _read_dssr_output(dssr_output_dir)
             except (OSError, IOError) as e:
                 assert op.isfile(
                     filename), "File {} (created by forgi) no longer exists".format(filename)
@@ -254,13 +355,20 @@ def _run_dssr(filename, subprocess_kwargs={}):
     return bpseq, seq_ids, dssr_dict
 
 
+def _mc_annotate_arguments(filename):
+    """
+    The commandline for running MC-Annotate on filename.
+    """
+    return ['MC-Annotate', filename]
+
+
 def _run_mc_annotate(filename, subprocess_kwargs={}):
     """
     Returns: A tuple (bpseq, seq_ids`)
     """
     log.info("Running MC-Annotate")
     try:
-        out = sp.check_output(['MC-Annotate', filename],
+        out = sp.check_output(_mc_annotate_arguments(filename),
                               universal_newlines=True, **subprocess_kwargs)
     except OSError as e:
         assert op.isfile(
@@ -296,6 +404,8 @@ def __init__(self, graph_construction, sequence, name=None, infos=None, _dont_sp
         self.dssr = None
 
         self._virtual_atom_cache = {}
+        self._vatom_tree = None
+        self._vatom_kde = None
         #: Keys are element identifiers (e.g.: "s1" or "i3"), values are 2-tuples of vectors
         #: The first value of stem coordinates corresponds to the start of the stem
         #: (the one with the lowest nucleotide number),
@@ -404,7 +514,8 @@ def from_bg_string(cls, cg_string):
     @classmethod
     def from_pdb(cls, pdb_filename, load_chains=None, remove_pseudoknots=False,
                  dissolve_length_one_stems=True, secondary_structure=None,
-                 filetype="pdb", annotation_tool=None, query_PDBeChem=False):
+                 filetype="pdb", annotation_tool=None, query_PDBeChem=False,
+                 interactions=True):
         """
         :param load_chains: A list of chain_ids or None (all chains)
         :param secondary_structure: Only useful if we load only 1 component
@@ -422,48 +533,98 @@ def from_pdb(cls, pdb_filename, load_chains=None, remove_pseudoknots=False,
                         If a string is given or the configuration file set,
                         we never fall back to a different option but raise an
                         error, if the requested tool is unavailable.
+        :param interactions: If False, skip the search for residues interacting
+                        with other molecules (e.g. proteins). Then
+                        `interacting_residues` and `interacting_elements` are
+                        empty. This saves time for large complexes.
+
+        The annotations by DSSR and MC-Annotate are cached on disk (in the
+        subdirectory "annotations" of the configuration value "CACHE_DIR"),
+        so loading the same structure again does not rerun the tool.
+        Set the configuration value "ANNOTATION_CACHE_SIZE" or the environment
+        variable FORGI_ANNOTATION_CACHE_SIZE to 0 to disable the cache,
+        see `forgi.threedee.utilities.annotation_cache`.
         """
         #warnings.warn("We currently do not load any long-range interactions")
         # We need to create files, so we can interface with
         # the annotation program.
-        if remove_pseudoknots and secondary_structure:
-            warnings.warn(
-                "Option 'remove_pseudoknots ignored for user-supplied secondary structure.")
-
         with fus.make_temp_directory() as output_dir:
-            if load_chains == "biggest":
-                chain, missing_res, ir = ftup.get_biggest_chain(pdb_filename)
-                chains = [chain]
-            else:
-                chains, missing_res, ir = ftup.get_all_chains(pdb_filename)
-            new_chains = []
-            for chain in chains:
-                if load_chains in [None, "biggest"] or chain.id in load_chains:
-                    log.debug("Loaded Chain {}".format(chain.id))
-                    chain, modifications = ftup.clean_chain(chain, query_PDBeChem)
-                    new_chains.append(chain)
-            log.debug("{}, {}".format(pdb_filename, os.path.split(pdb_filename)))
-            fn_basename = os.path.split(pdb_filename)[1]
-            if load_chains is None:
-                chain_string = "None"
-            else:
-                chain_string = "-".join(map(str, load_chains))
-
-            rna_pdb_fn = op.join(output_dir, fn_basename +
-                                 "_" + chain_string + '.temp.' + filetype)
-            # Output cleaned version for annotating
-            ftup.output_multiple_chains(new_chains, rna_pdb_fn, filetype)
-
+            structure, rna_pdb_fn = cls._prepare_pdb(pdb_filename, output_dir,
+                                                     load_chains, filetype,
+                                                     query_PDBeChem, interactions)
             # first we annotate the 3D structure
             log.info("Starting annotation program for all chains")
             annotation = _annotate_pdb(rna_pdb_fn, annotation_tool, filetype)
-            if annotation is None:
-                # Fallback-annotation using forgi
-                bpseq, seq_ids = ftup.annotate_fallback(new_chains)
-                dssr_dict = {}
-            else:
-                bpseq, seq_ids, dssr_dict = annotation
-            breakpoints = breakpoints_from_seqids(seq_ids)
+        return cls._from_pdb_annotation(pdb_filename, structure, annotation,
+                                        remove_pseudoknots,
+                                        dissolve_length_one_stems,
+                                        secondary_structure)
+
+    @classmethod
+    def _prepare_pdb(cls, pdb_filename, output_dir, load_chains=None,
+                     filetype="pdb", query_PDBeChem=False, interactions=True):
+        """
+        Load and clean the chains of a pdb file and write them to a file
+        in output_dir, which can be passed to the annotation program.
+
+        Helper function for from_pdb.
+
+        :returns: A tuple `structure, rna_pdb_fn`, where structure is the
+                  tuple (new_chains, missing_res, ir, modifications) expected
+                  by `_from_pdb_annotation` and rna_pdb_fn the filename of
+                  the cleaned structure.
+        """
+        if load_chains == "biggest":
+            chain, missing_res, ir = ftup.get_biggest_chain(pdb_filename,
+                                                            interactions=interactions)
+            chains = [chain]
+        else:
+            chains, missing_res, ir = ftup.get_all_chains(pdb_filename,
+                                                          interactions=interactions)
+        new_chains = []
+        for chain in chains:
+            if load_chains in [None, "biggest"] or chain.id in load_chains:
+                log.debug("Loaded Chain {}".format(chain.id))
+                chain, modifications = ftup.clean_chain(chain, query_PDBeChem)
+                new_chains.append(chain)
+        log.debug("{}, {}".format(pdb_filename, os.path.split(pdb_filename)))
+        fn_basename = os.path.split(pdb_filename)[1]
+        if load_chains is None:
+            chain_string = "None"
+        else:
+            chain_string = "-".join(map(str, load_chains))
+
+        rna_pdb_fn = op.join(output_dir, fn_basename +
+                             "_" + chain_string + '.temp.' + filetype)
+        # Output cleaned version for annotating
+        ftup.output_multiple_chains(new_chains, rna_pdb_fn, filetype)
+        return (new_chains, missing_res, ir, modifications), rna_pdb_fn
+
+    @classmethod
+    def _from_pdb_annotation(cls, pdb_filename, structure, annotation,
+                             remove_pseudoknots=False,
+                             dissolve_length_one_stems=True,
+                             secondary_structure=None):
+        """
+        Create the CoarseGrainRNAs from the cleaned chains and the
+        annotation of the pdb file.
+
+        Helper function for from_pdb.
+
+        :param structure: The first return value of `_prepare_pdb`
+        :param annotation: A tuple (bpseq, seq_ids, dssr_dict) or None,
+                           to use the forgi fallback annotation.
+        """
+        new_chains, missing_res, ir, modifications = structure
+        if remove_pseudoknots and secondary_structure:
+            warnings.warn(
+                "Option 'remove_pseudoknots ignored for user-supplied secondary structure.")
+        if annotation is None:
+            # Fallback-annotation using forgi
+            bpseq, seq_ids = ftup.annotate_fallback(new_chains)
+            dssr_dict = {}
+        else:
+            bpseq, seq_ids, dssr_dict = annotation
 
         assert bpseq is not None, "{} {} {}".format(bpseq, seq_ids, dssr_dict)
         # Here, we remove Pseudoknots on the bp-seq level. not the BulgeGraph
@@ -847,53 +1008,154 @@ def get_poss_for_domain(self, elements, mode="vres"):
             return np.array(vress)
         assert False
 
-    def steric_value(self, elements, method="r**-2"):
+    def steric_value(self, elements, method="r**-2", radius=None):
         """
         Estimate, how difficult a set of elements was to build,
         by counting the atom density around the center of these elements
+
+        See `steric_values` for the supported methods.
         """
-        try:
-            if isinstance(elements, list) or isinstance(elements, tuple):
-                center = ftuv.get_vector_centroid(self.coords[elements])
-            elif elements.shape == (3,):
-                center = elements
-            else:
-                assert False, repr(elements)
-        except:
-            print(elements, repr(elements))
-            raise
-        if method == "kde":
-            # print(center)
-            all_vas = []
-            for pos in range(1, self.seq_length + 1):
-                for va in self.virtual_atoms(pos).values():
-                    all_vas.append(va)
+        return self.steric_values([elements], method, radius)[0]
 
-            all_vas = np.array(all_vas).T
-            log.debug("Shape of all atoms {}".format(all_vas.shape))
-            # randomly take 50 Angstrom bandwidth
-            kde = scipy.stats.gaussian_kde(all_vas, 50)
-            return kde(center)
+    def steric_values(self, element_sets, method="r**-2", radius=None):
+        """
+        Like steric_value, but for many sets of elements (or centers) at once.
+
+        All virtual atoms are collected only once per structure and cached
+        in a KD-tree (see `_virtual_atom_tree`), until the coordinates change.
+        The kernel density estimate is cached as well.
+
+        :param element_sets: A list of element sets. Each entry is either a
+                             list/tuple of element names (e.g. ["m0", "m1"]),
+                             whose centroid is used as center, or a
+                             numpy array of shape (3,), the center itself.
+        :param method: "kde": A gaussian kernel density estimate of all
+                              virtual atoms at the center.
+                       "r**-N": The sum of 1/(1+r)**N over all virtual atoms,
+                                where r is the distance to the center.
+                       "r**-Ne": Like "r**-N", but exclude virtual atoms of
+                                 the elements in the set.
+                       "cutoff D": The number of virtual atoms closer than
+                                   D Angstrom to the center.
+        :param radius: None or a distance in Angstrom. For "kde" and "r**-N",
+                       only virtual atoms at most this far from the center
+                       contribute. They are found with the KD-tree, so the
+                       time per center depends on the number of atoms in
+                       the radius, not on the size of the structure.
+                       If this is None, all virtual atoms are summed
+                       (the "cutoff" method always uses the KD-tree).
+        :returns: A numpy array with one value per entry in element_sets.
+        """
+        centers = np.array([self._steric_center(elements)
+                            for elements in element_sets], dtype=float).reshape(-1, 3)
+        tree, all_vas, va_nts = self._virtual_atom_tree()
+        if method == "kde":
+            kde = self._virtual_atom_kde()
+            if radius is None:
+                return kde(centers.T)
+            rows, cols, _ = self._virtual_atoms_near(centers, radius)
+            diffs = all_vas[cols] - centers[rows]
+            energy = np.sum(np.dot(diffs, kde.inv_cov) * diffs, axis=1) / 2
+            norm = np.sqrt(np.linalg.det(2 * np.pi * kde.covariance)) * kde.n
+            return np.bincount(rows, np.exp(-energy), len(centers)) / norm
         elif method.startswith("r**"):
             power = -int(method[3:5])
             exclude = method[5:]
             if exclude and exclude != "e":
                 raise ValueError("Not supported method")
-            value = 0
-            for pos in range(1, self.seq_length + 1):
-                if exclude and self.get_node_from_residue_num(pos) in elements:
+            if radius is None:
+                values = []
+                # Chunks limit the size of the distance matrix.
+                for chunk in range(0, len(centers), 256):
+                    dists = scipy.spatial.distance.cdist(centers[chunk:chunk + 256], all_vas)
+                    values.append(np.sum(1 / (1 + dists)**power, axis=1))
+                values = np.concatenate(values) if values else np.zeros(0)
+            else:
+                rows, _, dists = self._virtual_atoms_near(centers, radius)
+                values = np.bincount(rows, 1 / (1 + dists)**power, len(centers))
+            if not exclude:
+                return values
+            # Subtract the contribution of the virtual atoms of the elements
+            # in the set from the sum over all virtual atoms.
+            # va_nts is sorted, the virtual atoms of nucleotide nt
+            # are all_vas[nt_start[nt - 1]:nt_start[nt]]
+            nt_start = np.searchsorted(va_nts, np.arange(1, self.seq_length + 2))
+            for i, elements in enumerate(element_sets):
+                if not isinstance(elements, (list, tuple)):
                     continue
-                for va in self.virtual_atoms(pos).values():
-                    value += 1 / (1 + ftuv.vec_distance(va, center))**power
-            return value
+                atoms = [np.arange(nt_start[nt - 1], nt_start[nt]) for elem in set(elements)
+                         for nt in self.define_residue_num_iterator(elem)]
+                if not atoms:
+                    continue
+                dists = np.sqrt(np.sum((all_vas[np.concatenate(atoms)] - centers[i])**2,
+                                       axis=1))
+                if radius is not None:
+                    dists = dists[dists <= radius]
+                values[i] -= np.sum(1 / (1 + dists)**power)
+            return values
         elif method.startswith("cutoff"):
             cutoff = float(method.split()[1])
-            value = 0
+            # query_ball_point uses <=, the cutoff is exclusive
+            cutoff = np.nextafter(cutoff, 0)
+            return np.array([len(nts) for nts in tree.query_ball_point(centers, cutoff)])
+        raise ValueError("Not supported method {}".format(method))
+
+    def _virtual_atoms_near(self, centers, radius):
+        """
+        All pairs of centers and virtual atoms at most radius apart.
+
+        :returns: A tuple (rows, cols, dists) of arrays, with the index of
+                  the center, the index of the virtual atom (see
+                  `_virtual_atom_tree`) and their distance.
+        """
+        tree, _, _ = self._virtual_atom_tree()
+        pairs = scipy.spatial.cKDTree(centers).sparse_distance_matrix(
+            tree, radius, output_type="ndarray")
+        return pairs["i"], pairs["j"], pairs["v"]
+
+    def _virtual_atom_kde(self):
+        """
+        A gaussian kernel density estimate of all virtual atoms.
+        It is cached like the `_virtual_atom_tree`.
+        """
+        if getattr(self, "_vatom_kde", None) is None:
+            _, all_vas, _ = self._virtual_atom_tree()
+            log.debug("Shape of all atoms {}".format(all_vas.shape))
+            # randomly take 50 Angstrom bandwidth
+            self._vatom_kde = scipy.stats.gaussian_kde(all_vas.T, 50)
+        return self._vatom_kde
+
+    def _steric_center(self, elements):
+        if isinstance(elements, list) or isinstance(elements, tuple):
+            return ftuv.get_vector_centroid(self.coords[elements])
+        elif np.shape(elements) == (3,):
+            return elements
+        raise ValueError("Expected a list of elements or a center of shape "
+                         "(3,), got {!r}".format(elements))
+
+    def _virtual_atom_tree(self):
+        """
+        A KD-tree of all virtual atoms of the structure.
+
+        It is cached and invalidated by `reset_vatom_cache`,
+        whenever the coordinates or twists change.
+
+        :returns: A tuple (tree, coords, nts), where `tree` is a
+                  scipy.spatial.cKDTree, coords a Nx3 array of
+                  all virtual atom positions and nts an array with
+                  the nucleotide number of every virtual atom.
+        """
+        if getattr(self, "_vatom_tree", None) is None:
+            all_vas = []
+            nts = []
             for pos in range(1, self.seq_length + 1):
                 for va in self.virtual_atoms(pos).values():
-                    if ftuv.vec_distance(va, center) < cutoff:
-                        value += 1
-            return value
+                    all_vas.append(va)
+                    nts.append(pos)
+            all_vas = np.array(all_vas, dtype=float).reshape(-1, 3)
+            self._vatom_tree = (scipy.spatial.cKDTree(all_vas), all_vas,
+                                np.array(nts, dtype=int))
+        return self._vatom_tree
 
     def _get_twist_str(self):
         '''
@@ -1157,8 +1419,9 @@ def get_stacking_helices(self, method="Tyagi"):
         :returns: A list of sets of element names.
         """
         helices = []
+        stacking = self.get_stacking_table(method)
         for d in self.defines:
-            if d[0] in "mi" and self.is_stacking(d, method):
+            if d[0] in "mi" and stacking[d]:
                 s1, s2 = self.connections(d)
                 helices.append(set([d, s1, s2]))
             if d[0] == "s":
@@ -1191,6 +1454,27 @@ def is_stacking(self, bulge, method="Tyagi", verbose=False):
             return self._is_stacking_tyagi(bulge, verbose)
         return self._is_stacking_CG(bulge, verbose)
 
+    def get_stacking_table(self, method="Tyagi"):
+        """
+        EXPERIMENTAL
+
+        Like is_stacking, but for all interior loops and multiloop segments
+        at once.
+
+        For the method "Tyagi", the basepair centers and planes of all
+        loop-flanking basepairs are calculated together and the cutoffs
+        are applied to all of them in a vectorized way.
+
+        :param method": STRING. "Tyagi" or "CG", see `is_stacking`
+        :returns: A dictionary {element_name: BOOLEAN} for all elements
+                  of type "i" and "m".
+        """
+        assert method in ["Tyagi", "CG"]
+        bulges = [d for d in self.defines if d[0] in "mi"]
+        if method == "CG":
+            return {b: self._is_stacking_CG(b) for b in bulges}
+        return self._stacking_table_tyagi(bulges)
+
     def _is_stacking_CG(self, bulge, verbose=False):
         """"""
         stem1, stem2 = self.connections(bulge)
@@ -1229,12 +1513,10 @@ def _is_stacking_tyagi(self, bulge, verbose=False):
             focus of the paper, only the method for the detection of stacking in pdb files.
         """
         assert bulge[0] in "mi"
-        DISTANCE_CUTOFF = [14, 6]
-        ANGLE_CUTOFF = [math.acos(0.75), math.acos(0.8)]
-        # Relaxed compared to 60 in the paper, because we use
-        SHEAR_ANGLE_CUTOFF = math.radians(60)
-        # virtual atom positions
-        SHEAR_OFFSET_CUTOFF = 10
+        DISTANCE_CUTOFF = TYAGI_DISTANCE_CUTOFF
+        ANGLE_CUTOFF = TYAGI_ANGLE_CUTOFF
+        SHEAR_ANGLE_CUTOFF = TYAGI_SHEAR_ANGLE_CUTOFF
+        SHEAR_OFFSET_CUTOFF = TYAGI_SHEAR_OFFSET_CUTOFF
         if bulge[0] == "m" and self.get_length(bulge) == 0:
             is_flush = True  # flush-stack vs. mismatch-mediated stack
         else:
@@ -1298,6 +1580,56 @@ def _is_stacking_tyagi(self, bulge, verbose=False):
             return False
         return True
 
+    def _stacking_table_tyagi(self, bulges):
+        """
+        Vectorized version of self._is_stacking_tyagi for a list of bulges.
+
+        Called by self.get_stacking_table("Tyagi")
+
+        :returns: A dictionary {bulge: BOOLEAN}
+        """
+        if not bulges:
+            return {}
+        is_flush = np.array([b[0] == "m" and self.get_length(b) == 0
+                             for b in bulges], dtype=int)
+        side_nts = []
+        for bulge in bulges:
+            stem1, stem2 = self.connections(bulge)
+            side_nts.append(self.get_connected_residues(stem1, stem2, bulge)[0])
+        nts1, nts2 = zip(*side_nts)
+        n = len(bulges)
+        centers, valid = ftug.get_basepair_centers(self, list(nts1 + nts2))
+        bp_center1, bp_center2 = centers[:n], centers[n:]
+        dist = np.linalg.norm(bp_center1 - bp_center2, axis=1)
+        candidates = valid[:n] & valid[n:]
+        candidates[candidates] = (dist[candidates] <=
+                                  np.array(TYAGI_DISTANCE_CUTOFF)[is_flush[candidates]])
+        stacking = np.zeros(n, dtype=bool)
+        idx = np.flatnonzero(candidates)
+        if len(idx) > 0:
+            planes = ftug.get_basepair_planes(self, [nts1[i] for i in idx] +
+                                                    [nts2[i] for i in idx])
+            normalvec1, normalvec2 = planes[:len(idx)], planes[len(idx):]
+            center_diff = bp_center1[idx] - bp_center2[idx]
+            # Coaxial
+            angle = ftuv.vec_angle_vectorized(normalvec1, normalvec2)
+            angle = np.where(angle > math.pi / 2, math.pi - angle, angle)
+            ok = angle <= np.array(TYAGI_ANGLE_CUTOFF)[is_flush[idx]]
+            # Shear Angle
+            for normalvec, direction in [(normalvec1, -center_diff),
+                                         (normalvec2, center_diff)]:
+                shear_angle = ftuv.vec_angle_vectorized(normalvec, direction)
+                shear_angle = np.where(shear_angle > math.pi / 2,
+                                       math.pi - shear_angle, shear_angle)
+                ok &= shear_angle <= TYAGI_SHEAR_ANGLE_CUTOFF
+            # Shear Offset
+            for normalvec in [normalvec1, normalvec2]:
+                offset = (np.linalg.norm(np.cross(center_diff, normalvec), axis=1) /
+                          np.linalg.norm(normalvec, axis=1))
+                ok &= offset <= TYAGI_SHEAR_OFFSET_CUTOFF
+            stacking[idx] = ok
+        return dict(zip(bulges, stacking.tolist()))
+
     def get_stem_stats(self, stem):
         '''
         Calculate the statistics for a stem and return them. These statistics will describe the
@@ -1802,6 +2134,8 @@ def reset_vatom_cache(self, key):
 
         :param key: A coarse grain element name, e.g. "s1" or "m15"
         """
+        self._vatom_tree = None
+        self._vatom_kde = None
         try:
             if not self._virtual_atom_cache:
                 return
@@ -134,6 +134,19 @@ def get_array(self):
         """
         return np.copy(self._coordinates)
 
+    def set_array(self, array):
+        """
+        Replace all coordinates by a copy of array,
+        which has to have the same shape as the array returned by get_array.
+        """
+        array = np.array(array, dtype=float)
+        if array.shape != self._coordinates.shape:
+            raise ValueError("Expected an array of shape {}, found {}".format(
+                self._coordinates.shape, array.shape))
+        self._coordinates = array
+        for key in self._elem_names:
+            self.on_change(key)
+
     @property
     def is_filled(self):
         """
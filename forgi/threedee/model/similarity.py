@@ -15,7 +15,7 @@
 
 
 log = logging.getLogger(__name__)
-__all__ = ['AdjacencyCorrelation', 'cg_rmsd', 'rmsd', 'drmsd']
+__all__ = ['AdjacencyCorrelation', 'cg_rmsd', 'rmsd', 'drmsd', 'rmsd_batch', 'rmsd_matrix']
 
 """
 This module contains functions for the comparison of two cg objects or two ordered point-clouds.
@@ -90,7 +90,13 @@ class AdjacencyCorrelation(object):
     from each other. See chapter 9.3 of Peter's thesis.
 
     This object is initialized with a reference structure and a distance for interactions.
-    The evaluate() method is used for calculating this correlation matrix.
+    The evaluate() method is used for calculating this correlation matrix,
+    evaluate_many() for the coordinates of many models at once.
+
+    Which pairs of elements can interact (not connected and at least bp_distance
+    apart in the secondary structure) and which of them interact in the reference
+    is calculated only once, when this object is created.
+    Thus all compared models need to have the secondary structure of the reference.
 
     This is significantly faster than the confusion_matrix function, if
     many structures will be compared to the same reference structure.
@@ -99,25 +105,39 @@ class AdjacencyCorrelation(object):
     def __init__(self, reference_cg, distance=25.0, bp_distance=16):
         self._distance = distance
         self._bp_distance = bp_distance
+        elem_names = reference_cg.coords._elem_names
+        #: The elements in the order of the rows of cg.coords.get_array()
+        self._elements = sorted(elem_names, key=elem_names.__getitem__)
+        self._ignore = set()
+        pairs = []
+        for i, j in it.combinations(range(len(self._elements)), r=2):
+            n1 = self._elements[i]
+            n2 = self._elements[j]
+            if reference_cg.connected(n1, n2):
+                self._ignore.add((n1, n2))
+                continue
+            bp_dist = reference_cg.min_max_bp_distance(n1, n2)[0]
+            if bp_dist < self._bp_distance:
+                self._ignore.add((n1, n2))
+                continue
+            pairs.append((i, j))
+        #: The indices (into self._elements) of all pairs that can interact.
+        self._pairs = np.array(pairs, dtype=int).reshape((-1, 2))
+        self._all_interactions = set(tuple(sorted((self._elements[i], self._elements[j])))
+                                     for i, j in pairs)
         self._reference_interactions = self._get_interactions(reference_cg)
+        #: For every pair in self._pairs, whether it interacts in the reference.
+        self._reference_vector = np.array([tuple(sorted((self._elements[i],
+                                                         self._elements[j])))
+                                           in self._reference_interactions
+                                           for i, j in pairs], dtype=bool)
 
     @profile
     def _get_interactions(self, cg):
         """
         :return: A set of 2-tuples containing elements that pair.
         """
-        ignore = set()
-        for n1, n2 in it.combinations(cg.defines.keys(), r=2):
-            if cg.connected(n1, n2):
-                ignore.add((n1, n2))
-                continue
-            bp_dist = cg.min_max_bp_distance(n1, n2)[0]
-            if bp_dist < self._bp_distance:
-                ignore.add((n1, n2))
-
-        interactions = set(
-            cg.coords.elements_closer_than(self._distance, ignore))
-        return interactions
+        return set(cg.coords.elements_closer_than(self._distance, self._ignore))
 
     def evaluate(self, cg):
         '''
@@ -131,23 +151,54 @@ def evaluate(self, cg):
         :return: A dictionary like this: `{"tp": tp, "tn": tn, "fp": fp, "fn": fn}`
         '''
         interactions = self._get_interactions(cg)
-        nodes = set(cg.defines.keys())
-        allIA = set()
-        for n1, n2 in it.combinations(nodes, r=2):
-            if cg.connected(n1, n2):
-                continue
-            bp_dist = cg.min_max_bp_distance(n1, n2)[0]
-            if bp_dist < self._bp_distance:
-                continue
-            allIA.add(tuple(sorted((n1, n2))))
-
         d = {"tp": 0, "tn": 0, "fp": 0, "fn": 0}
         d["tp"] = len(self._reference_interactions & interactions)
         d["fp"] = len(interactions - self._reference_interactions)
         d["fn"] = len(self._reference_interactions - interactions)
-        d["tn"] = len(allIA - (self._reference_interactions | interactions))
+        d["tn"] = len(self._all_interactions -
+                      (self._reference_interactions | interactions))
         return d
 
+    def evaluate_many(self, coords, chunksize=100):
+        '''
+        Like evaluate, but for the coarse grained coordinates of many models.
+
+        The distances between all pairs of elements of all models are
+        calculated vectorized, with `ftuv.line_segment_distance_vectorized`.
+        This is the exact distance of the line segments, whereas
+        `LineSegmentStorage.elements_closer_than` used by evaluate may
+        misjudge some pairs of strongly distorted models.
+
+        :param coords: An array of shape (n_models, 2*n_elements, 3), with the
+                       rows in the order of `reference_cg.coords.get_array()`,
+                       e.g. `CoarseGrainTrajectory.coords`
+        :param chunksize: How many models are processed at once.
+                          This bounds the memory needed for intermediate arrays.
+        :return: A dictionary like this: `{"tp": tp, "tn": tn, "fp": fp, "fn": fn}`,
+                 where the values are integer arrays of length n_models.
+        '''
+        coords = np.asarray(coords, dtype=float)
+        if coords.ndim != 3 or coords.shape[1:] != (2 * len(self._elements), 3):
+            raise Incompareable("Cannot compare coordinates of shape {} to a "
+                                "reference with {} "
+                                "elements".format(coords.shape, len(self._elements)))
+        i = self._pairs[:, 0]
+        j = self._pairs[:, 1]
+        interactions = np.empty((len(coords), len(self._pairs)), dtype=bool)
+        for start in range(0, len(coords), chunksize):
+            chunk = coords[start:start + chunksize]
+            p, q = ftuv.line_segment_distance_vectorized(
+                chunk[:, 2 * i].reshape((-1, 3)), chunk[:, 2 * i + 1].reshape((-1, 3)),
+                chunk[:, 2 * j].reshape((-1, 3)), chunk[:, 2 * j + 1].reshape((-1, 3)))
+            distances = np.linalg.norm(p - q, axis=1)
+            interactions[start:start + chunksize] = (distances < self._distance).reshape(
+                (len(chunk), len(self._pairs)))
+        reference = self._reference_vector
+        return {"tp": np.sum(interactions & reference, axis=1),
+                "fp": np.sum(interactions & ~reference, axis=1),
+                "fn": np.sum(~interactions & reference, axis=1),
+                "tn": np.sum(~interactions & ~reference, axis=1)}
+
 
 def optimal_superposition(crds1, crds2):
     """
@@ -255,6 +306,74 @@ def rmsd_kabsch(crds1, crds2, is_centered=False):
     return math.sqrt(sum(vec_lengths) / len(vec_lengths))
 
 
+def _superimposed_rmsd(crds1, crds2):
+    """
+    The RMSD after optimal superposition for arrays of centered
+    coordinate sets of shape (..., n_points, 3), which broadcast
+    against each other.
+    """
+    h = np.einsum("...ki,...kj->...ij", crds1, crds2)
+    s = np.linalg.svd(h, compute_uv=False)
+    # Correct for reflections
+    s[..., -1] *= np.sign(np.linalg.det(h))
+    sq_dev = (np.sum(crds1 * crds1, axis=(-1, -2)) +
+              np.sum(crds2 * crds2, axis=(-1, -2)) - 2 * np.sum(s, axis=-1))
+    return np.sqrt(np.maximum(sq_dev, 0) / crds1.shape[-2])
+
+
+def rmsd_batch(reference, coords, superimpose=True):
+    """
+    The RMSD between one reference and many coordinate sets.
+
+    :param reference: An array of shape (n_points, 3)
+    :param coords: An array of shape (n_models, n_points, 3)
+    :param superimpose: If True, the RMSD after optimal superposition
+                        (like rmsd_kabsch), otherwise of the coordinates as
+                        they are.
+    :returns: An array of length n_models
+    """
+    reference = np.asarray(reference, dtype=float)
+    coords = np.asarray(coords, dtype=float)
+    if coords.ndim != 3 or coords.shape[1:] != reference.shape:
+        raise Incompareable("Cannot compare coordinates of shape {} to a "
+                            "reference of shape {}".format(coords.shape,
+                                                           reference.shape))
+    if not superimpose:
+        return np.sqrt(np.mean(np.sum((coords - reference)**2, axis=2), axis=1))
+    reference = reference - np.mean(reference, axis=0)
+    coords = coords - np.mean(coords, axis=1)[:, np.newaxis, :]
+    return _superimposed_rmsd(reference[np.newaxis], coords)
+
+
+def rmsd_matrix(coords, superimpose=True, chunksize=100):
+    """
+    The all-vs-all RMSD matrix of many coordinate sets, e.g. decoys.
+
+    :param coords: An array of shape (n_models, n_points, 3)
+    :param superimpose: See rmsd_batch
+    :param chunksize: How many rows of the matrix are calculated at once.
+                      This bounds the memory needed for intermediate arrays.
+    :returns: A symmetric array of shape (n_models, n_models)
+    """
+    coords = np.asarray(coords, dtype=float)
+    if coords.ndim != 3:
+        raise ValueError("Expected an array of shape (n_models, n_points, 3), "
+                         "found {}".format(coords.shape))
+    if superimpose:
+        coords = coords - np.mean(coords, axis=1)[:, np.newaxis, :]
+    n = len(coords)
+    matrix = np.zeros((n, n))
+    for start in range(0, n, chunksize):
+        rows = coords[start:start + chunksize, np.newaxis]
+        if superimpose:
+            matrix[start:start + chunksize] = _superimposed_rmsd(rows, coords[np.newaxis])
+        else:
+            matrix[start:start + chunksize] = np.sqrt(np.mean(
+                np.sum((rows - coords[np.newaxis])**2, axis=3), axis=2))
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
 def drmsd(coords1, coords2):
     '''
     Calculate the dRMSD measure.
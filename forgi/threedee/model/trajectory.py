@@ -0,0 +1,200 @@
+"""
+Coarse grained trajectories: Many frames (e.g. the models of an NMR ensemble
+or the frames of an MD simulation) of the same RNA.
+
+All frames share the secondary structure and annotation of a single
+CoarseGrainRNA, only the coarse grained coordinates and twists are
+stored per frame, as numpy arrays.
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+try:
+    from collections.abc import Sequence
+except ImportError:  # Python 2
+    from collections import Sequence
+import logging
+import warnings
+
+import numpy as np
+
+import forgi.threedee.model.coarse_grain as ftmc
+import forgi.threedee.utilities.atom_array as ftuaa
+import forgi.threedee.utilities.graph_pdb as ftug
+import forgi.threedee.utilities.pdb as ftup
+from forgi.utilities.exceptions import CgConstructionError
+
+log = logging.getLogger(__name__)
+
+
+class CoarseGrainTrajectory(Sequence):
+    """
+    A sequence of frames of the same CoarseGrainRNA.
+
+    Indexing the trajectory returns a new CoarseGrainRNA for the frame.
+    For fast analysis use the arrays `coords` and `twists` instead,
+    which have the shapes (n_frames, 2*len(cg.coords), 3)
+    and (n_frames, 2*len(cg.twists), 3) and the row order of
+    `cg.coords.get_array()` and `cg.twists.get_array()`.
+    """
+
+    def __init__(self, cg):
+        """
+        :param cg: The CoarseGrainRNA all frames belong to.
+                   Its coordinates are not added as a frame.
+        """
+        self.cg = cg
+        self._coords = []
+        self._twists = []
+        self._cg_string = None
+
+    def append(self, coords, twists):
+        """
+        Add a frame.
+
+        :param coords, twists: Arrays like returned by
+                               `cg.coords.get_array()` and
+                               `cg.twists.get_array()`
+        """
+        coords = np.asarray(coords, dtype=float)
+        twists = np.asarray(twists, dtype=float)
+        if coords.shape != self.cg.coords._coordinates.shape:
+            raise ValueError("Coordinates of shape {} do not match the "
+                             "RNA".format(coords.shape))
+        if twists.shape != self.cg.twists._coordinates.shape:
+            raise ValueError("Twists of shape {} do not match the "
+                             "RNA".format(twists.shape))
+        if isinstance(self._coords, np.ndarray):
+            self._coords = list(self._coords)
+            self._twists = list(self._twists)
+        self._coords.append(coords)
+        self._twists.append(twists)
+
+    def append_cg(self, cg):
+        """
+        Add the coordinates of a CoarseGrainRNA with the same
+        elements as a frame.
+        """
+        self.append(cg.coords.get_array(), cg.twists.get_array())
+
+    @property
+    def coords(self):
+        if not isinstance(self._coords, np.ndarray):
+            self._coords = np.array(self._coords, dtype=float).reshape(
+                (-1,) + self.cg.coords._coordinates.shape)
+        return self._coords
+
+    @property
+    def twists(self):
+        if not isinstance(self._twists, np.ndarray):
+            self._twists = np.array(self._twists, dtype=float).reshape(
+                (-1,) + self.cg.twists._coordinates.shape)
+        return self._twists
+
+    def __len__(self):
+        return len(self._coords)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Frame {} out of range".format(i))
+        if self._cg_string is None:
+            self._cg_string = self.cg.to_cg_string()
+        cg = ftmc.CoarseGrainRNA.from_bg_string(self._cg_string)
+        cg.coords.set_array(self.coords[i])
+        cg.twists.set_array(self.twists[i])
+        return cg
+
+    def save(self, filename):
+        """
+        Store the trajectory in a numpy .npz file.
+        """
+        np.savez_compressed(filename, cg=np.array(self.cg.to_cg_string()),
+                            coords=self.coords, twists=self.twists)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a trajectory stored with `save`.
+        """
+        with np.load(filename) as data:
+            traj = cls(ftmc.CoarseGrainRNA.from_bg_string(str(data["cg"])))
+            traj._coords = data["coords"]
+            traj._twists = data["twists"]
+        return traj
+
+
+def _add_frame_from_chains(traj, chains):
+    """
+    Calculate the coarse grained coordinates of traj.cg from chains
+    and add them as a frame.
+
+    Only the stem, bulge and loop coordinates and the twists are
+    calculated. This changes the coordinates of traj.cg.
+    """
+    cg = traj.cg
+    cg.chains = {chain.id: chain for chain in chains if chain.id in cg.chains}
+    try:
+        ftug.add_stem_information_from_pdb_chains(cg)
+        cg.add_bulge_coords_from_stems()
+        ftug.add_loop_information_from_pdb_chains(cg)
+    except KeyError as e:
+        raise CgConstructionError("Residue or chain {} of RNA {} is not "
+                                  "present in all models.".format(e, cg.name))
+    traj.append_cg(cg)
+
+
+def trajectories_from_pdb(pdb_filename, load_chains=None,
+                          remove_pseudoknots=False,
+                          dissolve_length_one_stems=True,
+                          secondary_structure=None, filetype=None,
+                          annotation_tool=None, query_PDBeChem=False):
+    """
+    Load all models of a multi-model PDB or mmCIF file.
+
+    The secondary structure is annotated only once, for the first model,
+    using `CoarseGrainRNA.from_pdb`. For all other models, only the
+    coarse grained coordinates are calculated, using the same residues.
+
+    See CoarseGrainRNA.from_pdb for a description of the parameters.
+
+    :returns: A list of CoarseGrainTrajectory objects, one for every RNA
+              returned by from_pdb. The cg attribute of every trajectory is
+              the CoarseGrainRNA of the first model.
+    """
+    if filetype is None:
+        filetype = ftup._guess_filetype(pdb_filename)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "Multiple models in file")
+        cgs = ftmc.CoarseGrainRNA.from_pdb(pdb_filename, load_chains,
+                                           remove_pseudoknots,
+                                           dissolve_length_one_stems,
+                                           secondary_structure, filetype,
+                                           annotation_tool, query_PDBeChem)
+    trajectories = [CoarseGrainTrajectory(cg) for cg in cgs]
+    first_chains = [cg.chains for cg in cgs]
+    for traj in trajectories:
+        traj.append_cg(traj.cg)
+    if filetype == "pdb":
+        atoms, _ = ftuaa.read_pdb(pdb_filename, all_models=True)
+    else:
+        atoms, _ = ftuaa.read_cif(pdb_filename, all_models=True,
+                                  categories=["_atom_site"])
+    _, first = np.unique(atoms.models, return_index=True)
+    models = atoms.models[np.sort(first)]
+    chain_ids = set(chain_id for cg in cgs for chain_id in cg.chains)
+    try:
+        for model in models[1:]:
+            log.info("Loading model %s", model)
+            model_atoms = ftuaa.clean_atoms(atoms.select(atoms.models == model))
+            chains = [ftup.clean_chain(chain, query_PDBeChem)[0]
+                      for chain in model_atoms.to_chains(sorted(chain_ids))]
+            for traj in trajectories:
+                _add_frame_from_chains(traj, chains)
+    finally:
+        # Reset all RNAs to the first model
+        for traj, chains in zip(trajectories, first_chains):
+            traj.cg.chains = chains
+            traj.cg.coords.set_array(traj.coords[0])
+            traj.cg.twists.set_array(traj.twists[0])
+    return trajectories
@@ -0,0 +1,224 @@
+"""
+An on-disk cache for the results of external annotation tools
+(DSSR and MC-Annotate).
+
+Annotating a PDB file with an external program dominates the time needed
+by `CoarseGrainRNA.from_pdb`. The cache stores the annotation
+(the bpseq string, the seq_ids and the DSSR json) in a gzipped json
+file, addressed by a hash of the cleaned structure file, the tool,
+the tool version and the options.
+
+The cache lives in the subdirectory "annotations" of the cache
+directory given by `forgi.config.get_cache_dir`. Its size is limited
+by the configuration value "ANNOTATION_CACHE_SIZE" (in MB), which can be
+overridden by the environment variable FORGI_ANNOTATION_CACHE_SIZE.
+If the cache grows larger, the least recently used entries are deleted.
+A size of 0 disables the cache.
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import os.path as op
+import tempfile
+
+import forgi
+import forgi.config
+import forgi.graph.residue as fgr
+
+log = logging.getLogger(__name__)
+
+#: Default maximal size of the cache in MB, if not set in the configuration.
+DEFAULT_MAX_SIZE = 100
+#: If this environment variable is set, it overrides the configuration
+#: value "ANNOTATION_CACHE_SIZE".
+SIZE_ENVIRONMENT_VARIABLE = "FORGI_ANNOTATION_CACHE_SIZE"
+#: Increase this, whenever the format of the cache entries changes.
+CACHE_FORMAT_VERSION = 1
+
+try:
+    _replace = os.replace
+except AttributeError:  # Python 2
+    _replace = os.rename
+
+
+def tool_version(executable):
+    """
+    A string identifying the installed version of an executable.
+
+    Instead of running the executable, we use its path, size and
+    modification time, which change whenever the tool is updated.
+
+    :param executable: The full path to the executable.
+    """
+    stat = os.stat(executable)
+    return "{}:{}:{}".format(op.realpath(executable), stat.st_size,
+                             int(stat.st_mtime))
+
+
+class AnnotationCache(object):
+    """
+    A content-addressed cache for annotations of structure files.
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        """
+        :param directory: The cache directory. Defaults to the subdirectory
+                          "annotations" of forgi.config.get_cache_dir()
+        :param max_size: The maximal size in MB. Defaults to the environment
+                         variable FORGI_ANNOTATION_CACHE_SIZE, the
+                         configuration value "ANNOTATION_CACHE_SIZE" or
+                         DEFAULT_MAX_SIZE.
+        """
+        if directory is None:
+            directory = op.join(forgi.config.get_cache_dir(), "annotations")
+        if max_size is None and os.environ.get(SIZE_ENVIRONMENT_VARIABLE):
+            max_size = float(os.environ[SIZE_ENVIRONMENT_VARIABLE])
+        if max_size is None:
+            max_size = forgi.config.read_config().get("ANNOTATION_CACHE_SIZE",
+                                                      DEFAULT_MAX_SIZE)
+        self.directory = directory
+        self.max_size = max_size
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, filename, tool, version, options=None):
+        """
+        The cache key for the annotation of a file.
+
+        :param filename: The (cleaned) structure file, which is annotated.
+        :param tool: The name of the annotation tool
+        :param version: A string describing the version of the tool,
+                        e.g. from `tool_version`
+        :param options: A json-serializable object with further options.
+        """
+        h = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(2**16), b""):
+                h.update(block)
+        h.update(json.dumps([CACHE_FORMAT_VERSION, tool, version, options],
+                            sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return op.join(self.directory, key + ".json.gz")
+
+    def get(self, key):
+        """
+        :returns: A tuple (bpseq, seq_ids, dssr_dict) or None, if the key
+                  is not in the cache.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                entry = json.loads(f.read().decode("utf-8"))
+        except (IOError, OSError, ValueError) as e:
+            log.debug("No annotation cached for key %s: %s", key, e)
+            return None
+        try:
+            os.utime(path, None)  # For least-recently-used eviction
+        except OSError:
+            pass
+        log.info("Using cached annotation %s", path)
+        seq_ids = [None if seq_id is None else
+                   fgr.RESID(seq_id[0], (seq_id[1], seq_id[2], seq_id[3]))
+                   for seq_id in entry["seq_ids"]]
+        return entry["bpseq"], seq_ids, entry["dssr"]
+
+    def put(self, key, annotation):
+        """
+        Store an annotation in the cache and evict old entries,
+        if the cache grows too large.
+
+        :param annotation: A tuple (bpseq, seq_ids, dssr_dict)
+        """
+        if not self.enabled:
+            return
+        bpseq, seq_ids, dssr_dict = annotation
+        entry = {"bpseq": bpseq,
+                 "seq_ids": [None if seq_id is None else
+                             [seq_id.chain, seq_id.resid[0], seq_id.resid[1],
+                              seq_id.resid[2]]
+                             for seq_id in seq_ids],
+                 "dssr": dssr_dict,
+                 "forgi_version": forgi.__version__}
+        data = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        tmp_path = None
+        try:
+            if not op.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Write to a temporary file first, so concurrent readers
+            # never see half-written entries.
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(data)
+            _replace(tmp_path, self._path(key))
+        except (IOError, OSError) as e:
+            log.warning("Could not write annotation to cache %s: %s",
+                        self.directory, e)
+            if tmp_path is not None and op.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def size(self):
+        """
+        The size of all cache entries in bytes.
+        """
+        return sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        """
+        :returns: A list of tuples (path, mtime, size)
+        """
+        entries = []
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for fn in filenames:
+            if not fn.endswith(".json.gz"):
+                continue
+            path = op.join(self.directory, fn)
+            try:
+                stat = os.stat(path)
+            except OSError:  # Deleted by a concurrent process
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self, max_size=None):
+        """
+        Delete the least recently used entries, until the cache is
+        smaller than max_size MB.
+
+        :param max_size: Defaults to self.max_size
+        """
+        if max_size is None:
+            max_size = self.max_size
+        max_bytes = max_size * 1024 * 1024
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            else:
+                log.debug("Evicted %s from annotation cache", path)
+            total -= size
+
+    def clear(self):
+        """
+        Delete all cache entries.
+        """
+        self.evict(0)
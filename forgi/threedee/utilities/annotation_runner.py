@@ -0,0 +1,223 @@
+"""
+Run the external annotation tools (DSSR and MC-Annotate) for many
+structures concurrently, using asyncio.
+
+`CoarseGrainRNA.from_pdb` waits for the annotation program to finish,
+before it continues with the next structure. The `AnnotationRunner`
+keeps up to `max_jobs` annotation subprocesses running, while the
+Python part of loading (parsing, cleaning and writing the chains and
+building the CoarseGrainRNA) is done for other structures in the meantime.
+
+Usage::
+
+    runner = AnnotationRunner(max_jobs=4, timeout=600)
+    for filename, cgs in runner.load_pdbs(filenames, skip_errors=True):
+        ...
+
+.. note::
+    This module requires Python 3.5 or newer.
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import asyncio
+import logging
+import os
+import subprocess as sp
+
+import forgi.threedee.model.coarse_grain as ftmc
+import forgi.threedee.utilities.annotation_cache as ftuac
+from forgi.utilities.exceptions import CgConstructionError
+from forgi.utilities.stuff import make_temp_directory
+
+log = logging.getLogger(__name__)
+
+
+class AnnotationTimeoutError(CgConstructionError):
+    """
+    Raised if the annotation program did not finish in time.
+    """
+
+
+class AnnotationRunner(object):
+    """
+    Annotate structure files with at most max_jobs external
+    processes at the same time.
+    """
+
+    def __init__(self, max_jobs=None, timeout=None, annotation_tool=None):
+        """
+        :param max_jobs: The maximal number of annotation subprocesses
+                         running at the same time.
+                         Defaults to the number of CPUs.
+        :param timeout: The time in seconds, after which an annotation
+                        subprocess is killed and an AnnotationTimeoutError
+                        is raised. None for no timeout.
+        :param annotation_tool: See CoarseGrainRNA.from_pdb
+        """
+        if max_jobs is None:
+            max_jobs = os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self.annotation_tool = annotation_tool
+        # Created lazily, because it has to belong to the running event loop.
+        self._semaphore = None
+
+    async def _run(self, arguments):
+        """
+        Run a subprocess and wait for it to finish.
+
+        If the timeout is exceeded or the calling task is cancelled,
+        the subprocess is killed.
+
+        :returns: A tuple (returncode, stdout, stderr)
+        """
+        log.info("Running %s", sp.list2cmdline(arguments))
+        process = await asyncio.create_subprocess_exec(
+            *arguments, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE)
+        try:
+            out, err = await asyncio.wait_for(process.communicate(),
+                                              self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AnnotationTimeoutError(
+                    "{} did not finish within {} seconds".format(arguments[0],
+                                                                 self.timeout))
+            raise
+        return (process.returncode, out.decode("utf-8", "replace"),
+                err.decode("utf-8", "replace"))
+
+    async def _run_dssr(self, filename):
+        with make_temp_directory() as dssr_output_dir:
+            arguments = ftmc._dssr_arguments(filename, dssr_output_dir)
+            _, _, err = await self._run(arguments)
+            try:
+                return ftmc._read_dssr_output(dssr_output_dir)
+            except (OSError, IOError):
+                err_msg = err.splitlines()
+                if len(err_msg) >= 3:
+                    raise CgConstructionError(
+                        "DSSR could not process the file: " + err_msg[-3])
+                raise
+
+    async def _run_mc_annotate(self, filename):
+        arguments = ftmc._mc_annotate_arguments(filename)
+        returncode, out, _ = await self._run(arguments)
+        if returncode != 0:
+            raise sp.CalledProcessError(returncode, arguments, out)
+        return ftmc._mc_annotate_dotplot(out.strip().split('\n'))
+
+    async def annotate(self, filename, filetype="pdb"):
+        """
+        Annotate a cleaned structure file, waiting, while max_jobs
+        annotation programs are already running.
+
+        Cached annotations are returned without running the
+        annotation program, see `forgi.threedee.utilities.annotation_cache`.
+
+        :param filename: The cleaned structure file.
+        :param filetype: One of 'pdb' or 'cif'
+        :returns: A tuple (bpseq, seq_ids, dssr_dict) or None, if the
+                  forgi fallback annotation should be used.
+        """
+        executable = ftmc._annotation_executable(self.annotation_tool, filetype)
+        if executable is None:
+            return None
+        cache = ftuac.AnnotationCache()
+        key = None
+        if cache.enabled:
+            key = ftmc._annotation_cache_key(cache, filename, executable)
+            annotation = cache.get(key)
+            if annotation is not None:
+                return annotation
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_jobs)
+        async with self._semaphore:
+            if executable == "x3dna-dssr":
+                annotation = await self._run_dssr(filename)
+            else:
+                annotation = await self._run_mc_annotate(filename)
+        if key is not None:
+            cache.put(key, annotation)
+        return annotation
+
+    async def from_pdb(self, pdb_filename, load_chains=None,
+                       remove_pseudoknots=False, dissolve_length_one_stems=True,
+                       secondary_structure=None, filetype="pdb",
+                       query_PDBeChem=False, interactions=True):
+        """
+        The asynchronous version of `CoarseGrainRNA.from_pdb`.
+        See there for a description of the parameters.
+
+        :returns: A list of CoarseGrainRNA objects
+        """
+        cls = ftmc.CoarseGrainRNA
+        with make_temp_directory() as output_dir:
+            structure, rna_pdb_fn = cls._prepare_pdb(pdb_filename, output_dir,
+                                                     load_chains, filetype,
+                                                     query_PDBeChem, interactions)
+            annotation = await self.annotate(rna_pdb_fn, filetype)
+        return cls._from_pdb_annotation(pdb_filename, structure, annotation,
+                                        remove_pseudoknots,
+                                        dissolve_length_one_stems,
+                                        secondary_structure)
+
+    async def from_pdbs(self, pdb_filenames, skip_errors=False, **kwargs):
+        """
+        Load many pdb files concurrently.
+
+        At most 2*max_jobs files are loaded at the same time, so the
+        next files are already prepared while the annotation programs run.
+        If an error is not skipped, all other jobs are cancelled.
+
+        :param skip_errors: Boolean. Log errors and continue with the
+                            remaining files, instead of letting the
+                            error propagate.
+        :param kwargs: Passed to from_pdb
+        :returns: A list of tuples (filename, cgs), in the order of the
+                  filenames. Skipped files are not part of the list.
+        """
+        pdb_filenames = list(pdb_filenames)
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        job_semaphore = asyncio.Semaphore(2 * self.max_jobs)
+
+        async def job(pdb_filename):
+            async with job_semaphore:
+                try:
+                    return await self.from_pdb(pdb_filename, **kwargs)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    if not skip_errors:
+                        log.error("An error occurred while loading the file {}".format(pdb_filename))
+                        raise
+                    log.exception("The PDB {} was skipped due to the following error".format(pdb_filename))
+                    return None
+        tasks = [asyncio.ensure_future(job(fn)) for fn in pdb_filenames]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for the cancelled tasks, so their subprocesses are killed.
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return [(fn, cgs) for fn, cgs in zip(pdb_filenames, results)
+                if cgs is not None]
+
+    def load_pdbs(self, pdb_filenames, skip_errors=False, **kwargs):
+        """
+        Like from_pdbs, but usable from synchronous code.
+        Runs a new event loop until all files are loaded.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                self.from_pdbs(pdb_filenames, skip_errors, **kwargs))
+        finally:
+            loop.close()
+            self._semaphore = None
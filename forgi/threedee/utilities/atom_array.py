@@ -0,0 +1,882 @@
+"""
+A lean, numpy based representation of the atoms in a PDB or mmCIF file.
+
+Building a Biopython structure for every atom in a large file (e.g. a
+whole ribosome with all its proteins, ions and waters) is slow and needs
+a lot of memory. An `AtomArray` stores one numpy array per column
+instead, which allows to filter the atoms (e.g. to RNA chains) before
+any Biopython objects are created. Biopython chains are only
+materialized on request, with `AtomArray.to_chains`.
+"""
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+from builtins import range, zip
+
+import itertools
+import logging
+import re
+import warnings
+
+import numpy as np
+import scipy.spatial
+import Bio.PDB as bpdb
+from Bio.PDB.PDBExceptions import PDBConstructionException, PDBConstructionWarning
+
+log = logging.getLogger(__name__)
+
+#: The columns of an AtomArray, in the order used by the readers.
+COLUMNS = ["coords", "atom_names", "resnames", "chains", "resids", "icodes",
+           "hetflags", "altlocs", "occupancies", "bfactors", "elements",
+           "segids", "serials", "models"]
+
+#: The mmCIF categories read by default by read_cif
+CIF_CATEGORIES = ["_atom_site", "_pdbx_poly_seq_scheme",
+                  "_pdbx_struct_assembly_gen", "_pdbx_struct_oper_list"]
+
+# Residue names of Rosetta and iFoldRNA structures
+RENAMED_RESIDUES = {'rA': 'A', 'rC': 'C', 'rG': 'G', 'rU': 'U',
+                    'ADE': 'A', 'CYT': 'C', 'GUA': 'G', 'URI': 'U'}
+
+
+class AtomArray(object):
+    """
+    A collection of atoms, stored column-wise in numpy arrays.
+
+    Every column has one entry per atom:
+
+    * coords: A Nx3 float array
+    * atom_names, resnames, chains, icodes, altlocs, elements, segids:
+      Arrays of strings. Atom and residue names are stripped.
+    * resids, serials, models: Integer arrays. Models are numbered
+      from 0, like Biopython models.
+    * hetflags: The hetero-field of the Biopython residue id, i.e.
+      " " for ATOM records, "W" for water and "H_" + the residue
+      name in the file for other HETATM records.
+    * occupancies, bfactors: Float arrays.
+    """
+
+    def __init__(self, **columns):
+        missing = set(COLUMNS) - set(columns)
+        if missing:
+            raise ValueError("Missing columns: {}".format(sorted(missing)))
+        for column in COLUMNS:
+            setattr(self, column, np.asarray(columns[column]))
+        self.coords = self.coords.reshape(-1, 3)
+        lengths = set(len(getattr(self, column)) for column in COLUMNS)
+        if len(lengths) > 1:
+            raise ValueError("All columns need the same length, found "
+                             "lengths {}".format(sorted(lengths)))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __repr__(self):
+        return "<AtomArray with {} atoms in chains {}>".format(
+            len(self), self.chain_ids())
+
+    def select(self, mask):
+        """
+        A new AtomArray containing only some atoms.
+
+        :param mask: A boolean mask or an index array.
+        """
+        return AtomArray(**{column: getattr(self, column)[mask]
+                            for column in COLUMNS})
+
+    @classmethod
+    def from_chains(cls, chains):
+        """
+        Create an AtomArray from Biopython chains.
+
+        All atoms are assigned to model 0. Disordered atoms and residues
+        are unpacked, like Biopython's PDBIO does.
+
+        :param chains: An iterable of Bio.PDB.Chain objects
+        """
+        residue_columns = {column: [] for column in
+                           ["resnames", "chains", "resids", "icodes",
+                            "hetflags", "segids"]}
+        atom_list = []
+        counts = []
+        for chain in chains:
+            for residue in chain.get_unpacked_list():
+                atoms = residue.get_unpacked_list()
+                hetflag, resid, icode = residue.id
+                residue_columns["resnames"].append(residue.get_resname())
+                residue_columns["chains"].append(chain.id)
+                residue_columns["resids"].append(resid)
+                residue_columns["icodes"].append(icode)
+                residue_columns["hetflags"].append(hetflag)
+                residue_columns["segids"].append(residue.get_segid())
+                atom_list.extend(atoms)
+                counts.append(len(atoms))
+        columns = {column: np.repeat(np.array(values, dtype=int if column == "resids" else str),
+                                     counts)
+                   for column, values in residue_columns.items()}
+        columns["coords"] = np.array([a.coord for a in atom_list],
+                                     dtype=float).reshape((-1, 3))
+        columns["atom_names"] = np.array([a.get_fullname().strip() for a in atom_list],
+                                         dtype=str)
+        columns["altlocs"] = np.array([a.altloc for a in atom_list], dtype=str)
+        columns["occupancies"] = np.array([np.nan if a.occupancy is None else a.occupancy
+                                           for a in atom_list], dtype=float)
+        columns["bfactors"] = np.array([a.bfactor for a in atom_list], dtype=float)
+        columns["elements"] = np.array([(a.element or "").strip().upper()
+                                        for a in atom_list], dtype=str)
+        columns["serials"] = np.arange(1, len(atom_list) + 1)
+        columns["models"] = np.zeros(len(atom_list), dtype=int)
+        return cls(**columns)
+
+    def chain_ids(self):
+        """
+        The chain ids, in the order of their first occurrence.
+        """
+        ids, first = np.unique(self.chains, return_index=True)
+        return list(ids[np.argsort(first)])
+
+    def residue_starts(self):
+        """
+        The index of the first atom of every residue.
+
+        Like the Biopython parsers, a new residue starts whenever the
+        model, chain, residue id or residue name changes between
+        consecutive atoms.
+        """
+        if len(self) == 0:
+            return np.zeros(0, dtype=int)
+        changed = np.zeros(len(self), dtype=bool)
+        changed[0] = True
+        for column in [self.models, self.chains, self.resids, self.icodes,
+                       self.hetflags, self.resnames]:
+            changed[1:] |= column[1:] != column[:-1]
+        return np.flatnonzero(changed)
+
+    def residue_index(self):
+        """
+        For every atom, the number of the residue it belongs to.
+
+        :returns: An integer array of length len(self)
+        """
+        starts = self.residue_starts()
+        index = np.zeros(len(self), dtype=int)
+        index[starts[1:]] = 1
+        return np.cumsum(index)
+
+    def to_chains(self, chain_ids=None, structure_id="temp"):
+        """
+        Materialize Biopython chains.
+
+        Only atoms of the first model are used.
+
+        :param chain_ids: A list of chain ids or None (all chains)
+        :returns: A list of Bio.PDB.Chain objects, in the order of the file.
+        """
+        atoms = self.select(self.models == self.models[0]) if len(self) else self
+        if chain_ids is None:
+            chain_ids = atoms.chain_ids()
+        else:
+            chain_ids = [c for c in atoms.chain_ids() if c in chain_ids]
+            atoms = atoms.select(np.in1d(atoms.chains, chain_ids))
+        builder = bpdb.StructureBuilder.StructureBuilder()
+        builder.init_structure(structure_id)
+        builder.init_model(0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", PDBConstructionWarning)
+            starts = list(atoms.residue_starts()) + [len(atoms)]
+            current_chain = None
+            current_segid = None
+            for start, end in zip(starts[:-1], starts[1:]):
+                chain = atoms.chains[start]
+                if chain != current_chain:
+                    builder.init_chain(chain)
+                    current_chain = chain
+                    current_segid = None
+                if atoms.segids[start] != current_segid:
+                    current_segid = atoms.segids[start]
+                    builder.init_seg(current_segid)
+                try:
+                    builder.init_residue(atoms.resnames[start], atoms.hetflags[start],
+                                         int(atoms.resids[start]), atoms.icodes[start])
+                except PDBConstructionException as e:
+                    _permissive_warning(e, atoms.serials[start])
+                    continue
+                for i in range(start, end):
+                    try:
+                        builder.init_atom(atoms.atom_names[i],
+                                          np.array(atoms.coords[i], "f"),
+                                          atoms.bfactors[i], atoms.occupancies[i],
+                                          atoms.altlocs[i], atoms.atom_names[i],
+                                          int(atoms.serials[i]),
+                                          atoms.elements[i] or None)
+                    except PDBConstructionException as e:
+                        _permissive_warning(e, atoms.serials[i])
+        model = builder.get_structure()[0]
+        return [model[c] for c in chain_ids]
+
+
+def _permissive_warning(e, serial):
+    """
+    Like Biopython's PDBParser in PERMISSIVE mode, we ignore
+    atoms that cannot be added to the structure (e.g. duplicate atoms).
+    """
+    warnings.warn("{} Exception ignored. Atom with serial number {} "
+                  "was skipped.".format(e, serial), PDBConstructionWarning)
+
+
+def _hetflags(is_hetatm, resnames):
+    """
+    The hetero-field of the Biopython residue ids.
+    """
+    hetflags = np.where(is_hetatm, np.char.add("H_", resnames), " ")
+    hetflags[is_hetatm & np.in1d(resnames, ["HOH", "WAT"])] = "W"
+    return hetflags
+
+
+def _fixed_width_column(lines, start, end):
+    """
+    Cut a fixed-width column out of an array of byte strings.
+
+    :param lines: A numpy array of dtype S80
+    :returns: An array of byte strings of length end-start
+    """
+    chars = lines.view("S1").reshape(len(lines), -1)[:, start:end]
+    return np.ascontiguousarray(chars).view("S{}".format(end - start)).ravel()
+
+
+def _to_str(array):
+    return np.char.decode(array, "ascii")
+
+
+def _to_float(array, default):
+    try:
+        return array.astype(float)
+    except ValueError:
+        return np.array([float(x) if x.strip() else default for x in array])
+
+
+def read_pdb(filename, all_models=False):
+    """
+    Read the ATOM and HETATM records of a PDB file.
+
+    :param filename: The PDB filename
+    :param all_models: If False, only read the first model.
+    :returns: A tuple (atoms, remark_465), where atoms is an AtomArray
+              and remark_465 a list of the (stripped) REMARK 465 lines
+              describing missing residues.
+    """
+    atom_lines = []
+    models = []
+    remark_465 = []
+    model = 0
+    seen_atoms = False
+    with open(filename, "rb") as f:
+        for line in f:
+            record = line[:6]
+            if record == b"ATOM  " or record == b"HETATM":
+                atom_lines.append(line.rstrip(b"\r\n").ljust(80))
+                models.append(model)
+                seen_atoms = True
+            elif record == b"ENDMDL":
+                if not all_models:
+                    break
+                model += 1
+                seen_atoms = False
+            elif record == b"MODEL " and seen_atoms:
+                # A MODEL record without a preceding ENDMDL
+                if not all_models:
+                    break
+                model += 1
+                seen_atoms = False
+            elif line.startswith(b"REMARK 465"):
+                remark = line[10:].strip()
+                if remark:
+                    remark_465.append(remark.decode("ascii", "replace"))
+    lines = np.array(atom_lines, dtype="S80")
+    resnames = np.char.strip(_to_str(_fixed_width_column(lines, 17, 20)))
+    coords = np.zeros((len(lines), 3))
+    for i, (start, end) in enumerate([(30, 38), (38, 46), (46, 54)]):
+        coords[:, i] = _fixed_width_column(lines, start, end).astype(float)
+    serials = _fixed_width_column(lines, 6, 11)
+    try:
+        serials = serials.astype(int)
+    except ValueError:  # E.g. hybrid-36 encoded serials
+        serials = np.arange(1, len(lines) + 1)
+    atoms = AtomArray(
+        coords=coords,
+        atom_names=np.char.strip(_to_str(_fixed_width_column(lines, 12, 16))),
+        resnames=resnames,
+        chains=_to_str(_fixed_width_column(lines, 21, 22)),
+        resids=_fixed_width_column(lines, 22, 26).astype(int),
+        icodes=_to_str(_fixed_width_column(lines, 26, 27)),
+        hetflags=_hetflags(_fixed_width_column(lines, 0, 6) == b"HETATM", resnames),
+        altlocs=_to_str(_fixed_width_column(lines, 16, 17)),
+        occupancies=_to_float(_fixed_width_column(lines, 54, 60), 0.),
+        bfactors=_to_float(_fixed_width_column(lines, 60, 66), 0.),
+        elements=np.char.upper(np.char.strip(
+            _to_str(_fixed_width_column(lines, 76, 78)))),
+        segids=_to_str(_fixed_width_column(lines, 72, 76)),
+        serials=serials,
+        models=np.array(models, dtype=int)
+    )
+    return atoms, remark_465
+
+
+def atoms_from_cif_dict(cif_dict, all_models=False):
+    """
+    Create an AtomArray from the _atom_site category of a mmCIF file.
+
+    The same columns as in Biopython's MMCIFParser are used
+    (i.e. auth_asym_id for chains and auth_seq_id for residue numbers).
+
+    :param cif_dict: A dictionary like the one returned by
+                     Bio.PDB.MMCIF2Dict.MMCIF2Dict
+    :param all_models: If False, only return atoms of the first model.
+    """
+    def column(name, default=None):
+        try:
+            return np.array(cif_dict["_atom_site." + name], dtype=str)
+        except KeyError:
+            if default is None:
+                raise
+            return np.full(len(cif_dict["_atom_site.id"]), default)
+
+    def unassigned_to(col, value):
+        col = col.copy()
+        col[(col == ".") | (col == "?")] = value
+        return col
+
+    resnames = column("label_comp_id")
+    if "_atom_site.auth_seq_id" in cif_dict:
+        resids = column("auth_seq_id")
+    else:
+        resids = column("label_seq_id")
+    model_nums = column("pdbx_PDB_model_num", "1")
+    # Number models from 0, like Biopython
+    _, models = np.unique(model_nums.astype(int), return_inverse=True)
+    serials = column("id")
+    try:
+        serials = serials.astype(int)
+    except ValueError:
+        serials = np.arange(1, len(serials) + 1)
+    atoms = AtomArray(
+        coords=np.array([column("Cartn_x"), column("Cartn_y"),
+                         column("Cartn_z")], dtype=float).T,
+        atom_names=column("label_atom_id"),
+        resnames=resnames,
+        chains=column("auth_asym_id"),
+        resids=resids.astype(int),
+        icodes=unassigned_to(column("pdbx_PDB_ins_code", "?"), " "),
+        hetflags=_hetflags(column("group_PDB") == "HETATM", resnames),
+        altlocs=unassigned_to(column("label_alt_id", "."), " "),
+        occupancies=column("occupancy", "1").astype(float),
+        bfactors=column("B_iso_or_equiv", "0").astype(float),
+        elements=np.char.upper(column("type_symbol", "")),
+        segids=np.full(len(resnames), " "),
+        serials=serials,
+        models=models
+    )
+    if not all_models and len(atoms):
+        atoms = atoms.select(atoms.models == atoms.models[0])
+    return atoms
+
+
+# A token of a mmCIF data line: A single or double quoted string (the
+# closing quote has to be followed by whitespace) or an unquoted string.
+_CIF_TOKEN = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+
+def _tokenize_cif_line(line):
+    """
+    Split a line of a mmCIF file into tokens, removing quotes and comments.
+    """
+    if "'" not in line and '"' not in line and "#" not in line:
+        return line.split()
+    tokens = []
+    for match in _CIF_TOKEN.finditer(line):
+        if match.lastindex == 3 and match.group(3).startswith("#"):
+            break  # A comment
+        tokens.append(match.group(match.lastindex))
+    return tokens
+
+
+class _CifCategoryReader(object):
+    """
+    A line based state machine for read_cif_categories.
+    """
+
+    def __init__(self, categories):
+        self.wanted = set(categories)
+        self.cif_dict = {}
+        self.loop_keys = None  # The item names of the current loop
+        self.loop_values = None  # None, if the current loop is skipped
+        self.in_loop_header = False
+        self.pending_key = None  # A wanted non-loop item, whose value is on the next line
+        self.text_field = None  # The lines of a semicolon-delimited text field
+
+    def is_wanted(self, key):
+        return key.split(".")[0] in self.wanted
+
+    def read(self, lines):
+        for line in lines:
+            if self.text_field is not None:
+                if line.startswith(";"):
+                    self.add_values(["\n".join(self.text_field)])
+                    self.text_field = None
+                else:
+                    self.text_field.append(line.rstrip())
+                continue
+            if line.startswith(";"):
+                self.end_loop_header()
+                self.text_field = [line[1:].rstrip()]
+                continue
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if stripped.startswith("_"):
+                if self.loop_keys is not None and self.in_loop_header:
+                    self.loop_keys.append(stripped.split()[0])
+                    continue
+                self.finish_loop()
+                key_value = stripped.split(None, 1)
+                if self.is_wanted(key_value[0]):
+                    self.pending_key = key_value[0]
+                    if len(key_value) > 1:
+                        self.add_values(_tokenize_cif_line(key_value[1]))
+            elif stripped.startswith("loop_"):
+                self.finish_loop()
+                self.loop_keys = []
+                self.in_loop_header = True
+            elif stripped.startswith("data_") or stripped.startswith("save_"):
+                self.finish_loop()
+            elif self.loop_keys is not None:
+                self.end_loop_header()
+                if self.loop_values is not None:
+                    self.loop_values.extend(_tokenize_cif_line(stripped))
+            elif self.pending_key is not None:
+                self.add_values(_tokenize_cif_line(stripped))
+        self.finish_loop()
+        return self.cif_dict
+
+    def end_loop_header(self):
+        if self.loop_keys is not None and self.in_loop_header:
+            self.in_loop_header = False
+            if self.is_wanted(self.loop_keys[0]):
+                self.loop_values = []
+
+    def add_values(self, values):
+        if self.loop_values is not None:
+            self.loop_values.extend(values)
+        elif self.pending_key is not None and values:
+            self.cif_dict[self.pending_key] = [values[0]]
+            self.pending_key = None
+
+    def finish_loop(self):
+        if self.loop_values is not None:
+            n = len(self.loop_keys)
+            if len(self.loop_values) % n:
+                raise ValueError("Inconsistent number of values in loop "
+                                 "{}".format(self.loop_keys[0].split(".")[0]))
+            for i, key in enumerate(self.loop_keys):
+                self.cif_dict[key] = self.loop_values[i::n]
+        self.loop_keys = self.loop_values = self.pending_key = None
+        self.in_loop_header = False
+
+
+def read_cif_categories(filename, categories=CIF_CATEGORIES):
+    """
+    Read some categories of a mmCIF file.
+
+    The file is streamed line by line and only the data items of the
+    requested categories are tokenized and stored. Lines of all other
+    categories are skipped without tokenizing them.
+
+    :param filename: The mmCIF filename
+    :param categories: A list of category names, e.g. ["_atom_site"]
+    :returns: A dictionary like the one returned by
+              Bio.PDB.MMCIF2Dict.MMCIF2Dict, mapping item names
+              (e.g. "_atom_site.Cartn_x") to lists of strings.
+    """
+    with open(filename) as f:
+        return _CifCategoryReader(categories).read(f)
+
+
+def read_cif(filename, all_models=False, categories=CIF_CATEGORIES):
+    """
+    Read the atoms of a mmCIF file.
+
+    :param categories: The categories, which are read into the cif_dict.
+                       "_atom_site" is always read.
+    :returns: A tuple (atoms, cif_dict)
+    """
+    categories = set(categories) | set(["_atom_site"])
+    cif_dict = read_cif_categories(filename, categories)
+    return atoms_from_cif_dict(cif_dict, all_models), cif_dict
+
+
+# The same fixed-width format as Biopython's PDBIO
+_PDB_ATOM_FORMAT = "%s%5i %-4s%s%3s %s%4i%s   %8.3f%8.3f%8.3f%s%6.2f      %4s%2s  \n"
+_PDB_TER_FORMAT = "TER   %5i      %3s %s%4i%s" + " " * 54 + "\n"
+# The columns of the _atom_site loop written by to_cif_string,
+# in the order used by Biopython's MMCIFIO
+_CIF_ATOM_SITE_COLUMNS = ["group_PDB", "id", "type_symbol", "label_atom_id",
+                          "label_alt_id", "label_comp_id", "label_asym_id",
+                          "label_entity_id", "label_seq_id", "pdbx_PDB_ins_code",
+                          "Cartn_x", "Cartn_y", "Cartn_z", "occupancy",
+                          "B_iso_or_equiv", "auth_seq_id", "auth_asym_id",
+                          "pdbx_PDB_model_num"]
+
+
+def _model_blocks(atoms):
+    """
+    Split the atoms into models and the models into chains.
+
+    :returns: A list of tuples (model, [(start, end), ...]), where start
+              and end are the atom indices of the chains in the model.
+    """
+    if len(atoms) == 0:
+        return []
+    changed = np.flatnonzero((atoms.models[1:] != atoms.models[:-1]) |
+                             (atoms.chains[1:] != atoms.chains[:-1])) + 1
+    bounds = [0] + list(changed) + [len(atoms)]
+    blocks = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        model = atoms.models[start]
+        if not blocks or blocks[-1][0] != model:
+            blocks.append((model, []))
+        blocks[-1][1].append((start, end))
+    return blocks
+
+
+def _model_serials(atoms, blocks):
+    """
+    Atom serial numbers, starting from 1 in every model.
+    """
+    serials = np.arange(1, len(atoms) + 1)
+    for model, chains in blocks:
+        first = chains[0][0]
+        serials[first:chains[-1][1]] -= first
+    return serials
+
+
+def _pdb_atom_name(name, element):
+    """
+    Like PDBIO, pad short atom names, unless the element has 2 letters
+    or the name starts with a digit.
+    """
+    if len(name) < 4 and name[:1].isalpha() and len(element) < 2:
+        return " " + name
+    return name
+
+
+def to_pdb_string(atoms):
+    """
+    Format atoms as the ATOM/HETATM records of a PDB file.
+
+    The output is the same as the one of Biopython's PDBIO (with atoms
+    renumbered from 1 in every model, TER records after every chain and
+    MODEL records, if there is more than one model), but all lines are
+    formatted in bulk, without creating Biopython objects.
+
+    :param atoms: An AtomArray. Atoms of one chain and model
+                  have to be consecutive.
+    :returns: A string
+    """
+    blocks = _model_blocks(atoms)
+    serials = _model_serials(atoms, blocks)
+    elements = atoms.elements.tolist()
+    columns = [np.where(atoms.hetflags == " ", "ATOM  ", "HETATM").tolist(),
+               serials.tolist(),
+               [_pdb_atom_name(name, element) for name, element
+                in zip(atoms.atom_names.tolist(), elements)],
+               atoms.altlocs.tolist(), atoms.resnames.tolist(),
+               atoms.chains.tolist(), atoms.resids.tolist(),
+               atoms.icodes.tolist(), atoms.coords[:, 0].tolist(),
+               atoms.coords[:, 1].tolist(), atoms.coords[:, 2].tolist(),
+               ["      " if o != o else "%6.2f" % o  # Missing (nan) occupancies
+                for o in atoms.occupancies.tolist()],
+               atoms.bfactors.tolist(), atoms.segids.tolist(),
+               [element.rjust(2) for element in elements]]
+    rows = [_PDB_ATOM_FORMAT % row for row in zip(*columns)]
+    multiple_models = len(blocks) > 1
+    lines = []
+    for model, chains in blocks:
+        if multiple_models:
+            lines.append("MODEL      %s\n" % (model + 1))
+        for start, end in chains:
+            lines.extend(rows[start:end])
+            last = end - 1
+            lines.append(_PDB_TER_FORMAT % (serials[last] + 1,
+                                            atoms.resnames[last],
+                                            atoms.chains[last],
+                                            atoms.resids[last],
+                                            atoms.icodes[last]))
+        if multiple_models:
+            lines.append("ENDMDL\n")
+    lines.append("END   \n")
+    return "".join(lines)
+
+
+def _cif_quote(value):
+    """
+    Quote a mmCIF value, if necessary, like Biopython's MMCIFIO.
+    """
+    if (" " in value or "'" in value or '"' in value or
+            value[:1] in ["_", "#", "$", "[", "]", ";"] or
+            value.startswith("data_") or value.startswith("save_") or
+            value in ["loop_", "stop_", "global_"]):
+        if "' " in value:
+            return '"' + value + '"'
+        return "'" + value + "'"
+    return value
+
+
+def _cif_quote_array(values):
+    """
+    Apply _cif_quote to an array of strings, once per distinct value.
+    """
+    unique, inverse = np.unique(values, return_inverse=True)
+    quoted = np.array([_cif_quote(value) for value in unique.tolist()] or [""])
+    return quoted[inverse]
+
+
+def _label_asym_id(entity_id):
+    out = ""
+    while entity_id > 0:
+        mod = (entity_id - 1) % 26
+        out += chr(65 + mod)
+        entity_id = (entity_id - mod) // 26
+    return out
+
+
+def to_cif_string(atoms, data_name="forgi"):
+    """
+    Format atoms as a mmCIF file with a single _atom_site loop.
+
+    The columns and values are the same as written by Biopython's
+    MMCIFIO (including the label_asym_id and label_seq_id it assigns),
+    but formatted in bulk.
+
+    :param atoms: An AtomArray. Atoms of one chain and model
+                  have to be consecutive.
+    :param data_name: The name of the data block.
+    :returns: A string
+    """
+    starts = atoms.residue_starts()
+    # label_seq_id and label_asym_id are assigned per residue
+    seq_ids = []
+    asym_ids = []
+    prev = (None, None)
+    for start in starts:
+        model, chain = atoms.models[start], atoms.chains[start]
+        if (model, chain) != prev:
+            if model != prev[0]:
+                entity_id = 0
+            residue_number = 1
+            prev_type = prev_resname = None
+        res_type = "ATOM" if atoms.hetflags[start] == " " else "HETATM"
+        resname = atoms.resnames[start]
+        if res_type == "ATOM":
+            seq_ids.append(str(residue_number))
+            residue_number += 1
+        else:
+            seq_ids.append(".")
+        if res_type != prev_type or (res_type == "HETATM" and resname != prev_resname):
+            entity_id += 1
+        prev_type, prev_resname = res_type, resname
+        prev = (model, chain)
+        asym_ids.append(_label_asym_id(entity_id))
+    counts = np.diff(np.append(starts, len(atoms)))
+    serials = _model_serials(atoms, _model_blocks(atoms))
+    values = {
+        "group_PDB": np.where(atoms.hetflags == " ", "ATOM", "HETATM"),
+        "id": serials,
+        "type_symbol": np.where(atoms.elements == "", "?", atoms.elements),
+        "label_atom_id": _cif_quote_array(atoms.atom_names),
+        "label_alt_id": np.where(atoms.altlocs == " ", ".", atoms.altlocs),
+        "label_comp_id": _cif_quote_array(atoms.resnames),
+        "label_asym_id": np.repeat(np.array(asym_ids, dtype=str), counts),
+        "label_entity_id": ["?"] * len(atoms),
+        "label_seq_id": np.repeat(np.array(seq_ids, dtype=str), counts),
+        "pdbx_PDB_ins_code": np.where(atoms.icodes == " ", "?", atoms.icodes),
+        "Cartn_x": ["%.3f" % x for x in atoms.coords[:, 0].tolist()],
+        "Cartn_y": ["%.3f" % y for y in atoms.coords[:, 1].tolist()],
+        "Cartn_z": ["%.3f" % z for z in atoms.coords[:, 2].tolist()],
+        "occupancy": atoms.occupancies,
+        "B_iso_or_equiv": atoms.bfactors,
+        "auth_seq_id": atoms.resids,
+        "auth_asym_id": _cif_quote_array(np.where(atoms.chains == " ", ".", atoms.chains)),
+        "pdbx_PDB_model_num": atoms.models + 1
+    }
+    columns = []
+    for column in _CIF_ATOM_SITE_COLUMNS:
+        col = values[column]
+        if isinstance(col, np.ndarray):
+            if col.dtype.kind == "U":
+                col = col.tolist()
+            else:
+                col = [str(value) for value in col.tolist()]
+        columns.append(col)
+    lines = ["data_" + re.sub(r"[#$'\"\[\] \t\n]", "", data_name) + "\n#\n",
+             "loop_\n"]
+    lines.extend("_atom_site." + column + "\n" for column in _CIF_ATOM_SITE_COLUMNS)
+    if len(atoms):
+        row_format = "".join("{:<%d}" % (max(map(len, col)) + 1)
+                             for col in columns) + "\n"
+        lines.extend(row_format.format(*row) for row in zip(*columns))
+    lines.append("#\n")
+    return "".join(lines)
+
+
+def write_atoms(atoms, filename, file_type="pdb", data_name="forgi"):
+    """
+    Write atoms to a PDB or mmCIF file.
+
+    :param atoms: An AtomArray
+    :param filename: A filename or an open file handle
+    :param file_type: "pdb" or "cif"
+    :param data_name: The name of the data block (mmCIF only)
+    """
+    if file_type == "pdb":
+        if any(len(chain) != 1 for chain in atoms.chain_ids()):
+            raise ValueError("Cannot save chains with names {} (not a single "
+                             "character) in PDB format. Use cif format "
+                             "instead!".format(atoms.chain_ids()))
+        text = to_pdb_string(atoms)
+    elif file_type == "cif":
+        text = to_cif_string(atoms, data_name)
+    else:
+        raise ValueError("Unknown file_type {}".format(file_type))
+    if hasattr(filename, "write"):
+        filename.write(text)
+    else:
+        with open(filename, "w") as f:
+            f.write(text)
+
+
+def clean_atoms(atoms):
+    """
+    Remove water and rename residues of Rosetta and iFoldRNA structures.
+
+    This does the same as forgi.threedee.utilities.pdb.get_all_chains
+    does to the Biopython structure.
+
+    :returns: A new AtomArray
+    """
+    atoms = atoms.select(atoms.resnames != "HOH")
+    resnames = atoms.resnames.copy()
+    for old, new in RENAMED_RESIDUES.items():
+        resnames[resnames == old] = new
+    # The residue ids (hetflags) keep the original name.
+    atoms.resnames = resnames
+    return atoms
+
+
+def is_rna_residue(atoms, rna_residues):
+    """
+    For every atom, whether its residue name is in rna_residues.
+    """
+    return np.in1d(atoms.resnames, rna_residues)
+
+
+def rna_chain_ids(atoms, rna_residues):
+    """
+    The chain ids of all chains containing at least one RNA residue,
+    in the order of the file.
+    """
+    rna_chains = set(np.unique(atoms.chains[is_rna_residue(atoms, rna_residues)]))
+    return [c for c in atoms.chain_ids() if c in rna_chains]
+
+
+def bipartite_contacts(coords1, coords2, cutoff, mask1=None, mask2=None):
+    """
+    Find all pairs of points (i, j), where i is a point from coords1 and
+    j a point from coords2, which are at most cutoff apart.
+
+    In contrast to a KD-tree over all points, pairs within coords1 or
+    within coords2 are never enumerated.
+
+    :param mask1, mask2: Optional boolean arrays. If given, only pairs
+                         where at least one of the two points is selected
+                         by its mask are returned.
+    :returns: Two integer arrays i, j of equal length.
+    """
+    idx1 = np.arange(len(coords1))
+    idx2 = np.arange(len(coords2))
+
+    def query(idx1, idx2):
+        if len(idx1) == 0 or len(idx2) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        tree = scipy.spatial.cKDTree(coords2[idx2])
+        neighbors = tree.query_ball_point(coords1[idx1], cutoff)
+        lengths = np.array([len(n) for n in neighbors], dtype=int)
+        j = np.fromiter(itertools.chain.from_iterable(neighbors), dtype=int,
+                        count=lengths.sum())
+        return np.repeat(idx1, lengths), idx2[j]
+    if mask1 is None or mask2 is None:
+        return query(idx1, idx2)
+    # Points selected in coords1 pair with all points of coords2,
+    # the others only with the selected points in coords2.
+    i1, j1 = query(idx1[mask1], idx2)
+    i2, j2 = query(idx1[~mask1], idx2[mask2])
+    return np.concatenate([i1, i2]), np.concatenate([j1, j2])
+
+
+def interacting_rna_residues(atoms, rna_residues, side_chain_atoms, cutoff=6):
+    """
+    Find RNA residues close to other (non-RNA) residues, like
+    forgi.threedee.utilities.pdb.enumerate_interactions_kdtree does.
+
+    Two residues are considered close, if a C, N or O atom of the one
+    is within cutoff Angstrom of a C, N or O atom of the other and one of the
+    two atoms is a nucleobase atom. The non-RNA residue has to contain C or N.
+
+    Only atoms of the first model and the first alternative location
+    of every atom are considered.
+
+    :param rna_residues: A list of residue names of RNA residues.
+    :param side_chain_atoms: Names of nucleobase atoms.
+    :returns: A set of tuples (chain, (hetflag, resid, icode)), i.e.
+              the chain id and Biopython's residue id.
+    """
+    if len(atoms) == 0:
+        return set()
+    atoms = atoms.select(atoms.models == atoms.models[0])
+    res_index = atoms.residue_index()
+    # Only the first alternative location of every atom.
+    keys = np.array([res_index, np.unique(atoms.atom_names, return_inverse=True)[1]]).T
+    _, first = np.unique(keys, axis=0, return_index=True)
+    first = np.sort(first)
+    first_char = np.array([name[:1] for name in atoms.atom_names])
+    relevant = first[np.in1d(first_char[first], ["C", "N", "O"])]
+    # Per residue
+    starts = atoms.residue_starts()
+    res_is_rna = (is_rna_residue(atoms, rna_residues) &
+                  ~np.char.startswith(atoms.hetflags, "H_"))[starts]
+    res_has_cn = np.zeros(len(starts), dtype=bool)
+    res_has_cn[res_index[np.in1d(first_char, ["C", "N"])]] = True
+
+    rna_atoms = relevant[res_is_rna[res_index[relevant]]]
+    other_atoms = relevant[~res_is_rna[res_index[relevant]] &
+                           res_has_cn[res_index[relevant]]]
+    is_side_chain = np.in1d(atoms.atom_names, list(side_chain_atoms))
+    i, j = bipartite_contacts(atoms.coords[rna_atoms], atoms.coords[other_atoms],
+                              cutoff, is_side_chain[rna_atoms],
+                              is_side_chain[other_atoms])
+    if len(i) == 0:
+        return set()
+    r1 = res_index[rna_atoms[i]]
+    r2 = res_index[other_atoms[j]]
+    # Like in enumerate_interactions_kdtree, residues are compared by
+    # their id within the chain.
+    s1 = starts[r1]
+    s2 = starts[r2]
+    same_id = ((atoms.resids[s1] == atoms.resids[s2]) &
+               (atoms.icodes[s1] == atoms.icodes[s2]) &
+               (atoms.hetflags[s1] == atoms.hetflags[s2]))
+    interacting = np.unique(r1[~same_id])
+    result = set()
+    for s in starts[interacting]:
+        result.add((atoms.chains[s],
+                    (atoms.hetflags[s], int(atoms.resids[s]), atoms.icodes[s])))
+    log.debug("Interacting: {}".format(result))
+    return result
@@ -34,6 +34,7 @@
 import forgi.threedee.utilities.average_stem_vres_atom_positions as ftus
 import forgi.utilities.debug as fud
 import forgi.threedee.utilities.my_math as ftum
+import forgi.threedee.utilities.atom_array as ftuaa
 import forgi.threedee.utilities.pdb as ftup
 import forgi.threedee.utilities.vector as cuv
 import forgi.threedee.utilities.vector as ftuv
@@ -858,6 +859,55 @@ def virtual_res_3d_pos_core(coords, twists, i, stem_len, stem_inv=None):
     return outlist
 
 
+def virtual_res_twist_vectorized(coords, twists, pos, stem_len):
+    '''
+    The vector pointing from the stem axis towards the virtual residue
+    (the second entry of the tuple returned by `virtual_res_3d_pos_core`),
+    calculated for N stems at once.
+
+    :param coords: A Nx2x3 array with the coordinates of the stems.
+    :param twists: A Nx2x3 array with the twists of the stems.
+    :param pos: An array of length N with the nucleotide positions.
+                These can be floating point numbers (between residues).
+    :param stem_len: An array of length N with the stem lengths.
+    :return: A Nx3 array
+    '''
+    coords = np.asarray(coords, dtype=float)
+    twists = np.asarray(twists, dtype=float)
+    pos = np.asarray(pos, dtype=float)
+    stem_len = np.asarray(stem_len, dtype=float)
+    stem_vec = coords[:, 1] - coords[:, 0]
+    u = twists[:, 0]
+
+    # the angle of the second twist with respect to the first,
+    # in the basis stem_vec, twists[0], cross(stem_vec, twists[0])
+    basis_y = u / np.linalg.norm(u, axis=1)[:, np.newaxis]
+    basis_z = np.cross(stem_vec, basis_y)
+    basis_z /= np.linalg.norm(basis_z, axis=1)[:, np.newaxis]
+    ang = np.arctan2(np.sum(basis_z * twists[:, 1], axis=1),
+                     np.sum(basis_y * twists[:, 1], axis=1))
+    ang = np.where(ang < 0, 2 * math.pi + ang, ang)
+
+    # calculated from an ideal length 30 helix
+    average_ang_per_nt = 0.636738030735
+    expected_ang = (stem_len - 1) * average_ang_per_nt
+    expected_dev = np.where(expected_ang > 2 * math.pi,
+                            np.mod(expected_ang, 2 * math.pi), expected_ang)
+    forward = np.where(ang < expected_dev, 2 * math.pi + ang - expected_dev,
+                       ang - expected_dev)
+    backward = np.where(ang < expected_dev, expected_dev - ang,
+                        2 * math.pi + expected_dev - ang)
+    total_ang = np.where(forward < backward, expected_ang + forward,
+                         expected_ang - backward)
+    long_stem = stem_len > 1
+    ang_per_nt = np.zeros(len(stem_len))
+    ang_per_nt[long_stem] = total_ang[long_stem] / (stem_len[long_stem] - 1)
+    ang = ang_per_nt * pos
+
+    v = basis_z
+    return u * np.cos(ang)[:, np.newaxis] + v * np.sin(ang)[:, np.newaxis]
+
+
 def virtual_res_3d_pos(bg, stem, i, stem_inv=None, stem_length=None):
     if stem_length is None:
         return virtual_res_3d_pos_core(bg.coords[stem], bg.twists[stem], i,
@@ -1654,6 +1704,52 @@ def virtual_atoms(cg, given_atom_names=None, sidechain=True):
     return VirtualAtomsLookup(cg, given_atom_names, sidechain)
 
 
+def virtual_atom_array(cg, positions=None, sidechain=True):
+    """
+    The virtual atoms of a coarse grained RNA as an AtomArray.
+
+    This can be written to a PDB or mmCIF file with
+    forgi.threedee.utilities.atom_array.write_atoms, to export
+    coarse grained models (e.g. for visualization) without
+    building Biopython structures.
+
+    :param cg: The coarse grained RNA
+    :param positions: The residue numbers (1-based) to include.
+                      Defaults to all residues.
+    :param sidechain: Whether or not to include the nucleobase atoms.
+    :returns: An ftuaa.AtomArray with the residue ids of cg.seq
+    """
+    if positions is None:
+        positions = range(1, cg.seq_length + 1)
+    lookup = virtual_atoms(cg, sidechain=sidechain)
+    names = []
+    coords = []
+    residues = []
+    for pos in positions:
+        residue_atoms = lookup[pos]
+        names.extend(residue_atoms.keys())
+        coords.extend(residue_atoms.values())
+        residues.extend([(cg.seq.to_resid(pos), cg.seq[pos])] * len(residue_atoms))
+    n = len(names)
+    names = np.array([name.replace("*", "'") for name in names], dtype="U4")
+    return ftuaa.AtomArray(
+        coords=np.array(coords, dtype=float).reshape((-1, 3)),
+        atom_names=names,
+        resnames=np.array([resname for _, resname in residues], dtype="U3"),
+        # RNAs loaded from a bg/cg file without chain information use chain "A"
+        chains=np.array([resid.chain or "A" for resid, _ in residues], dtype="U4"),
+        resids=np.array([resid.resid[1] for resid, _ in residues], dtype=int),
+        icodes=np.array([resid.resid[2] for resid, _ in residues], dtype="U1"),
+        hetflags=np.full(n, " "),
+        altlocs=np.full(n, " "),
+        occupancies=np.ones(n),
+        bfactors=np.zeros(n),
+        elements=names.astype("U1"),
+        segids=np.full(n, " "),
+        serials=np.arange(1, n + 1),
+        models=np.zeros(n, dtype=int))
+
+
 # Module-level var used for caching.
 _average_atom_positions = None
 
@@ -1838,6 +1934,19 @@ def element_distance(cg, l1, l2):
     return ftuv.vec_distance(i1, i2)
 
 
+#: The atoms used for the basepair center, as defined in doi: 10.1261/rna.305307
+BASEPAIR_CENTER_ATOMS = {"A": ["C1'", "C8"], "G": ["C1'", "C8"],
+                         "U": ["C1'", "C6"], "C": ["C1'", "C6"]}
+#: Hydrogen bonds of canonical basepairs, used for the basepair plane.
+BASEPAIR_H_BONDS = {"U": {"A": [("O4", "N6"), ("N3", "N1")],
+                          "G": [("N3", "O6"), ("O2", "N1")]},
+                    "A": {"U": [("N6", "O4"), ("N1", "N3")]},
+                    "G": {"U": [("O6", "N3"), ("N1", "O2")],
+                          "C": [("O6", "N4"), ("N1", "N3"), ("N2", "O2")]},
+                    "C": {"G": [("N4", "O6"), ("N3", "N1"), ("O2", "N2")]}
+                    }
+
+
 def get_basepair_center(cg, pos):
     """
     The center of a basepair, as defined in doi: 10.1261/rna.305307
@@ -1845,10 +1954,9 @@ def get_basepair_center(cg, pos):
     :param pos: The number of one of the two pairing bases
     """
     pos2 = cg.pairing_partner(pos)
-    seq1 = cg.seq[pos - 1]
-    seq2 = cg.seq[pos2 - 1]
-    atoms = {"A": ["C1'", "C8"], "G": ["C1'", "C8"],
-             "U": ["C1'", "C6"], "C": ["C1'", "C6"]}
+    seq1 = cg.seq[pos]
+    seq2 = cg.seq[pos2]
+    atoms = BASEPAIR_CENTER_ATOMS
     va1 = cg.virtual_atoms(pos)
     va2 = cg.virtual_atoms(pos2)
     avpos = np.zeros(3)
@@ -1871,17 +1979,11 @@ def get_basepair_plane(cg, pos):
     :param pos: The number of one of the two pairing bases
     """
     pos2 = cg.pairing_partner(pos)
-    seq1 = cg.seq[pos - 1]
-    seq2 = cg.seq[pos2 - 1]
+    seq1 = cg.seq[pos]
+    seq2 = cg.seq[pos2]
     va1 = cg.virtual_atoms(pos)
     va2 = cg.virtual_atoms(pos2)
-    h_bonds = {"U": {"A": [("O4", "N6"), ("N3", "N1")],
-                     "G": [("N3", "O6"), ("O2", "N1")]},
-               "A": {"U": [("N6", "O4"), ("N1", "N3")]},
-               "G": {"U": [("O6", "N3"), ("N1", "O2")],
-                     "C": [("O6", "N4"), ("N1", "N3"), ("N2", "O2")]},
-               "C": {"G": [("N4", "O6"), ("N3", "N1"), ("O2", "N2")]}
-               }
+    h_bonds = BASEPAIR_H_BONDS
     #print( seq1, seq2 )
     try:
         hb = h_bonds[seq1][seq2]
@@ -1920,3 +2022,115 @@ def get_basepair_plane(cg, pos):
                                                                    " degrees".format(seq1, seq2, plane, add, math.degrees(ftuv.vec_angle(add, plane))))
             plane += add
         return ftuv.normalize(plane)
+
+
+def _stem_virtual_atom_coords(cg, positions, atom_names):
+    """
+    Global coordinates of virtual atoms of stem nucleotides,
+    calculated with a single vectorized change of basis.
+
+    :param positions: A list of nucleotide numbers (all in stems)
+    :param atom_names: A list of the same length, with one atom name
+                       for every entry in positions.
+    :returns: A len(positions)x3 array
+    """
+    vposs = []
+    vbases = []
+    offsets = []
+    for pos, aname in zip(positions, atom_names):
+        stem = cg.get_node_from_residue_num(pos)
+        pos_in_stem, side = cg.stem_resn_to_stem_vres_side(stem, pos)
+        if pos_in_stem not in cg.vbases[stem]:
+            cg.add_all_virtual_residues()
+        vposs.append(cg.vposs[stem][pos_in_stem])
+        vbases.append(cg.vbases[stem][pos_in_stem])
+        offsets.append(ftus.avg_stem_vres_atom_coords[side][cg.seq[pos]][aname])
+    if not positions:
+        return np.zeros((0, 3))
+    return (np.array(vposs)
+            + np.einsum('ij,ijk->ik', np.array(offsets), np.array(vbases)))
+
+
+def get_basepair_centers(cg, positions):
+    """
+    A vectorized version of `get_basepair_center` for many basepairs.
+
+    :param positions: A list of nucleotide numbers. Every nucleotide
+                      has to be part of a stem.
+    :returns: A tuple `centers`, `valid`. `centers` is a Nx3 array,
+              `valid` a boolean array of length N, which is False for
+              basepairs with a nucleotide other than A, C, G and U
+              (the corresponding centers are nan).
+    """
+    valid = np.zeros(len(positions), dtype=bool)
+    centers = np.full((len(positions), 3), np.nan)
+    atom_pos = []
+    atom_names = []
+    for i, pos in enumerate(positions):
+        pos2 = cg.pairing_partner(pos)
+        seq1, seq2 = cg.seq[pos], cg.seq[pos2]
+        if seq1 not in BASEPAIR_CENTER_ATOMS or seq2 not in BASEPAIR_CENTER_ATOMS:
+            continue
+        valid[i] = True
+        for nt, res in [(pos, seq1), (pos2, seq2)]:
+            for aname in BASEPAIR_CENTER_ATOMS[res]:
+                atom_pos.append(nt)
+                atom_names.append(aname)
+    # Every valid basepair has exactly 4 center atoms.
+    coords = _stem_virtual_atom_coords(cg, atom_pos, atom_names)
+    centers[valid] = coords.reshape(-1, 4, 3).mean(axis=1)
+    return centers, valid
+
+
+def get_basepair_planes(cg, positions):
+    """
+    A vectorized version of `get_basepair_plane` for many basepairs.
+
+    :param positions: A list of nucleotide numbers. Every nucleotide
+                      has to be part of a stem.
+    :returns: A Nx3 array with the normal vectors of the basepair planes.
+              For non-canonical basepairs, the stem vector is used
+              (like in `get_basepair_plane`).
+    """
+    planes = np.zeros((len(positions), 3))
+    canonical = []
+    # For every canonical basepair: 3 h-bonds (left and right atom),
+    # padded with a mask for basepairs with only 2 h-bonds.
+    atom_pos = []
+    atom_names = []
+    hb_mask = []
+    for i, pos in enumerate(positions):
+        pos2 = cg.pairing_partner(pos)
+        seq1, seq2 = cg.seq[pos], cg.seq[pos2]
+        try:
+            hb = BASEPAIR_H_BONDS[seq1][seq2]
+        except KeyError:
+            warnings.warn("Estimating plane from stem vector for "
+                          " non-canonical basepair {}-{} at positions"
+                          " {},{}".format(seq1, seq2, pos, pos2))
+            stem, = cg.nucleotides_to_elements([pos, pos2])
+            planes[i] = cg.coords[stem][0] - cg.coords[stem][1]
+            continue
+        canonical.append(i)
+        for j in range(3):
+            left, right = hb[min(j, len(hb) - 1)]
+            atom_pos.extend([pos, pos2])
+            atom_names.extend([left, right])
+            hb_mask.append(j < len(hb))
+    if not canonical:
+        return planes
+    coords = _stem_virtual_atom_coords(cg, atom_pos, atom_names).reshape(-1, 3, 2, 3)
+    hb_mask = np.array(hb_mask, dtype=float).reshape(-1, 3)
+    plane = np.zeros((len(canonical), 3))
+    for l1, l2 in it.combinations(range(3), 2):
+        left_1 = coords[:, l1, 0]
+        left_2 = coords[:, l2, 0]
+        right_1 = coords[:, l1, 1]
+        right_2 = coords[:, l2, 1]
+        add = (np.cross(right_1 - left_1, right_2 - left_1)
+               + np.cross(right_1 - left_1, left_2 - right_1)
+               + np.cross(right_2 - left_2, right_2 - left_1)
+               + np.cross(right_2 - left_2, left_2 - right_1))
+        plane += add * (hb_mask[:, l1] * hb_mask[:, l2])[:, np.newaxis]
+    planes[canonical] = plane / np.linalg.norm(plane, axis=1)[:, np.newaxis]
+    return planes
@@ -9,11 +9,17 @@
 import string
 import math
 import numpy as np
+import scipy.spatial
 import Bio.PDB as bpdb
 from collections import defaultdict
+try:
+    from collections.abc import Set
+except ImportError:  # Python 2
+    from collections import Set
 
 import forgi.utilities.debug as fud
 import forgi.threedee.utilities.vector as ftuv
+import forgi.threedee.utilities.atom_array as ftuaa
 from forgi.threedee.utilities.modified_res import to_4_letter_alphabeth
 import forgi.graph.residue as fgr
 
@@ -296,6 +302,63 @@ def residuelist_rmsd(c1_list, c2_list, sidechains=False, superimpose=True):
         return (len(all_atoms1), ftuv._vector_set_rmsd(crds1, crds2), None, dev_per_res)
 
 
+class AtomCorrespondence(object):
+    """
+    The atoms present in both of two lists of corresponding residues.
+
+    Matching residues and atoms by name is slow, so it is done only once.
+    The correspondence can then be used to extract the coordinates of all
+    structures with the same residues (e.g. many decoys of the same RNA)
+    as arrays, which can be compared with
+    forgi.threedee.model.similarity.rmsd_batch and rmsd_matrix.
+
+    Usage::
+
+        corr = AtomCorrespondence(ref_residues, decoy_residues[0])
+        decoy_coords = np.array([corr.coords(r) for r in decoy_residues])
+        rmsds = ftms.rmsd_batch(corr.coords1, decoy_coords)
+    """
+
+    def __init__(self, c1_list, c2_list, sidechains=False):
+        """
+        :param c1_list, c2_list: Lists of Biopython residues of equal length.
+                                 The residue c1_list[i] corresponds to c2_list[i].
+        :param sidechains: Whether or not to include the nucleobase atoms.
+        """
+        if len(c1_list) != len(c2_list):
+            log.error("c1_list (len {}): {}".format(len(c1_list), c1_list))
+            log.error("c2_list (len {}): {}".format(len(c2_list), c2_list))
+            raise Exception(
+                "Chains of different length. (Maybe an RNA-DNA hybrid?)")
+        #: A list of tuples (residue index, atom name)
+        self.atoms = []
+        for i, (r1, r2) in enumerate(zip(c1_list, c2_list)):
+            if sidechains:
+                anames = nonsidechain_atoms + \
+                    side_chain_atoms[r1.resname.strip()]
+            else:
+                anames = nonsidechain_atoms
+            for a in anames:
+                if a in r1 and a in r2:
+                    self.atoms.append((i, a))
+        #: The coordinates of the corresponding atoms, arrays of shape (len(self), 3)
+        self.coords1 = self.coords(c1_list)
+        self.coords2 = self.coords(c2_list)
+
+    def __len__(self):
+        return len(self.atoms)
+
+    def coords(self, residues):
+        """
+        The coordinates of the corresponding atoms in a list of residues,
+        which corresponds to c2_list (or c1_list) position by position.
+
+        :raises: KeyError, if an atom is missing.
+        """
+        return np.array([residues[i][a].coord for i, a in self.atoms],
+                        dtype=float).reshape((-1, 3))
+
+
 def get_first_chain(filename):
     '''
     Load a PDB file using the Bio.PDB module and return the first chain.
@@ -358,6 +421,10 @@ def renumber_chain(chain, resids=None):
     return chain
 
 
+def _without_hydrogens(atoms):
+    return atoms.select(np.char.find(atoms.atom_names, 'H') < 0)
+
+
 def output_chain(chain, filename, fr=None, to=None):
     '''
     Dump a chain to an output file. Remove the hydrogen atoms.
@@ -365,56 +432,35 @@ def output_chain(chain, filename, fr=None, to=None):
     :param chain: The Bio.PDB.Chain to dump.
     :param filename: The place to dump it.
     '''
-    class HSelect(bpdb.Select):
-        def accept_atom(self, atom):
-            if atom.name.find('H') >= 0:
-                return False
-            else:
-                return True
-    m = bpdb.Model.Model(' ')
-    s = bpdb.Structure.Structure(' ')
-
-    m.add(chain)
-    s.add(m)
-
-    io = bpdb.PDBIO()
-    io.set_structure(s)
-    io.save(filename, HSelect())
+    atoms = _without_hydrogens(ftuaa.AtomArray.from_chains([chain]))
+    ftuaa.write_atoms(atoms, filename, "pdb")
 
 
 def output_multiple_chains(chains, filename, file_type="pdb"):
     '''
     Dump multiple chains to an output file. Remove the hydrogen atoms.
 
+    The file is formatted directly from the atom coordinates
+    (see forgi.threedee.utilities.atom_array.write_atoms), which
+    is much faster than Biopython's PDBIO and MMCIFIO.
+
     :param chains: An iterable of Bio.PDB.Chain to dump.
-    :param filename: The place to dump it.
+    :param filename: The place to dump it (a filename or an open file).
+    :param file_type: "pdb" or "cif"
     '''
-    class HSelect(bpdb.Select):
-        def accept_atom(self, atom):
-            if atom.name.find('H') >= 0:
-                return False
-            else:
-                return True
-    m = bpdb.Model.Model(0)
-    s = bpdb.Structure.Structure('stru')
+    chains = list(chains)
     for chain in chains:
         log.debug("Adding chain {} with {} residues".format(chain.id, len(chain)))
-        m.add(chain)
         if file_type=="pdb" and len(chain.id)!=1:
             raise ValueError("Cannot save chain with name %s (not a single character) "
-                             "in PDB format. Use cif format instead!")
-    s.add(m)
-    if file_type == "pdb":
-        io = bpdb.PDBIO()
-    else:
-        io = bpdb.MMCIFIO()
-    io.set_structure(s)
+                             "in PDB format. Use cif format instead!" % chain.id)
+    atoms = _without_hydrogens(ftuaa.AtomArray.from_chains(chains))
     try:
-        io.save(filename, HSelect())
+        ftuaa.write_atoms(atoms, filename, file_type, data_name="stru")
     except Exception as e:
         with log_to_exception(log, e):
             log.error("Could not output PDB with chains and residues:")
-            for chain in s[0]:
+            for chain in chains:
                 log.error("{}: {}".format(chain.id, [r.id for r in chain]))
         raise
 
@@ -432,16 +478,18 @@ def get_particular_chain(in_filename, chain_id, parser=None):
     return chain, mr, ir
 
 
-def get_biggest_chain(in_filename, parser=None):
+def get_biggest_chain(in_filename, parser=None, interactions=True):
     '''
     Load the PDB file located at filename, select the longest
     chain and return it.
 
     :param in_filename: The location of the original file.
+    :param interactions: See get_all_chains
     :return: A Bio.PDB chain structure corresponding to the longest
              chain in the structure stored in in_filename
     '''
-    chains, mr, ir = get_all_chains(in_filename, parser)
+    chains, mr, ir = get_all_chains(in_filename, parser,
+                                    interactions=interactions)
     biggest = 0
     biggest_len = 0
 
@@ -624,34 +672,86 @@ def _get_assemblies(chains, cifdict):
     chains = list(new_chains.values())
     return chains
 
-def get_all_chains(in_filename, parser=None, no_annotation=False, assembly_nr=None):
+def _guess_filetype(in_filename):
+    """
+    :returns: "pdb" or "cif"
+    """
+    if in_filename.endswith(".pdb"):
+        return "pdb"
+    elif in_filename.endswith(".cif"):
+        return "cif"
+    # Cannot determine filetype by extention. Try to read first line.
+    with open(in_filename) as pdbfile:
+        line = pdbfile.readline(20)
+        # According to
+        # page 10 of ftp://ftp.wwpdb.org/pub/pdb/doc/format_descriptions/Format_v33_A4.pdf
+        # a HEADER entry is mandatory. Biopython sometime starts directly with ATOM
+        if line.startswith("HEADER") or line.startswith("ATOM"):
+            return "pdb"
+        else:
+            return "cif"
+
+
+def _missing_residues_from_cif_dict(cifdict, no_annotation=False):
+    """
+    :returns: A list of dictionaries describing the missing residues, like
+              the ones returned by _parse_remark_465
+    """
+    mr = []
+    try:
+        mask = np.array(
+            cifdict["_pdbx_poly_seq_scheme.pdb_mon_id"], dtype=str) == "?"
+        int_seq_ids = np.array(
+            cifdict["_pdbx_poly_seq_scheme.pdb_seq_num"], dtype=int)[mask]
+        cs = np.array(
+            cifdict["_pdbx_poly_seq_scheme.pdb_strand_id"], dtype=str)[mask]
+        insertions = np.array(
+            cifdict["_pdbx_poly_seq_scheme.pdb_ins_code"], dtype=str)[mask]
+        insertions[insertions == "."] = " "
+        symbol = np.array(
+            cifdict["_pdbx_poly_seq_scheme.mon_id"], dtype=str)[mask]
+    except KeyError:
+        pass
+    else:
+        if not no_annotation:
+            for i, sseq in enumerate(int_seq_ids):
+                mr.append({
+                    "model": None,
+                    "res_name": symbol[i],
+                    "chain": cs[i],
+                    "ssseq": sseq,
+                    "insertion": insertions[i]
+                })
+    return mr
+
+
+def get_all_chains(in_filename, parser=None, no_annotation=False, assembly_nr=None,
+                   interactions=True):
     '''
     Load the PDB file located at filename, read all chains and return them.
 
+    If no parser is given, the file is read with the numpy based reader
+    from forgi.threedee.utilities.atom_array and only the RNA chains are
+    converted to Biopython objects.
+
     :param in_filename: The location of the original file.
+    :param parser: None or a Biopython parser. If a parser is given,
+                   the whole structure is loaded with this parser.
     :param assembly_nr: Which assembly to return. Default: The first.
+    :param interactions: If False, do not search for RNA residues interacting
+                   with other residues (e.g. proteins) and return an empty
+                   set of interacting residues.
     :return: a tuple chains, missing_residues
 
              * chains: A list of Bio.PDB chain structures corresponding to all
                        RNA structures stored in in_filename
              * missing_residues: A list of dictionaries, describing the missing residues.
-             * interacting residues: A list of residues
+             * interacting residues: A set of residues. If no parser is given,
+                       it is only calculated when it is first used.
     '''
     if parser is None:
-        if in_filename.endswith(".pdb"):
-            parser = bpdb.PDBParser()
-        elif in_filename.endswith(".cif"):
-            parser = bpdb.MMCIFParser()
-        else:  # Cannot determine filetype by extention. Try to read first line.
-            with open(in_filename) as pdbfile:
-                line = pdbfile.readline(20)
-                # According to
-                # page 10 of ftp://ftp.wwpdb.org/pub/pdb/doc/format_descriptions/Format_v33_A4.pdf
-                # a HEADER entry is mandatory. Biopython sometime starts directly with ATOM
-                if line.startswith("HEADER") or line.startswith("ATOM"):
-                    parser = bpdb.PDBParser()
-                else:
-                    parser = bpdb.MMCIFParser()
+        return _get_all_chains_from_atoms(in_filename, no_annotation, assembly_nr,
+                                          interactions)
 
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
@@ -690,7 +790,7 @@ def get_all_chains(in_filename, parser=None, no_annotation=False, assembly_nr=No
             elif r.resname == 'URI':
                 r.resname = '  U'
     # Now search for protein interactions.
-    if not no_annotation:
+    if interactions and not no_annotation:
         interacting_residues = enumerate_interactions_kdtree(s[0])
     else:
         interacting_residues = set()
@@ -713,31 +813,7 @@ def get_all_chains(in_filename, parser=None, no_annotation=False, assembly_nr=No
         else:
             if False: # Still experimental and not working correctly.
                 chains = _get_assemblies(chains, cifdict)
-        mr = []
-        try:
-            mask = np.array(
-                cifdict["_pdbx_poly_seq_scheme.pdb_mon_id"], dtype=str) == "?"
-            int_seq_ids = np.array(
-                cifdict["_pdbx_poly_seq_scheme.pdb_seq_num"], dtype=int)[mask]
-            cs = np.array(
-                cifdict["_pdbx_poly_seq_scheme.pdb_strand_id"], dtype=str)[mask]
-            insertions = np.array(
-                cifdict["_pdbx_poly_seq_scheme.pdb_ins_code"], dtype=str)[mask]
-            insertions[insertions == "."] = " "
-            symbol = np.array(
-                cifdict["_pdbx_poly_seq_scheme.mon_id"], dtype=str)[mask]
-        except KeyError:
-            pass
-        else:
-            if not no_annotation:
-                for i, sseq in enumerate(int_seq_ids):
-                    mr.append({
-                        "model": None,
-                        "res_name": symbol[i],
-                        "chain": cs[i],
-                        "ssseq": sseq,
-                        "insertion": insertions[i]
-                    })
+        mr = _missing_residues_from_cif_dict(cifdict, no_annotation)
     except KeyError:
         mr = []
         with open(in_filename) as f:
@@ -777,6 +853,69 @@ def get_all_chains(in_filename, parser=None, no_annotation=False, assembly_nr=No
     return chains, mr, interacting_residues
 
 
+def _get_all_chains_from_atoms(in_filename, no_annotation=False, assembly_nr=None,
+                               interactions=True):
+    """
+    Like get_all_chains, but using the numpy based reader.
+
+    Water is removed and non-RNA chains are discarded on the atom arrays,
+    so Biopython objects are only created for the RNA chains.
+    """
+    # All models are read, so we can warn about ignored models,
+    # like the Biopython based get_all_chains.
+    if _guess_filetype(in_filename) == "pdb":
+        atoms, remark_465 = ftuaa.read_pdb(in_filename, all_models=True)
+        cifdict = None
+        if assembly_nr is not None:
+            warnings.warn("Getting an assembly is not supported for the old PDB format.")
+    else:
+        atoms, cifdict = ftuaa.read_cif(in_filename, all_models=True)
+    if len(atoms) and np.any(atoms.models != atoms.models[0]):
+        warnings.warn("Multiple models in file. Using only the first model")
+        atoms = atoms.select(atoms.models == atoms.models[0])
+    atoms = ftuaa.clean_atoms(atoms)
+
+    # The chains containing RNA
+    chain_ids = ftuaa.rna_chain_ids(atoms, RNA_RESIDUES)
+    chains = atoms.to_chains(chain_ids)
+
+    # Protein interactions are only searched, when they are used.
+    if interactions and not no_annotation:
+        # The chains may be modified (e.g. by clean_chain) before the
+        # interactions are calculated, so we store the residues by their
+        # current ids.
+        residues = {(chain.id, res.id): res for chain in chains for res in chain}
+        interacting_residues = _LazyResidueSet(_interacting_residues_from_atoms,
+                                               atoms, residues)
+    else:
+        interacting_residues = set()
+
+    if cifdict is None:
+        mr = [mr_info for mr_info in map(_parse_remark_465, remark_465)
+              if mr_info is not None]
+    else:
+        mr = _missing_residues_from_cif_dict(cifdict, no_annotation)
+    if mr:
+        log.info("This PDB has missing residues")
+    elif not no_annotation:
+        log.info("This PDB has no missing residues")
+    log.debug("LOADING DONE: chains {}, mr {}, ir: {}".format(
+             chains, mr, interacting_residues))
+    return chains, mr, interacting_residues
+
+
+def _interacting_residues_from_atoms(atoms, residues):
+    """
+    The Biopython residues, which interact with other residues
+    according to ftuaa.interacting_rna_residues.
+
+    :param residues: A dictionary {(chain_id, residue_id): residue}
+    """
+    return set(residues[key]
+               for key in ftuaa.interacting_rna_residues(atoms, RNA_RESIDUES,
+                                                         all_side_chains)
+               if key in residues)
+
 
 def _parse_remark_465(line):
     """Parse missing residue remarks.
@@ -796,7 +935,7 @@ def _parse_remark_465(line):
                  [A-Z]?[A-Z]?[A-Z])           # Or only residue name with
                                               # 1 (RNA) to 3 letters
                 \s ([A-Za-z0-9])              # A single character chain
-                \s+(\d+[A-Za-z]?)$            # Residue number: A digit followed
+                \s+(-?\d+[A-Za-z]?)$          # Residue number: A digit followed
                                               # by an optional insertion code
                                               # (Hetero-flags make no sense in
                                               # context with missing res)
@@ -821,46 +960,100 @@ def _parse_remark_465(line):
         return residue
     return None
 
+class _LazyResidueSet(Set):
+    """
+    A set of residues, which is only calculated when it is used for the
+    first time.
+
+    get_all_chains returns the interacting residues as a _LazyResidueSet,
+    because many callers never use them.
+    """
+
+    def __init__(self, function, *args):
+        self._function = function
+        self._args = args
+        self._residues = None
+
+    @property
+    def residues(self):
+        if self._residues is None:
+            self._residues = set(self._function(*self._args))
+            # Release the structure
+            self._function = self._args = None
+        return self._residues
+
+    @classmethod
+    def _from_iterable(cls, it):
+        return set(it)
+
+    def __contains__(self, residue):
+        return residue in self.residues
+
+    def __iter__(self):
+        return iter(self.residues)
+
+    def __len__(self):
+        return len(self.residues)
+
+    def __repr__(self):
+        if self._residues is None:
+            return "<_LazyResidueSet (not yet calculated)>"
+        return repr(self._residues)
+
+
 def enumerate_interactions_kdtree(model):
-    relevant_atoms = [a for a in model.get_atoms() if a.name[0] in [
-        "C", "N", "O"]]
-    if not relevant_atoms:
-        return set()
-    kdtree = bpdb.NeighborSearch(relevant_atoms)
-    pairs = kdtree.search_all(6, "A")
-    res_pair_list = set()
-    for a1, a2 in pairs:
-        if a1.name not in all_side_chains and a2.name not in all_side_chains:
-            continue
-        p1 = a1.get_parent()
-        p2 = a2.get_parent()
-        if p1.id == p2.id:
+    """
+    Find the RNA residues which interact with other residues (e.g. proteins).
+
+    Two residues interact, if a C, N or O atom of the one is within 6
+    Angstrom of a C, N or O atom of the other and one of the two atoms
+    is a nucleobase atom. The non-RNA residue has to contain C or N.
+
+    Only pairs of an RNA and a non-RNA atom are enumerated,
+    using a KD-tree over the non-RNA atoms.
+
+    :param model: A Biopython model
+    :returns: A set of Biopython residues
+    """
+    rna_residues = []
+    other_residues = []
+    rna_atoms = []
+    other_atoms = []
+    for res in model.get_residues():
+        relevant_atoms = [a for a in res if a.name[0] in ["C", "N", "O"]]
+        if not relevant_atoms:
             continue
-        elif p1 < p2:
-            res_pair_list.add((p1, p2))
-        else:
-            res_pair_list.add((p2, p1))
+        if res.resname.strip() in RNA_RESIDUES and not res.id[0].startswith("H_"):
+            rna_atoms.extend((len(rna_residues), a) for a in relevant_atoms)
+            rna_residues.append(res)
+        # Only consider C and N. So no ions etc
+        elif any(a.name[0] in ["C", "N"] for a in res.get_atoms()):
+            other_atoms.extend((len(other_residues), a) for a in relevant_atoms)
+            other_residues.append(res)
+    if not rna_atoms or not other_atoms:
+        return set()
+
+    def to_arrays(atoms):
+        res_index = np.array([i for i, _ in atoms], dtype=int)
+        coords = np.array([a.coord for _, a in atoms], dtype=float)
+        is_side_chain = np.array([a.name in all_side_chains for _, a in atoms],
+                                 dtype=bool)
+        return res_index, coords, is_side_chain
+    rna_res_index, rna_coords, rna_side_chain = to_arrays(rna_atoms)
+    other_res_index, other_coords, other_side_chain = to_arrays(other_atoms)
+    i, j = ftuaa.bipartite_contacts(rna_coords, other_coords, 6,
+                                    rna_side_chain, other_side_chain)
+    res_pairs = np.unique(np.array([rna_res_index[i], other_res_index[j]]).T,
+                          axis=0)
     interacting_residues = set()
-    for res1, res2 in res_pair_list:
-        rna_res = None
-        other_res = None
-        if res1.resname.strip() in RNA_RESIDUES and not res1.id[0].startswith("H_"):
-            rna_res = res1
-        else:
-            other_res = res1
-        if res2.resname.strip() in RNA_RESIDUES and not res2.id[0].startswith("H_"):
-            rna_res = res2
-        else:
-            other_res = res2
-        if rna_res is None or other_res is None:
+    for r1, r2 in res_pairs:
+        rna_res = rna_residues[r1]
+        other_res = other_residues[r2]
+        if rna_res.id == other_res.id:
             continue
         log.debug("{}(chain {}) and {}(chain {}, resname {}) are close".format(
-            rna_res,rna_res.parent.id,other_res, other_res.parent.id, other_res.resname.strip()))
-        # Only consider C and N. So no ions etc
-        if any(a.name[0] in ["C", "N"] for a in other_res.get_atoms()):
-            interacting_residues.add(rna_res)
-        else:
-            log.debug("but {} has wrong atoms {}".format(other_res, list(a.name for a in other_res.get_atoms())))
+            rna_res, rna_res.parent.id, other_res, other_res.parent.id, other_res.resname.strip()))
+        interacting_residues.add(rna_res)
     log.debug("Interacting: {}".format(interacting_residues))
     return interacting_residues
 
@@ -976,62 +1169,134 @@ def is_almost_coplanar(*points):
     return len(indices) == len(points)
 
 
+def _are_almost_coplanar(points):
+    """
+    A vectorized version of is_almost_coplanar.
+
+    :param points: An array of shape (n, k, 3): n sets of k points each.
+    :returns: A boolean array of length n.
+    """
+    x = points - points.mean(axis=1)[:, np.newaxis, :]
+    M = np.einsum("nki,nkj->nij", x, x)
+    # The normal is the eigenvector of the smallest eigenvalue
+    normals = np.linalg.eigh(M)[1][:, :, 0]
+    oop_distances = np.abs(np.einsum("nki,ni->nk", x, normals))
+    return np.all(oop_distances <= OOP_CUTOFF, axis=1)
+
+
+# For the basepairs detected by is_basepair_pair, the atom names of
+# the purine and the pyrimidine. The first pair of atoms is only used for
+# the coplanarity test, all others have to form hydrogen bonds.
+# G-U pairs are not listed, because is_basepair_pair looks for the
+# G-C atoms in them, which an U does not have.
+_BASEPAIR_ATOMS = {
+    ("A", "U"): [("C8", "C6"), ("N6", "O4"), ("N1", "N3")],
+    ("G", "C"): [("C8", "C6"), ("O6", "N4"), ("N1", "N3"), ("N2", "O2")]
+}
+
+
+def _gather_atoms(residues, resname, atom_names):
+    """
+    :returns: A tuple (residues, coords), where coords has the shape
+              (len(residues), len(atom_names), 3). Only residues with the
+              given resname and all atoms are returned.
+    """
+    found = []
+    coords = []
+    for res in residues:
+        if res.resname.strip() != resname:
+            continue
+        try:
+            coords.append([res[name].coord for name in atom_names])
+        except KeyError as e:
+            log.debug("Missing atom {} in {}".format(e, res))
+            continue
+        found.append(res)
+    return found, np.array(coords, dtype=float).reshape((-1, len(atom_names), 3))
+
+
+def _find_basepairs(residues):
+    """
+    Find all canonical basepairs among the residues.
+
+    This gives the same result as calling is_basepair_pair for all pairs of
+    residues, but only pairs with a short N1-N3 distance are considered
+    and the distance and coplanarity criteria are evaluated for all of
+    them at once.
+
+    :returns: A sorted list of tuples of residues (res1, res2), with res1<res2
+    """
+    pairs = []
+    for (purine, pyrimidine), atom_pairs in _BASEPAIR_ATOMS.items():
+        purines, pur_coords = _gather_atoms(
+            residues, purine, [a for a, _ in atom_pairs])
+        pyrimidines, pyr_coords = _gather_atoms(
+            residues, pyrimidine, [b for _, b in atom_pairs])
+        if not purines or not pyrimidines:
+            continue
+        # All hydrogen bonds have to be shorter than HBOND_CUTOFF, so
+        # one of them is enough to find the candidates.
+        neighbors = scipy.spatial.cKDTree(pur_coords[:, -1]).query_ball_tree(
+            scipy.spatial.cKDTree(pyr_coords[:, -1]), HBOND_CUTOFF)
+        pur_i = np.array([i for i, js in enumerate(neighbors) for _ in js], dtype=int)
+        pyr_i = np.array([j for js in neighbors for j in js], dtype=int)
+        if len(pur_i) == 0:
+            continue
+        pur_points = pur_coords[pur_i]
+        pyr_points = pyr_coords[pyr_i]
+        hbond_lengths = np.linalg.norm(pur_points[:, 1:] - pyr_points[:, 1:], axis=2)
+        mask = np.all(hbond_lengths < HBOND_CUTOFF, axis=1)
+        mask[mask] = _are_almost_coplanar(
+            np.concatenate([pur_points[mask], pyr_points[mask]], axis=1))
+        for i, j in zip(pur_i[mask], pyr_i[mask]):
+            res1, res2 = purines[i], pyrimidines[j]
+            if res2 < res1:
+                res1, res2 = res2, res1
+            pairs.append((res1, res2))
+    return sorted(pairs)
+
+
 def annotate_fallback(chain_list):
     """
     If neither DSSR nor MC-Annotate are available, we use an ad-hoc implementation of canonical
     basepair detection as fallback.
     This does not work well for missing atoms or modified residues.
     """
-    kdtree = bpdb.NeighborSearch(
-        [atom for chain in chain_list for atom in chain.get_atoms()])
-    pairs = kdtree.search_all(10, "R")
+    residues = [res for chain in chain_list for res in chain
+                if res.resname.strip() in RNA_RESIDUES and not res.id[0].startswith("H_")]
     basepairs = {}
     # Sorted, so conflicting basepairs are deterministically solved
-    for res1, res2 in sorted(pairs):
-        if res1.resname.strip() not in RNA_RESIDUES or res1.id[0].startswith("H_"):
+    for res1, res2 in _find_basepairs(residues):
+        res1_id = fgr.resid_from_biopython(res1)
+        res2_id = fgr.resid_from_biopython(res2)
+        if res1_id in basepairs:
+            warnings.warn("More than one basepair detected for {}."
+                          " Ignoring {}-{} because {}-{} is already"
+                          " part of the structure".format(res1_id, res1_id, res2_id, res1_id, basepairs[res1_id]))
             continue
-        if res2.resname.strip() not in RNA_RESIDUES or res2.id[0].startswith("H_"):
+        if res2_id in basepairs:
+            warnings.warn("More than one basepair detected for {}."
+                          " Ignoring {}-{} because {}-{} is already"
+                          " part of the structure".format(res2_id, res2_id, res1_id, res2_id, basepairs[res2_id]))
             continue
-        labels = {res1.resname.strip(), res2.resname.strip()}
-        try:
-            is_bp = is_basepair_pair(res1, res2)
-            if is_bp:
-                res1_id = fgr.resid_from_biopython(res1)
-                res2_id = fgr.resid_from_biopython(res2)
-                if res1_id in basepairs:
-                    warnings.warn("More than one basepair detected for {}."
-                                  " Ignoring {}-{} because {}-{} is already"
-                                  " part of the structure".format(res1_id, res1_id, res2_id, res1_id, basepairs[res1_id]))
-                    continue
-                if res2_id in basepairs:
-                    warnings.warn("More than one basepair detected for {}."
-                                  " Ignoring {}-{} because {}-{} is already"
-                                  " part of the structure".format(res2_id, res2_id, res1_id, res2_id, basepairs[res2_id]))
-                    continue
-                basepairs[res1_id] = res2_id
-                basepairs[res2_id] = res1_id
-        except KeyError as e:
-            log.debug("Missing atom {}. {} has atoms {}, {} has atoms {}".format(
-                e, res1, res1.child_dict, res2, res2.child_dict))
-            pass
+        basepairs[res1_id] = res2_id
+        basepairs[res2_id] = res1_id
 
     seq_ids = []
+    resnames = []
     for chain in sorted(chain_list, key=lambda x: x.id):
         for residue in chain:
             seq_ids.append(fgr.resid_from_biopython(residue))
-    bpseq = ""
-    chain_dict = {c.id: c for c in chain_list}
+            resnames.append(residue.resname.strip())
+    seq_id_index = {seqid: i for i, seqid in enumerate(seq_ids)}
+    bpseq = []
     for i, seqid in enumerate(seq_ids):
         if seqid in basepairs:
-            bp = seq_ids.index(basepairs[seqid]) + 1
+            bp = seq_id_index[basepairs[seqid]] + 1
         else:
             bp = 0
-
-        bpseq += "{} {} {}\n".format(i + 1,
-                                     chain_dict[seqid.chain][seqid.resid].resname.strip(
-                                     ),
-                                     bp)
-    return bpseq, seq_ids
+        bpseq.append("{} {} {}\n".format(i + 1, resnames[i], bp))
+    return "".join(bpseq), seq_ids
 
 
 def rename_rosetta_atoms(chain):
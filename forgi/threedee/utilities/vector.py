@@ -716,6 +716,23 @@ def vec_angle(vec1, vec2):
     return angle
 
 
+def vec_angle_vectorized(vecs1, vecs2):
+    '''
+    The angles between corresponding rows of two arrays of vectors.
+
+    :param vecs1, vecs2: Two Nx3 arrays
+    :return: An array of N angles. Nan, where one of the vectors is the
+             zero-vector.
+    '''
+    vecs1 = np.asarray(vecs1, dtype=float)
+    vecs2 = np.asarray(vecs2, dtype=float)
+    norms = np.linalg.norm(vecs1, axis=1) * np.linalg.norm(vecs2, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d = np.sum(vecs1 * vecs2, axis=1) / np.where(norms == 0, np.nan, norms)
+    # Rounding errors might lead to values slightly outside [-1, 1]
+    return np.arccos(np.clip(d, -1., 1.))
+
+
 def vec_dot(a, b):
     """
     Vector dot product for vectors of length 3.
@@ -1027,6 +1044,69 @@ def line_segment_distance(s1_p0, s1_p1, s2_p0, s2_p1):
     return (s1_p0 + sc * u, s2_p0 + tc * v)
 
 
+def line_segment_distance_vectorized(s1_p0, s1_p1, s2_p0, s2_p1):
+    '''
+    A vectorized version of `line_segment_distance` for N pairs of line
+    segments. It follows the same case distinctions as the scalar version.
+
+    :param s1_p0: A Nx3 array with the starts of the first segments
+    :param s1_p1: A Nx3 array with the ends of the first segments
+
+    :param s2_p0: A Nx3 array with the starts of the second segments
+    :param s2_p1: A Nx3 array with the ends of the second segments
+
+    :return: A tuple of Nx3 arrays (i1,i2), where i1[k] is the point on the
+             k-th first segment closest to the point i2[k] on the
+             k-th second segment.
+    '''
+    s1_p0 = np.asarray(s1_p0, dtype=float)
+    s2_p0 = np.asarray(s2_p0, dtype=float)
+    u = np.asarray(s1_p1, dtype=float) - s1_p0
+    v = np.asarray(s2_p1, dtype=float) - s2_p0
+    w = s1_p0 - s2_p0
+
+    a = np.einsum('ij,ij->i', u, u)        # always >= 0
+    b = np.einsum('ij,ij->i', u, v)
+    c = np.einsum('ij,ij->i', v, v)        # always >= 0
+    d = np.einsum('ij,ij->i', u, w)
+    e = np.einsum('ij,ij->i', v, w)
+
+    D = a * c - b * b       # always >= 0
+
+    SMALL_NUM = 0.000001
+
+    # compute the line parameters of the two closest points
+    parallel = D < SMALL_NUM
+    sN = np.where(parallel, 0., b * e - c * d)
+    sD = np.where(parallel, 1., D)
+    tN = np.where(parallel, e, a * e - b * d)
+    tD = np.where(parallel, c, D)
+    s_low = ~parallel & (sN < 0.0)   # the s=0 edge is visible
+    s_high = ~parallel & (sN > sD)   # the s=1 edge is visible
+    sN = np.where(s_low, 0., np.where(s_high, sD, sN))
+    tN = np.where(s_low, e, np.where(s_high, e + b, tN))
+    tD = np.where(s_low | s_high, c, tD)
+
+    # the t=0 or t=1 edge is visible: recompute sc for this edge
+    t_low = tN < 0.0
+    t_high = ~t_low & (tN > tD)
+    tN = np.where(t_low, 0., np.where(t_high, tD, tN))
+    num = np.where(t_low, -d, -d + b)
+    on_edge = t_low | t_high
+    interior = (num >= 0.0) & (num <= a)
+    sN = np.where(on_edge,
+                  np.where(num < 0.0, 0., np.where(num > a, sD, num)),
+                  sN)
+    sD = np.where(on_edge & interior, a, sD)
+
+    # finally do the division to get sc and tc
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sc = np.where(np.abs(sN) < SMALL_NUM, 0., sN / sD)
+        tc = np.where(np.abs(tN) < SMALL_NUM, 0., tN / tD)
+
+    return (s1_p0 + sc[:, np.newaxis] * u, s2_p0 + tc[:, np.newaxis] * v)
+
+
 def closest_point_on_seg(seg_a, seg_b, circ_pos):
     '''
     Closest point between a line segment and a point.
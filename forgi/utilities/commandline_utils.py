@@ -8,6 +8,9 @@
 import warnings
 import textwrap
 import copy
+import collections
+import itertools
+import multiprocessing
 
 import numpy as np
 
@@ -328,6 +331,192 @@ def load_rna(filename, rna_type="any", allow_many=True, pdb_chain=None,
             return bgs[0]
 
 
+def _has_3d(rna):
+    return isinstance(rna, ftmc.CoarseGrainRNA) and rna.coords.is_filled
+
+
+def _rna_to_string(rna):
+    if _has_3d(rna):
+        return rna.to_cg_string()
+    return rna.to_bg_string()
+
+
+def _load_rna_job(job, serialize=True):
+    """
+    Load one file in a worker process.
+
+    CoarseGrainRNA objects cannot be pickled, so they are sent back to the
+    main process in the forgi file format, unless serialize is False.
+    If out_dir is given, the files are written by the worker and only the
+    filenames are returned.
+    """
+    index, filename, load_kwargs, out_dir = job
+    rnas = load_rna(filename, allow_many=True, **load_kwargs)
+    if out_dir is None:
+        if not serialize:
+            return rnas
+        return [(type(rna), _rna_to_string(rna)) for rna in rnas]
+    out_filenames = []
+    for i, rna in enumerate(rnas):
+        out_filename = os.path.join(out_dir, _out_basename(index, filename, i,
+                                                          len(rnas), rna))
+        # Mode "x" never overwrites a file written for another input.
+        with open(out_filename, "x") as f:
+            f.write(_rna_to_string(rna))
+        out_filenames.append(out_filename)
+    return out_filenames
+
+
+def _out_basename(index, filename, rna_index, rna_count, rna):
+    """
+    The name of the output file of convert_rnas_parallel:
+    `<index>_<input basename>_<rna.name>.cg`, with the index of the RNA
+    in the input file after the basename, if the file contains several RNAs.
+    """
+    if os.path.isfile(filename):
+        base = os.path.splitext(os.path.basename(filename))[0]
+    else:  # A dotbracket string
+        base = "dotbracket"
+    parts = [str(index), base]
+    if rna_count > 1:
+        parts.append(str(rna_index))
+    parts.append(rna.name)
+    extension = ".cg" if _has_3d(rna) else ".bg"
+    return "_".join(parts) + extension
+
+
+def _iter_jobs(filenames, load_kwargs, out_dir, processes, max_pending,
+               maxtasksperchild, skip_errors):
+    """
+    Yield tuples (filename, result, serialized) in the order of filenames.
+
+    serialized is True, if the result was returned by a worker process
+    (and the RNAs are serialized, if out_dir is None) and False, if the file
+    was loaded in this process.
+
+    At most max_pending files are submitted to the pool at any time,
+    so the results waiting for a slow file do not pile up in memory.
+    """
+    jobs = ((index, filename, load_kwargs, out_dir)
+            for index, filename in enumerate(filenames))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if max_pending is None:
+        max_pending = 2 * processes
+    if processes == 1:
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes, maxtasksperchild=maxtasksperchild)
+    pending = collections.deque()
+    try:
+        while True:
+            if pool is not None:
+                for job in itertools.islice(jobs, max_pending - len(pending)):
+                    pending.append(
+                        (job[1], pool.apply_async(_load_rna_job, (job,))))
+            else:
+                for job in itertools.islice(jobs, 1):
+                    pending.append((job[1], job))
+            if not pending:
+                break
+            filename, job = pending.popleft()
+            try:
+                if pool is None:
+                    result = _load_rna_job(job, serialize=False)
+                else:
+                    result = job.get()
+            except Exception:
+                if not skip_errors:
+                    log.error("An error occurred while loading the file {}".format(filename))
+                    raise
+                log.exception("The file {} was skipped due to the following error".format(filename))
+                continue
+            yield filename, result, pool is not None
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def load_rnas_parallel(filenames, processes=None, skip_errors=False,
+                       max_pending=None, maxtasksperchild=20, **load_kwargs):
+    """
+    Load many files in parallel, using a pool of worker processes.
+
+    This is a generator, so the RNAs can be processed while the
+    remaining files are still being converted.
+
+    :param filenames: An iterable of filenames. Dotbracket strings are
+                    supported as well, see load_rna.
+    :param processes: The number of worker processes. Defaults to the
+                    number of CPUs. With processes=1, the files are loaded
+                    in the current process.
+    :param skip_errors: Boolean. If True, errors raised while loading
+                    a file are logged, the file is skipped and the
+                    remaining files are loaded as usual.
+                    If False, the first error propagates to the caller,
+                    the worker processes are terminated and no further
+                    files are yielded.
+    :param max_pending: The maximal number of files submitted to the pool
+                    at the same time. This bounds the memory used for
+                    results that wait for a slower file earlier in the
+                    list. Defaults to twice the number of processes.
+    :param maxtasksperchild: Worker processes are replaced after this many
+                    files, to free the memory they accumulated.
+    :param load_kwargs: Keyword arguments passed to load_rna
+                    (allow_many is always True).
+
+    :yields: Tuples `(filename, rnas)` in the order of the filenames,
+             where rnas is a list of RNAs.
+             With processes=1, these are the RNAs returned by load_rna.
+             Otherwise, they are rebuilt from the forgi file format in
+             the main process, which is lossy: The all-atom chains
+             (`cg.chains`) are not available and the rows of
+             `cg.coords.get_array()` are in the order of a loaded cg file.
+
+    Usage::
+
+        for filename, cgs in load_rnas_parallel(filenames, rna_type="pdb",
+                                                skip_errors=True):
+            ...
+    """
+    for filename, rnas, serialized in _iter_jobs(filenames, load_kwargs, None,
+                                                 processes, max_pending,
+                                                 maxtasksperchild, skip_errors):
+        if serialized:
+            rnas = [cls.from_bg_string(rna_string) for cls, rna_string in rnas]
+        yield filename, rnas
+
+
+def convert_rnas_parallel(filenames, out_dir, processes=None, skip_errors=False,
+                          max_pending=None, maxtasksperchild=20, **load_kwargs):
+    """
+    Convert many files to forgi cg files (or bg files without 3D coordinates)
+    in parallel.
+
+    Every worker writes the files for an input file into out_dir as soon as
+    it is converted, so the RNAs never have to be sent back to the main
+    process. The output files are named after the position and basename
+    of the input file and the RNA, i.e.
+    `out_dir/<index>_<input basename>_<rna.name>.cg`, so RNAs with the same
+    name never overwrite each other. Dotbracket strings use the basename
+    "dotbracket". Existing files are never overwritten; a FileExistsError
+    is raised instead.
+
+    See load_rnas_parallel for a description of the other parameters.
+
+    :yields: Tuples `(filename, out_filenames)` in the order of the filenames.
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    for filename, out_filenames, _ in _iter_jobs(filenames, load_kwargs, out_dir,
+                                                 processes, max_pending,
+                                                 maxtasksperchild, skip_errors):
+        yield filename, out_filenames
+
+
 
 @contextlib.contextmanager
 def open_for_out(filename=None, force=False):
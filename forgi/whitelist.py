@@ -16,7 +16,6 @@
 
 s = ftms.ContinuousAngleStats()
 ftug.spos_to_pos
-ftup.output_chain.HSelect.accept_atom
 
 ftuv.null_array
 ftuv.tau
@@ -0,0 +1,57 @@
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import unittest
+import os.path as op
+
+import numpy as np
+import numpy.testing as nptest
+
+import forgi.threedee.model.coarse_grain as ftmc
+import forgi.projection.projection2d as fpp
+import forgi.projection.hausdorff as fph
+import forgi.projection.features as fpf
+from forgi.utilities.stuff import make_temp_directory
+
+CG_FILES = ["test/forgi/threedee/data/1y26.cg", "test/forgi/threedee/data/1GID_A.cg"]
+
+
+class TestFeatures(unittest.TestCase):
+    def test_projection_features(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file(CG_FILES[0])
+        proj = fpp.Projection2D(cg, [1., 1., 1.])
+        features = fpf.projection_features(proj, condense=5)
+        self.assertEqual(features[0], proj.longest_axis)
+        self.assertEqual(features[1], proj.get_branchpoint_count())
+        self.assertEqual(features[2], proj.get_cyclebasis_len())
+        self.assertEqual(features[3], proj.get_total_length())
+        self.assertEqual(features[4], proj.get_longest_arm_length()[0])
+
+    def test_extract_features(self):
+        table = fpf.extract_features(CG_FILES, num_directions=10, condense=5)
+        self.assertEqual(table.features.shape,
+                         (2, len(fph.get_start_points(10)), len(fpf.FEATURES)))
+        cgs = [ftmc.CoarseGrainRNA.from_bg_file(fn) for fn in CG_FILES]
+        self.assertEqual(table.names, [cg.name for cg in cgs])
+        cg = cgs[1]
+        direction = fph.from_polar([1] + list(table.directions[3]))
+        proj = fpp.Projection2D(cg, direction)
+        nptest.assert_allclose(table.features[1, 3],
+                               fpf.projection_features(proj, condense=5), rtol=1e-6)
+        parallel = fpf.extract_features(cgs, num_directions=10, condense=5,
+                                        processes=2)
+        nptest.assert_array_equal(parallel.features, table.features)
+
+    def test_mask_save_load(self):
+        table = fpf.extract_features(CG_FILES[:1], num_directions=10)
+        mask = table.mask(longest_axis=(50, None))
+        nptest.assert_array_equal(mask, table["longest_axis"] >= 50)
+        self.assertTrue(np.all(table.mask()))
+        with self.assertRaises(KeyError):
+            table["no_such_feature"]
+        with make_temp_directory() as d:
+            filename = op.join(d, "features.npz")
+            table.save(filename)
+            loaded = fpf.FeatureTable.load(filename)
+        self.assertEqual(loaded.names, table.names)
+        nptest.assert_array_equal(loaded.directions, table.directions)
+        nptest.assert_array_equal(loaded.features, table.features)
@@ -5,6 +5,7 @@
 
 import unittest
 import sys
+import itertools as it
 import numpy as np
 import numpy.testing as nptest
 import networkx as nx
@@ -12,10 +13,27 @@
 import forgi.projection.projection2d as fpp
 import forgi.threedee.utilities.vector as ftuv
 import matplotlib.pyplot as plt
+import os
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 # TODO: Add tests for the label of the projected segments!!!
 
 
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
 class Projection2DBasicTest(unittest.TestCase):
     def setUp(self):
         self.longMessage = True
@@ -176,6 +194,96 @@ def test_projection_longest_axis(self):
         proj = fpp.Projection2D(cg, [0., 0., 1.])
         self.assertAlmostEqual(proj.longest_axis, 0)
 
+    def test_projector_like_projection2d(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file('test/forgi/threedee/data/1y26.cg')
+        directions = [[1., 1., 1.], [0., 0., 1.], [-1., 2., 0.5]]
+        projector = fpp.Projector(cg, project_virtual_residues=[1, 10])
+        self.assertEqual(projector.project_points(directions).shape,
+                         (3, 2 * len(projector.elements) + 2, 2))
+        for direction, proj in zip(directions, projector.projections(directions, 30)):
+            expected = fpp.Projection2D(cg, direction, 30,
+                                        project_virtual_residues=[1, 10])
+            nptest.assert_array_equal(proj.proj_direction, direction)
+            self.assertEqual(proj.longest_axis, expected.longest_axis)
+            self.assertEqual(list(proj._coords), list(expected._coords))
+            for key in expected._coords:
+                nptest.assert_array_equal(proj._coords[key], expected._coords[key])
+            nptest.assert_array_equal(proj.get_vres_by_position(10),
+                                      expected.get_vres_by_position(10))
+
+    def test_longest_axis_bounds_and_hull(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file('test/forgi/threedee/data/1y26.cg')
+        directions = np.random.RandomState(3).randn(20, 3)
+        projector = fpp.Projector(cg)
+        lower, upper = projector.longest_axis_bounds(directions)
+        for i, proj in enumerate(projector.projections(directions)):
+            self.assertLessEqual(lower[i], proj.longest_axis)
+            self.assertGreaterEqual(upper[i], proj.longest_axis)
+            hull = proj.get_convex_hull()
+            # All points are on the same side of every edge of the hull.
+            points = np.array(list(proj.points))
+            for p, q in zip(hull, np.roll(hull, -1, axis=0)):
+                self.assertTrue(all(fpp.orientation(p, q, r) >= -1e-8 for r in points))
+
+    def test_rasterize_batch_like_rasterize(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file('test/forgi/threedee/data/1y26.cg')
+        proj = fpp.Projection2D(cg, [1., 1., 1.])
+        box = np.array(proj.get_bounding_square(5))
+        boxes = [box, box + 3.3, box - 7]
+        rotations = [0, 13.5, 271]
+        imgs, steps = proj.rasterize_batch(40, boxes, rotations)
+        self.assertEqual(imgs.shape, (3, 40, 40))
+        for i in range(3):
+            img, step = proj.rasterize(40, boxes[i], warn=False,
+                                       rotate=rotations[i])
+            nptest.assert_array_equal(imgs[i], img.astype(bool))
+            self.assertAlmostEqual(steps[i], step)
+
+
+class Projection2DGraphTest(unittest.TestCase):
+    def setUp(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file('test/forgi/threedee/data/1GID_A.cg')
+        self.proj = fpp.Projection2D(cg, [1., 0.5, 0.2])
+
+    def test_segment_intersection_candidates(self):
+        rng = np.random.RandomState(0)
+        segments = rng.rand(60, 2, 2) * 100
+        lower = segments.min(axis=1)
+        upper = segments.max(axis=1)
+        expected = [(i, j) for i in range(60) for j in range(i + 1, 60)
+                    if np.all(lower[i] <= upper[j]) and np.all(lower[j] <= upper[i])]
+        self.assertEqual(fpp.segment_intersection_candidates(segments), expected)
+
+    def test_crossing_points_symmetric(self):
+        for key1, crossings in self.proj.crossingPoints.items():
+            for point, key2 in crossings:
+                self.assertIn(key1, [k for _, k in self.proj.crossingPoints[key2]])
+
+    def test_condense_points(self):
+        num_nodes = len(self.proj.proj_graph)
+        self.proj.condense_points(5)
+        nodes = list(self.proj.proj_graph.nodes())
+        self.assertLess(len(nodes), num_nodes)
+        for node1, node2 in it.combinations(nodes, 2):
+            self.assertGreaterEqual(ftuv.vec_distance(node1, node2), 5)
+        self.assertEqual(list(nx.selfloop_edges(self.proj.proj_graph)), [])
+
+    def test_graph_metrics_like_networkx(self):
+        self.proj.condense(5)
+        graph = self.proj.proj_graph
+        leaves = [node for node in graph.nodes() if graph.degree(node) == 1]
+        self.assertEqual(self.proj.get_leaf_leaf_distances(),
+                         sorted([ftuv.vec_distance(l1, l2)
+                                 for l1, l2 in it.combinations(leaves, 2)], reverse=True))
+        maxl = max(self.proj._get_path_length(path)
+                   for node1, node2 in it.combinations(graph.nodes(), 2)
+                   for path in nx.all_simple_paths(graph, node1, node2))
+        self.assertAlmostEqual(self.proj.get_maximal_path_length(), maxl)
+        length, (leaf, branchpoint) = self.proj.get_longest_arm_length()
+        self.assertEqual(graph.degree(leaf), 1)
+        self.assertNotEqual(graph.degree(branchpoint), 2)
+        self.assertLessEqual(length, maxl)
+
 
 @unittest.skip("TODO")
 class Projection2DTestWithData(unittest.TestCase):
@@ -369,3 +477,37 @@ def test_rasterize_2d_coordinates_many_points_with_rotation_and_origin(self):
         print(a_rast)
         nptest.assert_array_equal(a_rast, np.array(
             [[0, 12], [0, 13], [0, 13], [-10, 2], [-11, 2], [-11, 2]]))
+
+    def test_bresenham_segments_like_bresenham(self):
+        rng = np.random.RandomState(1)
+        starts = rng.randint(-30, 30, size=(50, 2))
+        ends = rng.randint(-30, 30, size=(50, 2))
+        starts[0] = ends[0]  # A line of length 0
+        points, line_index = fpp.bresenham_segments(starts, ends)
+        for i in range(50):
+            expected = fpp.bresenham(tuple(starts[i]), tuple(ends[i]))
+            nptest.assert_array_equal(points[line_index == i],
+                                      np.array(expected).reshape(-1, 2))
+
+    def test_convex_hull_and_diameter_like_hulls(self):
+        rng = np.random.RandomState(1)
+        for n in [2, 5, 30, 200]:
+            for points in [rng.randn(n, 2) * 30, np.round(rng.randn(n, 2) * 3)]:
+                U, L = fpp.hulls([p for p in points])
+                hull_u, hull_l = fpp.convex_hull(points)
+                nptest.assert_array_equal(points[hull_u], U)
+                nptest.assert_array_equal(points[hull_l], L)
+                p, q = fpp.diameter([p for p in points])
+                i, j = fpp.diameter_indices(points)
+                nptest.assert_array_equal(points[i], p)
+                nptest.assert_array_equal(points[j], q)
+
+    def test_diameter_bounds(self):
+        rng = np.random.RandomState(2)
+        points = rng.randn(10, 40, 2) * 20
+        lower, upper = fpp.diameter_bounds(points, 6)
+        self.assertEqual(lower.shape, (10,))
+        for i in range(10):
+            p, q = fpp.diameter([p for p in points[i]])
+            self.assertLessEqual(lower[i], ftuv.vec_distance(p, q))
+            self.assertGreaterEqual(upper[i], ftuv.vec_distance(p, q))
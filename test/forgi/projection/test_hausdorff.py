@@ -10,6 +10,23 @@
 import forgi.threedee.model.coarse_grain as ftmc
 import matplotlib.pyplot as plt
 import sys
+import os
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
 
 
 @unittest.skip("Skipping Hausdorff tests")
@@ -81,6 +98,52 @@ def test_all_covered_once_two_iterators(self):
             np.min(img2), 1, " - ".join(map(str, np.transpose(np.where(img2 == 0)))))
 
 
+class TestOffsetTable(unittest.TestCase):
+    def test_table_sorted_and_complete(self):
+        table = fph._get_offset_table(40)
+        self.assertGreaterEqual(table.radius, 40)
+        self.assertLessEqual(table.radius, fph.OFFSET_TABLE_MAX_RADIUS)
+        self.assertTrue(np.all(np.diff(table.norms) >= 0))
+        nptest.assert_equal(table.sq_norms, table.dx**2 + table.dy**2)
+        inside = table.sq_norms < 40**2
+        self.assertEqual(len(set(zip(table.dx[inside], table.dy[inside]))),
+                         np.sum(inside))
+        self.assertEqual(np.sum(inside),
+                         sum(1 for dx in range(-40, 41) for dy in range(-40, 41)
+                             if dx**2 + dy**2 < 40**2))
+
+    def test_offsets_beyond_table(self):
+        skip = fph.OFFSET_TABLE_MAX_RADIUS**2 - 100
+        previous = 0
+        for i, (dd, norm) in enumerate(fph.offsets(skip)):
+            self.assertGreaterEqual(dd[0]**2 + dd[1]**2, skip)
+            self.assertGreaterEqual(norm, previous)
+            previous = norm
+            if i > 5000:
+                break
+        self.assertGreater(previous, fph.OFFSET_TABLE_MAX_RADIUS)
+
+    def test_helperdist_many_points(self):
+        rng = np.random.RandomState(2)
+        img = rng.rand(40, 40) < 0.01
+        points = np.transpose(np.where(rng.rand(40, 40) < 0.3))
+        for cutoff in [float("inf"), 3]:
+            dists = fph.hausdorff_helperdist(points, img, cutoff)
+            self.assertEqual(dists.shape, (len(points),))
+            for point, dist in zip(points, dists):
+                expected = np.min(np.sqrt(np.sum((np.transpose(np.where(img)) - point)**2,
+                                                 axis=1)))
+                if expected > cutoff:
+                    self.assertGreater(dist, cutoff)
+                else:
+                    self.assertEqual(dist, expected)
+                self.assertEqual(dist, fph.hausdorff_helperdist(point, img, cutoff))
+
+    def test_helperdist_empty_image(self):
+        self.assertEqual(fph.hausdorff_helperdist([3, 3], np.zeros((5, 5))),
+                         float("inf"))
+
+
 @unittest.skip("Skipping Hausdorff tests")
 class TestHausdorffDistances(unittest.TestCase):
     def setUp(self):
@@ -132,6 +195,126 @@ def test_modified_hausdorff_distance(self):
             self.img2, self.img2), 0)
 
 
+class TestHausdorffEngine(unittest.TestCase):
+    def setUp(self):
+        self.img = np.zeros((30, 30))
+        self.img[10, 10:14] = 1
+        self.img[13, 11:13] = 1
+        self.img2 = np.zeros((30, 30))
+        self.img2[20:24, 10] = 1
+        self.img2[22, 14] = 1
+
+    def test_like_search(self):
+        engine = fph.HausdorffEngine(self.img2)
+        self.assertEqual(engine.hausdorff_distance(self.img),
+                         fph.hausdorff_distance_new(self.img, self.img2))
+        mhd = max(np.mean([fph.hausdorff_helperdist([x, y], self.img)
+                           for x, y in np.transpose(np.where(self.img2))]),
+                  np.mean([fph.hausdorff_helperdist([x, y], self.img2)
+                           for x, y in np.transpose(np.where(self.img))]))
+        self.assertAlmostEqual(engine.modified_hausdorff_distance(self.img), mhd)
+        self.assertAlmostEqual(fph.modified_hausdorff_distance(self.img, self.img2), mhd)
+        self.assertEqual(engine.hausdorff_distance(self.img2), 0)
+
+    def test_random_images_like_search(self):
+        rng = np.random.RandomState(1)
+        for i in range(10):
+            img = rng.rand(20, 20) < 0.05
+            ref_img = rng.rand(20, 20) < 0.05
+            img[0, 0] = ref_img[5, 5] = True
+            self.assertEqual(fph.hausdorff_distance(img, ref_img),
+                             fph.hausdorff_distance_new(img, ref_img))
+
+    def test_cutoff(self):
+        d = fph.hausdorff_distance(self.img, self.img2)
+        self.assertEqual(fph.hausdorff_distance(self.img, self.img2, d), d)
+        self.assertEqual(fph.hausdorff_distance(self.img, self.img2, d - 0.5),
+                         float("inf"))
+
+    def test_batch(self):
+        engine = fph.HausdorffEngine(self.img2)
+        imgs = np.array([self.img, self.img2, np.roll(self.img, 3, axis=1)])
+        for method, function in [(engine.hausdorff_distance, fph.hausdorff_distance),
+                                 (engine.modified_hausdorff_distance,
+                                  fph.modified_hausdorff_distance),
+                                 (engine.combined_distance, fph.combined_distance)]:
+            nptest.assert_allclose(method(imgs),
+                                   [function(img, self.img2) for img in imgs])
+
+    def test_empty_images(self):
+        engine = fph.HausdorffEngine(self.img2)
+        self.assertEqual(engine.hausdorff_distance(np.zeros((30, 30))), float("inf"))
+        engine = fph.HausdorffEngine(np.zeros((30, 30)))
+        self.assertEqual(engine.hausdorff_distance(self.img), float("inf"))
+        self.assertEqual(engine.hausdorff_distance(np.zeros((30, 30))), 0)
+
+    def test_distance_function(self):
+        engine = fph.HausdorffEngine(self.img2)
+        distance = engine.distance_function(fph.hausdorff_distance)
+        d = fph.hausdorff_distance(self.img, self.img2)
+        self.assertEqual(distance(self.img2, self.img), d)
+        self.assertEqual(distance(self.img, self.img2), d)
+        self.assertEqual(distance(self.img, self.img), 0)
+
+
+class TestParallelGlobalSearch(unittest.TestCase):
+    def setUp(self):
+        self.cg = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1y26.cg')
+        ref_proj = fpp.Projection2D(self.cg, [2, 0, -1.2])
+        ref_box = ref_proj.get_bounding_square(margin=30)
+        self.ref_img, _ = ref_proj.rasterize(40, bounding_square=ref_box)
+        self.scale = ref_box[1] - ref_box[0]
+
+    def test_report(self):
+        report = []
+        distance, img, params = fph.globally_minimal_distance(
+            self.ref_img, self.scale, self.cg, start_points=10, local_maxiter=2,
+            virtual_atoms=False, report=report)
+        self.assertGreater(len(report), 10)
+        self.assertTrue(all(r.heuristic in [None, "longest_axis", "score"]
+                            for r in report))
+        optimized = [r.score for r in report if r.heuristic is None]
+        self.assertGreater(len(optimized), 0)
+        self.assertLessEqual(distance, min(optimized))
+
+    def test_processes_deterministic(self):
+        results = [fph.globally_minimal_distance(
+            self.ref_img, self.scale, self.cg, start_points=10, local_maxiter=2,
+            virtual_atoms=False, processes=2) for i in range(2)]
+        self.assertEqual(results[0][0], results[1][0])
+        nptest.assert_array_equal(results[0][1], results[1][1])
+        nptest.assert_array_equal(results[0][2][0], results[1][2][0])
+
+
+class TestPyramidSearch(unittest.TestCase):
+    def test_downsample_image(self):
+        img = np.zeros((10, 10), dtype=bool)
+        img[0, 0] = img[3, 9] = img[9, 4] = True
+        small = fph.downsample_image(img, 5)
+        self.assertEqual(small.shape, (5, 5))
+        self.assertEqual(list(zip(*np.nonzero(small))), [(0, 0), (1, 4), (4, 2)])
+        nptest.assert_array_equal(fph.downsample_image(img, 10), img)
+
+    def test_pyramid_search(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file('test/forgi/threedee/data/1y26.cg')
+        ref_proj = fpp.Projection2D(cg, [2, 0, -1.2])
+        ref_box = ref_proj.get_bounding_square(margin=30)
+        ref_img, _ = ref_proj.rasterize(64, bounding_square=ref_box)
+        scale = ref_box[1] - ref_box[0]
+        report = []
+        distance, img, params = fph.pyramid_minimal_distance(
+            ref_img, scale, cg, levels=3, virtual_atoms=False,
+            report=report)
+        self.assertLessEqual(distance, 3)
+        self.assertEqual([r.level for r in report], [2, 1, 0])
+        self.assertEqual([r.resolution for r in report], [16, 32, 64])
+        self.assertEqual(report[0].saved, 0)
+        self.assertEqual(report[1].evaluated, report[0].promoted)
+        self.assertEqual(report[2].evaluated, report[1].promoted)
+        self.assertGreater(report[2].saved, 0)
+
+
 @unittest.skip("Skipping Hausdorff tests")
 class TestHelperFunctions(unittest.TestCase):
     def setUp(self):
@@ -23,6 +23,8 @@
 
 subprocess_env = os.environ.copy()
 subprocess_env["PYTHONPATH"] = FORGI_DIR + os.pathsep + subprocess_env["PATH"]
+# The examples neither read nor fill the user's annotation cache.
+subprocess_env["FORGI_ANNOTATION_CACHE_SIZE"] = "0"
 
 
 class TestRnaConvert(unittest.TestCase):
@@ -3,13 +3,21 @@
 import unittest
 import logging
 import math
+import subprocess as sp
+import sys
 try:
     from unittest.mock import patch
 except ImportError:
     from mock import patch
+try:
+    from io import BytesIO
+except ImportError:
+    from StringIO import StringIO as BytesIO
 
 import numpy as np
+import numpy.testing as nptest
 
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix
 
@@ -21,6 +29,25 @@
 log = logging.getLogger(__name__)
 
 
+def synthetic_classifier(**params):
+    """
+    An AMinorClassifier fitted to random trainings data, with
+    interactions clustered around (0.5, 1.2, 0.3).
+
+    :param params: Override the parameters of the classifier
+    """
+    rng = np.random.RandomState(1)
+    X = np.concatenate([rng.normal((0.5, 1.2, 0.3), 0.3, size=(60, 3)),
+                        rng.uniform((0, 0, -np.pi), (3, np.pi / 2, np.pi),
+                                    size=(200, 3))])
+    y = np.array([1] * 60 + [0] * 200)
+    kwargs = dict(kernel="gaussian", bandwidth=0.5, p_I=0.3)
+    kwargs.update(params)
+    clf = ftca.AMinorClassifier(**kwargs)
+    clf.fit(X, y)
+    return clf
+
+
 class TestRelativeOrientation(unittest.TestCase):
     def test_get_relative_orientation(self):
         cg = ftmc.CoarseGrainRNA.from_dotbracket(
@@ -50,6 +77,52 @@ def test_get_relative_orientation(self):
         self.assertAlmostEqual(a2, math.pi / 2)
 
 
+class TestVectorizedOrientation(unittest.TestCase):
+    def setUp(self):
+        self.cgs = [ftmc.CoarseGrainRNA.from_bg_file("test/forgi/threedee/data/3pdr_X.cg"),
+                    ftmc.CoarseGrainRNA.from_bg_file("test/forgi/threedee/data/1GID_A.cg")]
+
+    def test_potential_interactions_like_scalar_version(self):
+        for cg in self.cgs:
+            for loop_type in "ih":
+                geos, labels = ftca.potential_interactions(cg, loop_type)
+                expected_geos = []
+                expected_labels = []
+                for loop in cg.defines:
+                    if loop[0] == loop_type and 'A' in "".join(cg.get_define_seq_str(loop)):
+                        loop_geos, loop_labels = ftca.loop_potential_interactions(cg, loop)
+                        expected_geos.extend(loop_geos)
+                        expected_labels.extend(loop_labels)
+                self.assertGreater(len(geos), 0)
+                self.assertEqual(labels.tolist(), expected_labels)
+                nptest.assert_allclose(geos, expected_geos, atol=1e-7)
+
+    def test_ensemble_potential_interactions(self):
+        geos, labels, indices = ftca.ensemble_potential_interactions(self.cgs, "i")
+        for i, cg in enumerate(self.cgs):
+            cg_geos, cg_labels = ftca.potential_interactions(cg, "i")
+            nptest.assert_array_equal(geos[indices == i], cg_geos)
+            nptest.assert_array_equal(labels[indices == i], cg_labels)
+
+    def test_ensemble_interactions(self):
+        clf = synthetic_classifier()
+        clfs = {"i": clf, "h": clf}
+        interactions = ftca.ensemble_interactions(self.cgs, clfs)
+        self.assertEqual(len(interactions), 2)
+        self.assertGreater(sum(len(i) for i in interactions), 0)
+        for cg, cg_interactions in zip(self.cgs, interactions):
+            expected = ftca.all_interactions(cg, clfs)
+            self.assertEqual(sorted(map(tuple, cg_interactions)),
+                             sorted(map(tuple, expected)))
+
+    def test_relative_orientations_undefined_angles(self):
+        geos = ftca.relative_orientations([[[0, 0, 5.], [0, 0, 10]]],
+                                          [[[0, 0, 0.], [0, 0, 5]]],
+                                          [[[0, 1, 0.], [0, -1, 0]]], [5])
+        self.assertEqual(geos[0, 0], 0)
+        self.assertTrue(np.isnan(geos[0, 2]))
+
+
 class TestJustClassifyFunctions(unittest.TestCase):
     def setUp(self):
         self.cg = ftmc.CoarseGrainRNA.from_bg_file(
@@ -109,3 +182,98 @@ def test_no_loop(self):
         geos, labels = ftca.potential_interactions(cg, "h")
         self.assertEqual(len(geos), 0)
         self.assertEqual(len(labels), 0)
+
+
+class TestPrefittedModelFile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.clf = synthetic_classifier()
+        cls.query = np.random.RandomState(2).uniform((0, 0, -np.pi),
+                                                     (3, np.pi / 2, np.pi),
+                                                     size=(500, 3))
+
+    def test_roundtrip_gives_same_probabilities(self):
+        f = BytesIO()
+        ftca.write_model_file(f, {"h": self.clf})
+        f.seek(0)
+        clfs = ftca.read_model_file(f)
+        self.assertEqual(list(clfs.keys()), ["h"])
+        self.assertEqual(clfs["h"].get_params(), self.clf.get_params())
+        nptest.assert_allclose(clfs["h"].predict_proba(self.query),
+                               self.clf.predict_proba(self.query), atol=1e-10)
+
+    def test_outdated_model_file_is_ignored(self):
+        f = BytesIO()
+        with patch("forgi.threedee.classification.aminor.MODEL_FORMAT_VERSION", 0):
+            ftca.write_model_file(f, {"h": self.clf})
+        f.seek(0)
+        with self.assertWarns(UserWarning):
+            clfs = ftca.read_model_file(f)
+        self.assertEqual(clfs, {})
+
+    def test_linear_kernel_cannot_be_stored(self):
+        clf = synthetic_classifier(kernel="linear")
+        with self.assertRaises(ValueError):
+            ftca.write_model_file(BytesIO(), {"h": clf})
+
+    def test_prediction_without_sklearn(self):
+        f = BytesIO()
+        ftca.write_model_file(f, {"h": self.clf})
+        code = ("import sys, io, numpy as np\n"
+                "import forgi.threedee.classification.aminor as ftca\n"
+                "clfs = ftca.read_model_file(io.BytesIO(sys.stdin.buffer.read()))\n"
+                "clfs['h'].predict_proba(np.zeros((1, 3)))\n"
+                "ftca.AMinorClassifier(kernel='gaussian')\n"
+                "assert 'sklearn' not in sys.modules\n")
+        process = sp.Popen([sys.executable, "-c", code], stdin=sp.PIPE,
+                           stderr=sp.PIPE)
+        _, err = process.communicate(f.getvalue())
+        self.assertEqual(process.returncode, 0, err)
+
+
+class TestEstimatorInterface(unittest.TestCase):
+    def test_clone(self):
+        clf = synthetic_classifier()
+        clf2 = clone(clf)
+        self.assertEqual(clf2.get_params(), clf.get_params())
+        self.assertFalse(hasattr(clf2, "ame_kde_"))
+
+    def test_set_params_refits(self):
+        clf = synthetic_classifier()
+        X = np.array([[0.5, 1.2, 0.3], [2, 0.2, 2]])
+        p = clf.predict_proba(X)
+        clf.set_params(bandwidth=0.2)
+        nptest.assert_array_equal(clf.predict_proba(X),
+                                  synthetic_classifier(bandwidth=0.2).predict_proba(X))
+        self.assertFalse(np.allclose(clf.predict_proba(X), p))
+        with self.assertRaises(ValueError):
+            clf.set_params(foo=1)
+
+
+class TestInterpolatedClassifier(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.clf = synthetic_classifier()
+
+    def test_accuracy_bound(self):
+        interp = ftca.InterpolatedAMinorClassifier(self.clf, max_error=0.02)
+        self.assertLessEqual(interp.report_.max_error, 0.02)
+        X = np.random.RandomState(2).uniform((0, 0, -np.pi),
+                                             (3, np.pi / 2, np.pi),
+                                             size=(500, 3))
+        nptest.assert_allclose(interp.predict_proba(X),
+                               self.clf.predict_proba(X), atol=0.05)
+
+    def test_warns_if_bound_not_reached(self):
+        with self.assertWarns(UserWarning):
+            interp = ftca.InterpolatedAMinorClassifier(self.clf, grid_shape=(2, 2, 2),
+                                                       max_error=1e-6,
+                                                       max_refinements=0)
+        self.assertEqual(interp.report_.grid_shape, (2, 2, 2))
+
+    def test_outside_domain_uses_exact_classifier(self):
+        interp = ftca.InterpolatedAMinorClassifier(self.clf, grid_shape=(2, 2, 2),
+                                                   max_error=1, max_refinements=0)
+        X = [[3.5, 1., 0.], [0.5, 1.2, 0.3]]
+        proba = interp.predict_proba(X)
+        self.assertAlmostEqual(proba[0], self.clf.predict_proba(X)[0])
@@ -37,6 +37,18 @@
 log = logging.getLogger(__name__)
 
 
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
 @contextlib.contextmanager
 def ignore_warnings():
     with warnings.catch_warnings():
@@ -778,6 +790,39 @@ def test_virtuel_atom_caching_is_reset(self):
                         msg="A stale virtual atom position was used.")
 
 
+class StackingTableTest(unittest.TestCase):
+    def test_stacking_table_tyagi_like_is_stacking(self):
+        for filename in ["1GID_A.cg", "3D0U_A.cg", "1S72_0.cg"]:
+            cg = ftmc.CoarseGrainRNA.from_bg_file(
+                'test/forgi/threedee/data/' + filename)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                table = cg.get_stacking_table()
+                for d in cg.defines:
+                    if d[0] in "mi":
+                        self.assertEqual(table[d], cg.is_stacking(d),
+                                         msg="{}: {}".format(filename, d))
+                    else:
+                        self.assertNotIn(d, table)
+
+    def test_stacking_table_cg(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A.cg')
+        table = cg.get_stacking_table("CG")
+        for d in cg.mloop_iterator():
+            self.assertEqual(table[d], cg.is_stacking(d, "CG"))
+
+    def test_stacking_helices_uses_table(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A.cg')
+        table = cg.get_stacking_table()
+        helices = cg.get_stacking_helices()
+        stacked = [d for d in table if table[d]]
+        for d in stacked:
+            s1, s2 = cg.connections(d)
+            self.assertTrue(any(s1 in h and s2 in h for h in helices))
+
+
 class RotationTranslationTest(unittest.TestCase):
     def setUp(self):
         self.cg1 = ftmc.CoarseGrainRNA.from_bg_file(
@@ -849,3 +894,64 @@ def test_stericValue_1(self):
             mlab.plot3d(x, y, z, tube_radius=2, color=colors[d[0]])
         mlab.show()
         assert False
+
+    def _brute_force_steric_value(self, cg, elements, power, exclude=False,
+                                  radius=float("inf")):
+        center = ftuv.get_vector_centroid(cg.coords[elements])
+        value = 0
+        for pos in range(1, cg.seq_length + 1):
+            if exclude and cg.get_node_from_residue_num(pos) in elements:
+                continue
+            for va in cg.virtual_atoms(pos).values():
+                if ftuv.vec_distance(va, center) <= radius:
+                    value += 1 / (1 + ftuv.vec_distance(va, center))**power
+        return value
+
+    def test_steric_values_like_brute_force(self):
+        element_sets = [["m0", "m1", "m2"], ["s0"], ["h0", "s1"]]
+        for method, power, exclude in [("r**-2", 2, False), ("r**-3e", 3, True)]:
+            values = self.cg1.steric_values(element_sets, method)
+            for i, elements in enumerate(element_sets):
+                self.assertAlmostEqual(values[i], self._brute_force_steric_value(
+                    self.cg1, elements, power, exclude))
+                self.assertAlmostEqual(self.cg1.steric_value(elements, method),
+                                       values[i])
+
+    def test_steric_values_radius(self):
+        element_sets = [["m0", "m1", "m2"], ["s0"], ["h0", "s1"]]
+        for method, power, exclude in [("r**-2", 2, False), ("r**-3e", 3, True)]:
+            values = self.cg1.steric_values(element_sets, method, radius=15)
+            for i, elements in enumerate(element_sets):
+                self.assertAlmostEqual(values[i], self._brute_force_steric_value(
+                    self.cg1, elements, power, exclude, radius=15))
+
+    def test_steric_values_kde_radius(self):
+        element_sets = [["m0", "m1", "m2"], ["s0"]]
+        full = self.cg1.steric_values(element_sets, "kde")
+        nptest.assert_allclose(self.cg1.steric_values(element_sets, "kde", radius=1e6),
+                               full)
+        truncated = self.cg1.steric_values(element_sets, "kde", radius=15)
+        self.assertTrue(np.all(truncated < full))
+
+    def test_steric_values_cutoff(self):
+        center = ftuv.get_vector_centroid(self.cg1.coords[["m0", "m1"]])
+        expected = 0
+        for pos in range(1, self.cg1.seq_length + 1):
+            for va in self.cg1.virtual_atoms(pos).values():
+                if ftuv.vec_distance(va, center) < 20:
+                    expected += 1
+        self.assertEqual(self.cg1.steric_value(["m0", "m1"], "cutoff 20"), expected)
+        nptest.assert_equal(self.cg1.steric_values([center, center], "cutoff 20"),
+                            [expected, expected])
+
+    def test_steric_value_tree_reset_on_coordinate_change(self):
+        old = self.cg1.steric_value(["m0"])
+        self.cg1.coords["s0"] = self.cg1.coords["s0"] + np.array([10., 0, 0])
+        new = self.cg1.steric_value(["m0"])
+        self.assertNotAlmostEqual(old, new)
+        self.assertAlmostEqual(new, self._brute_force_steric_value(self.cg1, ["m0"], 2))
+
+    def test_steric_value_kde_reset_on_coordinate_change(self):
+        old = self.cg1.steric_value(["m0"], "kde")
+        self.cg1.coords["s0"] = self.cg1.coords["s0"] + np.array([10., 0, 0])
+        self.assertNotEqual(self.cg1.steric_value(["m0"], "kde"), old)
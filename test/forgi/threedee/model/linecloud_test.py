@@ -80,6 +80,19 @@ def test_rotate1(self):
         self.cs.rotate(rotMat)
         nptest.assert_almost_equal(self.cs["s1"][1], [0, -10, 0])
 
+    def test_set_array(self):
+        changed = []
+        cs = CoordinateStorage(["s1", "s2"], on_change=changed.append)
+        arr = np.arange(12).reshape((4, 3))
+        cs.set_array(arr)
+        nptest.assert_array_equal(cs["s2"][0], [6, 7, 8])
+        nptest.assert_array_equal(cs.get_array(), arr)
+        self.assertEqual(sorted(changed), ["s1", "s2"])
+        arr[0, 0] = 100  # A copy is stored
+        self.assertEqual(cs["s1"][0][0], 0)
+        with self.assertRaises(ValueError):
+            cs.set_array(np.zeros((2, 3)))
+
 
 class CoordinateStorageTest2(unittest.TestCase):
     def setUp(self):
@@ -78,6 +78,26 @@ def test_new_confusionmatrix_is_like_old(self):
         self.assertAlmostEqual(mcc, mcc_n)
         self.assertAlmostEqual(mcc_n, 1.0)
 
+    def test_evaluate_many_like_evaluate(self):
+        cg1 = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A.cg')
+        cg2 = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A_sampled.cg')
+        adj = ftme.AdjacencyCorrelation(cg1)
+        rng = np.random.RandomState(1)
+        coords = np.array([cg2.coords.get_array(), cg1.coords.get_array()] +
+                          [cg2.coords.get_array() + rng.randn(len(cg2.coords.get_array()), 3)
+                           for i in range(5)])
+        many = adj.evaluate_many(coords, chunksize=3)
+        for i, c in enumerate(coords):
+            cg2.coords.set_array(c)
+            self.assertEqual({key: int(value[i]) for key, value in many.items()},
+                             adj.evaluate(cg2))
+        self.assertEqual(many["fp"][1], 0)
+        self.assertEqual(many["fn"][1], 0)
+        with self.assertRaises(ftme.Incompareable):
+            adj.evaluate_many(coords[:, :10])
+
     def test_cg_rmsd(self):
         cg1 = ftmc.CoarseGrainRNA.from_bg_file(
             'test/forgi/threedee/data/1GID_A.cg')
@@ -153,6 +173,34 @@ def test_rmsd_to_same_rotated(self):
         self.assertAlmostEqual(ftme.drmsd(a1, a2), 0)
         self.assertAlmostEqual(ftme.rmsd(a1, a2), 0)
 
+    def test_rmsd_batch_like_rmsd(self):
+        np.random.seed(1)
+        reference = np.random.uniform(-10, 10, (20, 3))
+        coords = np.random.uniform(-10, 10, (6, 20, 3))
+        # A rotated and shifted copy of the reference
+        rot = ftuv.rotation_matrix(np.array([1., 2., 3.]), 0.7)
+        coords[0] = np.dot(reference, rot.T) + 4
+        # A mirror image must not be superimposed perfectly
+        coords[1] = reference * [1, 1, -1]
+        rmsds = ftme.rmsd_batch(reference, coords)
+        self.assertAlmostEqual(rmsds[0], 0, places=5)
+        self.assertGreater(rmsds[1], 1)
+        for rmsd, c in zip(rmsds, coords):
+            self.assertAlmostEqual(rmsd, ftme.rmsd(reference, c))
+        for rmsd, c in zip(ftme.rmsd_batch(reference, coords, False), coords):
+            self.assertAlmostEqual(rmsd, ftuv._vector_set_rmsd(reference, c))
+        with self.assertRaises(ftme.Incompareable):
+            ftme.rmsd_batch(reference, coords[:, :10])
+
+    def test_rmsd_matrix(self):
+        np.random.seed(2)
+        coords = np.random.uniform(-10, 10, (7, 15, 3))
+        for superimpose, rmsd in [(True, ftme.rmsd), (False, ftuv._vector_set_rmsd)]:
+            matrix = ftme.rmsd_matrix(coords, superimpose, chunksize=3)
+            self.assertEqual(matrix.shape, (7, 7))
+            for i, j in it.product(range(7), repeat=2):
+                self.assertAlmostEqual(matrix[i, j], rmsd(coords[i], coords[j]))
+
     @unittest.skip("With rmsd_qc, we require 3 dimensions")
     def test_rmsd_in_2D(self):
         a1 = np.array([[1., 1.], [0., 0.], [-1., -1.]])
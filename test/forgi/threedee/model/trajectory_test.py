@@ -0,0 +1,88 @@
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import unittest
+import os.path
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import numpy as np
+import numpy.testing as nptest
+
+import forgi.threedee.model.coarse_grain as ftmc
+import forgi.threedee.model.trajectory as ftmtr
+import forgi.threedee.utilities.atom_array as ftuaa
+import forgi.threedee.utilities.pdb as ftup
+from forgi.utilities.stuff import make_temp_directory
+
+NMR_FILE = "test/forgi/threedee/data/1byj.pdb"
+
+
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
+class TestTrajectoriesFromPdb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.trajs = ftmtr.trajectories_from_pdb(NMR_FILE, annotation_tool="forgi")
+
+    def test_all_models_loaded(self):
+        self.assertEqual(len(self.trajs), 1)
+        traj = self.trajs[0]
+        self.assertEqual(len(traj), 38)
+        self.assertEqual(traj.coords.shape, (38,) + traj.cg.coords.get_array().shape)
+        self.assertFalse(np.isnan(traj.coords).any())
+        self.assertFalse(np.isnan(traj.twists).any())
+        # NMR models differ
+        self.assertGreater(np.abs(traj.coords[1] - traj.coords[0]).max(), 0.1)
+
+    def test_first_frame_like_from_pdb(self):
+        cg, = ftmc.CoarseGrainRNA.from_pdb(NMR_FILE, annotation_tool="forgi")
+        traj = self.trajs[0]
+        nptest.assert_allclose(traj.coords[0], cg.coords.get_array())
+        nptest.assert_allclose(traj.twists[0], cg.twists.get_array())
+        # The cg is reset to the first model
+        nptest.assert_allclose(traj.cg.coords.get_array(), cg.coords.get_array())
+
+    def test_frames_from_chains_like_from_pdb(self):
+        cg, = ftmc.CoarseGrainRNA.from_pdb(NMR_FILE, annotation_tool="forgi")
+        traj = ftmtr.CoarseGrainTrajectory(cg)
+        atoms, _ = ftuaa.read_pdb(NMR_FILE)
+        chains = [ftup.clean_chain(c)[0] for c in ftuaa.clean_atoms(atoms).to_chains()]
+        ftmtr._add_frame_from_chains(traj, chains)
+        nptest.assert_allclose(traj.coords[0], self.trajs[0].coords[0])
+
+    def test_getitem(self):
+        traj = self.trajs[0]
+        cg = traj[5]
+        self.assertEqual(cg.defines, traj.cg.defines)
+        nptest.assert_allclose(cg.coords.get_array(), traj.coords[5])
+        nptest.assert_allclose(traj[-1].twists.get_array(), traj.twists[-1])
+        with self.assertRaises(IndexError):
+            traj[38]
+
+    def test_save_load(self):
+        with make_temp_directory() as d:
+            fn = os.path.join(d, "traj.npz")
+            self.trajs[0].save(fn)
+            traj = ftmtr.CoarseGrainTrajectory.load(fn)
+        self.assertEqual(len(traj), 38)
+        self.assertEqual(traj.cg.defines, self.trajs[0].cg.defines)
+        nptest.assert_allclose(traj.coords, self.trajs[0].coords)
+        nptest.assert_allclose(traj.twists, self.trajs[0].twists)
+
+    def test_append_wrong_shape(self):
+        traj = ftmtr.CoarseGrainTrajectory(self.trajs[0].cg)
+        with self.assertRaises(ValueError):
+            traj.append(np.zeros((3, 3)), self.trajs[0].twists[0])
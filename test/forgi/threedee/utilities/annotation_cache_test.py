@@ -0,0 +1,104 @@
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import unittest
+import os
+import os.path as op
+import time
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import forgi.graph.residue as fgr
+import forgi.threedee.utilities.annotation_cache as ftuac
+import forgi.threedee.model.coarse_grain as ftmc
+from forgi.utilities.stuff import make_temp_directory
+
+PDB_FILE = "test/forgi/threedee/data/1y26.pdb"
+ANNOTATION = ("1 G 0\n2 C 0\n",
+              [fgr.RESID("A", (" ", 1, " ")), fgr.RESID("A", (" ", 2, "A")), None],
+              {"nts": [{"nt_id": "A.G1"}]})
+
+
+class TestAnnotationCache(unittest.TestCase):
+    def test_roundtrip(self):
+        with make_temp_directory() as d:
+            cache = ftuac.AnnotationCache(d, max_size=10)
+            key = cache.key(PDB_FILE, "x3dna-dssr", "1.0")
+            self.assertIsNone(cache.get(key))
+            cache.put(key, ANNOTATION)
+            self.assertEqual(cache.get(key), ANNOTATION)
+            self.assertGreater(cache.size(), 0)
+
+    def test_key(self):
+        cache = ftuac.AnnotationCache("unused", max_size=10)
+        key = cache.key(PDB_FILE, "x3dna-dssr", "1.0")
+        self.assertEqual(key, cache.key(PDB_FILE, "x3dna-dssr", "1.0"))
+        self.assertNotEqual(key, cache.key(PDB_FILE, "MC-Annotate", "1.0"))
+        self.assertNotEqual(key, cache.key(PDB_FILE, "x3dna-dssr", "2.0"))
+        self.assertNotEqual(key, cache.key(PDB_FILE, "x3dna-dssr", "1.0",
+                                           {"option": 1}))
+        self.assertNotEqual(key, cache.key("test/forgi/threedee/data/1GID_native.pdb",
+                                           "x3dna-dssr", "1.0"))
+
+    def test_evict_least_recently_used(self):
+        with make_temp_directory() as d:
+            cache = ftuac.AnnotationCache(d, max_size=10)
+            keys = ["a", "b", "c"]
+            for i, key in enumerate(keys):
+                cache.put(key, ANNOTATION)
+                # Make sure the modification times differ
+                t = time.time() - 100 + i
+                os.utime(cache._path(key), (t, t))
+            cache.get("a")  # Now "b" is the least recently used entry.
+            size_per_entry = cache.size() / 3
+            cache.evict(2.5 * size_per_entry / 1024 / 1024)
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNone(cache.get("b"))
+            self.assertIsNotNone(cache.get("c"))
+            cache.clear()
+            self.assertEqual(cache.size(), 0)
+
+    def test_disabled(self):
+        with make_temp_directory() as d:
+            cache = ftuac.AnnotationCache(d, max_size=0)
+            cache.put("a", ANNOTATION)
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(os.listdir(d), [])
+
+    def test_cached_annotation_calls_tool_once(self):
+        calls = []
+
+        def annotate():
+            calls.append(1)
+            return ANNOTATION
+        with make_temp_directory() as d:
+            with patch("forgi.config.read_config",
+                       return_value={"CACHE_DIR": d}):
+                for i in range(2):
+                    annotation = ftmc._cached_annotation(PDB_FILE, "sh", annotate)
+                    self.assertEqual(annotation, ANNOTATION)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(os.listdir(op.join(d, "annotations"))), 1)
+
+    def test_environment_variable_overrides_config(self):
+        with make_temp_directory() as d:
+            with patch("forgi.config.read_config",
+                       return_value={"ANNOTATION_CACHE_SIZE": 5}):
+                with patch.dict(os.environ, {ftuac.SIZE_ENVIRONMENT_VARIABLE: "0"}):
+                    self.assertFalse(ftuac.AnnotationCache(d).enabled)
+                with patch.dict(os.environ, {ftuac.SIZE_ENVIRONMENT_VARIABLE: ""}):
+                    self.assertEqual(ftuac.AnnotationCache(d).max_size, 5)
+
+    def test_key_depends_on_tool_arguments(self):
+        cache = ftuac.AnnotationCache(max_size=1)
+        with patch("forgi.threedee.model.coarse_grain.which",
+                   return_value=PDB_FILE):
+            key = ftmc._annotation_cache_key(cache, PDB_FILE, "x3dna-dssr")
+            self.assertEqual(ftmc._annotation_cache_key(cache, PDB_FILE, "x3dna-dssr"),
+                             key)
+            with patch("forgi.threedee.model.coarse_grain._dssr_arguments",
+                       return_value=["x3dna-dssr", "--nested"]):
+                self.assertNotEqual(
+                    ftmc._annotation_cache_key(cache, PDB_FILE, "x3dna-dssr"), key)
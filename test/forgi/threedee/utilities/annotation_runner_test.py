@@ -0,0 +1,95 @@
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import unittest
+import os
+import os.path as op
+import stat
+import sys
+import time
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import forgi.threedee.model.coarse_grain as ftmc
+from forgi.utilities.stuff import make_temp_directory
+try:
+    import forgi.threedee.utilities.annotation_runner as ftuar
+except SyntaxError:  # Python 2
+    ftuar = None
+
+# A fake x3dna-dssr, which uses the forgi fallback annotation and
+# writes the files DSSR would write.
+FAKE_DSSR = """#!{python}
+import json, os, sys, time
+import forgi.threedee.utilities.pdb as ftup
+args = dict(arg.lstrip("-").split("=", 1) for arg in sys.argv[1:] if "=" in arg)
+time.sleep(float(os.environ.get("FAKE_DSSR_SLEEP", 0)))
+chains, _, _ = ftup.get_all_chains(args["i"])
+bpseq, seq_ids = ftup.annotate_fallback(chains)
+with open(args["prefix"] + "-2ndstrs.bpseq", "w") as f:
+    f.write(bpseq)
+nts = [{{"nt_id": "{{}}.N{{}}{{}}".format(
+            s.chain, s.resid[1], "" if s.resid[2] == " " else "^" + s.resid[2])}}
+       for s in seq_ids]
+with open(args["o"], "w") as f:
+    json.dump({{"nts": nts}}, f)
+"""
+
+PDB_FILES = ["test/forgi/threedee/data/1GID_native.pdb",
+             "test/forgi/threedee/data/1y26.pdb",
+             "test/forgi/threedee/data/1DUQ.pdb"]
+
+
+@unittest.skipIf(ftuar is None, "Requires Python 3.5")
+class TestAnnotationRunner(unittest.TestCase):
+    def setUp(self):
+        self.bin_dir = make_temp_directory()
+        d = self.bin_dir.__enter__()
+        fake = op.join(d, "x3dna-dssr")
+        with open(fake, "w") as f:
+            f.write(FAKE_DSSR.format(python=sys.executable))
+        os.chmod(fake, os.stat(fake).st_mode | stat.S_IEXEC)
+        env = {"PATH": d + os.pathsep + os.environ["PATH"],
+               "PYTHONPATH": os.pathsep.join([os.getcwd()] + sys.path)}
+        self.patches = [patch.dict(os.environ, env),
+                        patch("forgi.config.read_config",
+                              return_value={"ANNOTATION_CACHE_SIZE": 0})]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.bin_dir.__exit__(None, None, None)
+
+    def test_load_pdbs_like_from_pdb(self):
+        runner = ftuar.AnnotationRunner(max_jobs=2, annotation_tool="DSSR")
+        results = runner.load_pdbs(PDB_FILES, remove_pseudoknots=True)
+        self.assertEqual([fn for fn, _ in results], PDB_FILES)
+        for filename, cgs in results:
+            expected = ftmc.CoarseGrainRNA.from_pdb(filename, remove_pseudoknots=True,
+                                                    annotation_tool="forgi")
+            self.assertEqual([cg.name for cg in cgs], [cg.name for cg in expected])
+            for cg, exp in zip(cgs, expected):
+                self.assertEqual(cg.defines, exp.defines)
+                self.assertEqual(cg.seq, exp.seq)
+
+    def test_timeout(self):
+        os.environ["FAKE_DSSR_SLEEP"] = "30"
+        runner = ftuar.AnnotationRunner(max_jobs=2, timeout=0.5,
+                                        annotation_tool="DSSR")
+        start = time.time()
+        with self.assertRaises(ftuar.AnnotationTimeoutError):
+            runner.load_pdbs(PDB_FILES)
+        self.assertEqual(runner.load_pdbs(PDB_FILES, skip_errors=True), [])
+        self.assertLess(time.time() - start, 20)
+
+    def test_skip_errors(self):
+        files = ["test/forgi/threedee/data/1y26.pdb", "test/forgi/data/2hoj.fa"]
+        runner = ftuar.AnnotationRunner(annotation_tool="DSSR")
+        with self.assertRaises(Exception):
+            runner.load_pdbs(files)
+        results = runner.load_pdbs(files, skip_errors=True)
+        self.assertEqual([fn for fn, _ in results], files[:1])
@@ -0,0 +1,322 @@
+from __future__ import print_function, absolute_import, division, unicode_literals
+
+import unittest
+import warnings
+import os.path
+from io import StringIO
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import numpy as np
+import numpy.testing as nptest
+import Bio.PDB as bpdb
+from Bio.PDB.MMCIF2Dict import MMCIF2Dict
+
+import forgi.graph.residue as fgr
+import forgi.threedee.model.coarse_grain as ftmc
+import forgi.threedee.utilities.atom_array as ftuaa
+import forgi.threedee.utilities.pdb as ftup
+from forgi.utilities.stuff import make_temp_directory
+
+SMALL_CIF = """data_TEST
+#
+_entry.id TEST
+_struct.title
+;A title with a
+ _fake.item and loop_ inside
+;
+loop_
+_skipped.id
+_skipped.text
+1 'not read'
+2
+;loop_
+_atom_site.id 1
+;
+loop_
+_pdbx_struct_oper_list.id
+_pdbx_struct_oper_list.name
+_pdbx_struct_oper_list.type
+1 'identity op' "it's quoted"
+2 ? .
+#
+_pdbx_struct_assembly_gen.assembly_id       1
+_pdbx_struct_assembly_gen.oper_expression   "(1,2)"
+_pdbx_struct_assembly_gen.asym_id_list
+'A,B'
+"""
+
+
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
+class TestAtomArrayReaders(unittest.TestCase):
+    def assert_chains_equal(self, chains1, chains2):
+        self.assertEqual([c.id for c in chains1], [c.id for c in chains2])
+        for c1, c2 in zip(chains1, chains2):
+            self.assertEqual([r.id for r in c1], [r.id for r in c2])
+            for r1, r2 in zip(c1, c2):
+                self.assertEqual([a.name for a in r1], [a.name for a in r2])
+                nptest.assert_allclose([a.coord for a in r1],
+                                       [a.coord for a in r2])
+
+    def test_read_pdb(self):
+        atoms, remark_465 = ftuaa.read_pdb("test/forgi/threedee/data/1y26.pdb")
+        self.assertEqual(remark_465, [])
+        self.assertEqual(atoms.chain_ids(), ["X"])
+        self.assertEqual(atoms.atom_names[0], "O5'")
+        self.assertEqual(atoms.resnames[0], "C")
+        self.assertEqual(atoms.resids[0], 13)
+        self.assertEqual(atoms.coords.shape, (len(atoms), 3))
+
+    def test_read_pdb_remark_465(self):
+        atoms, remark_465 = ftuaa.read_pdb(
+            "test/forgi/threedee/data/2X1F.pdb")
+        self.assertGreater(len(remark_465), 0)
+
+    def test_to_chains_like_biopython(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            s = bpdb.PDBParser().get_structure(
+                "temp", "test/forgi/threedee/data/1GID_native.pdb")
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1GID_native.pdb")
+        self.assert_chains_equal(list(s[0]), atoms.to_chains())
+
+    def test_read_cif_like_biopython(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            s = bpdb.MMCIFParser().get_structure(
+                "temp", "test/forgi/threedee/data/1Y26.cif")
+        atoms, cif_dict = ftuaa.read_cif("test/forgi/threedee/data/1Y26.cif")
+        self.assertIn("_atom_site.id", cif_dict)
+        self.assert_chains_equal(list(s[0]), atoms.to_chains())
+
+    def test_to_chains_selected_chains(self):
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1GID_native.pdb")
+        chains = atoms.to_chains(["B"])
+        self.assertEqual([c.id for c in chains], ["B"])
+
+    def test_clean_atoms(self):
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1GID_rosetta.pdb")
+        self.assertIn("rG", atoms.resnames)
+        atoms = ftuaa.clean_atoms(atoms)
+        self.assertNotIn("rG", atoms.resnames)
+        self.assertIn("G", atoms.resnames)
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1y26.pdb")
+        self.assertIn("HOH", atoms.resnames)
+        atoms = ftuaa.clean_atoms(atoms)
+        self.assertNotIn("HOH", atoms.resnames)
+        # Renamed HETATM residues keep their residue id
+        self.assertIn("H_ADE", atoms.hetflags)
+        self.assertNotIn("ADE", atoms.resnames)
+
+    def test_residue_index(self):
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1y26.pdb")
+        index = atoms.residue_index()
+        starts = atoms.residue_starts()
+        self.assertEqual(index[0], 0)
+        self.assertEqual(index[-1], len(starts) - 1)
+        nptest.assert_equal(index[starts], np.arange(len(starts)))
+
+
+class TestAtomArrayWriters(unittest.TestCase):
+    def get_chains(self, filename):
+        chains, mr, ir = ftup.get_all_chains("test/forgi/threedee/data/" + filename)
+        return [ftup.clean_chain(chain)[0] for chain in chains]
+
+    def biopython_output(self, chains, io):
+        model = bpdb.Model.Model(0)
+        structure = bpdb.Structure.Structure("stru")
+        for chain in chains:
+            model.add(chain)
+        structure.add(model)
+        io.set_structure(structure)
+        f = StringIO()
+        io.save(f)
+        return f.getvalue()
+
+    def test_pdb_like_pdbio(self):
+        chains = self.get_chains("1GID_native.pdb")
+        atoms = ftuaa.AtomArray.from_chains(chains)
+        self.assertEqual(ftuaa.to_pdb_string(atoms),
+                         self.biopython_output(chains, bpdb.PDBIO()))
+
+    def test_cif_like_mmcifio(self):
+        chains = self.get_chains("3DHS.cif")
+        atoms = ftuaa.AtomArray.from_chains(chains)
+        self.assertEqual(ftuaa.to_cif_string(atoms, "stru"),
+                         self.biopython_output(chains, bpdb.MMCIFIO()))
+
+    def test_write_and_read_multiple_models(self):
+        atoms, _ = ftuaa.read_pdb("test/forgi/threedee/data/1byj.pdb",
+                                  all_models=True)
+        with make_temp_directory() as d:
+            for file_type, reader in [("pdb", ftuaa.read_pdb),
+                                      ("cif", ftuaa.read_cif)]:
+                fn = os.path.join(d, "out." + file_type)
+                ftuaa.write_atoms(atoms, fn, file_type)
+                atoms2, _ = reader(fn, all_models=True)
+                nptest.assert_array_equal(atoms2.models, atoms.models)
+                nptest.assert_array_equal(atoms2.atom_names, atoms.atom_names)
+                nptest.assert_array_equal(atoms2.resids, atoms.resids)
+                nptest.assert_allclose(atoms2.coords, atoms.coords)
+
+    def test_pdb_needs_one_letter_chains(self):
+        atoms, _ = ftuaa.read_cif("test/forgi/threedee/data/1Y26.cif")
+        atoms.chains = np.full(len(atoms), "AA")
+        with self.assertRaises(ValueError):
+            ftuaa.write_atoms(atoms, StringIO(), "pdb")
+        f = StringIO()
+        ftuaa.write_atoms(atoms, f, "cif")
+        self.assertIn(" AA ", f.getvalue())
+
+
+class TestBipartiteContacts(unittest.TestCase):
+    def test_like_brute_force(self):
+        np.random.seed(1)
+        coords1 = np.random.uniform(0, 20, (50, 3))
+        coords2 = np.random.uniform(0, 20, (60, 3))
+        mask1 = np.random.uniform(size=50) < 0.3
+        mask2 = np.random.uniform(size=60) < 0.3
+        dists = np.linalg.norm(coords1[:, np.newaxis] - coords2[np.newaxis], axis=2)
+        i, j = ftuaa.bipartite_contacts(coords1, coords2, 5)
+        self.assertEqual(set(zip(i, j)), set(zip(*np.nonzero(dists <= 5))))
+        i, j = ftuaa.bipartite_contacts(coords1, coords2, 5, mask1, mask2)
+        close = (dists <= 5) & (mask1[:, np.newaxis] | mask2[np.newaxis])
+        self.assertEqual(sorted(zip(i, j)), sorted(zip(*np.nonzero(close))))
+
+    def test_empty(self):
+        i, j = ftuaa.bipartite_contacts(np.zeros((0, 3)), np.ones((4, 3)), 5)
+        self.assertEqual(len(i), 0)
+        self.assertEqual(len(j), 0)
+
+
+class TestCifCategoryReader(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(ftuaa._tokenize_cif_line("""ATOM 1 "C1'" A"""),
+                         ["ATOM", "1", "C1'", "A"])
+        self.assertEqual(ftuaa._tokenize_cif_line("a 'it's' b # comment"),
+                         ["a", "it's", "b"])
+        self.assertEqual(ftuaa._tokenize_cif_line("C1' ''"), ["C1'", ""])
+
+    def test_small_cif(self):
+        with make_temp_directory() as d:
+            fn = os.path.join(d, "test.cif")
+            with open(fn, "w") as f:
+                f.write(SMALL_CIF)
+            cif_dict = ftuaa.read_cif_categories(
+                fn, ["_pdbx_struct_oper_list", "_pdbx_struct_assembly_gen",
+                     "_struct"])
+            full_dict = MMCIF2Dict(fn)
+        self.assertEqual(cif_dict["_pdbx_struct_oper_list.name"],
+                         ["identity op", "?"])
+        self.assertEqual(cif_dict["_pdbx_struct_oper_list.type"],
+                         ["it's quoted", "."])
+        self.assertEqual(cif_dict["_pdbx_struct_assembly_gen.oper_expression"],
+                         ["(1,2)"])
+        self.assertEqual(cif_dict["_pdbx_struct_assembly_gen.asym_id_list"],
+                         ["A,B"])
+        self.assertNotIn("_entry.id", cif_dict)
+        self.assertNotIn("_skipped.id", cif_dict)
+        self.assertNotIn("_atom_site.id", cif_dict)
+        for key in cif_dict:
+            self.assertEqual(cif_dict[key], full_dict[key])
+
+    def test_like_mmcif2dict(self):
+        for filename in ["1Y26.cif", "3DHS.cif"]:
+            filename = "test/forgi/threedee/data/" + filename
+            full_dict = MMCIF2Dict(filename)
+            categories = set(key.split(".")[0] for key in full_dict
+                             if key.startswith("_"))
+            cif_dict = ftuaa.read_cif_categories(filename, categories)
+            for key in full_dict:
+                if key.startswith("_"):
+                    self.assertEqual(cif_dict[key], full_dict[key])
+
+    def test_read_cif_default_categories(self):
+        atoms, cif_dict = ftuaa.read_cif("test/forgi/threedee/data/3DHS.cif")
+        self.assertEqual(set(key.split(".")[0] for key in cif_dict),
+                         set(["_atom_site", "_pdbx_poly_seq_scheme",
+                              "_pdbx_struct_assembly_gen",
+                              "_pdbx_struct_oper_list"]))
+        self.assertEqual(len(atoms), len(cif_dict["_atom_site.id"]))
+
+
+class TestGetAllChains(unittest.TestCase):
+    def compare_to_biopython_parser(self, filename, parser):
+        chains1, mr1, ir1 = ftup.get_all_chains(filename, parser)
+        chains2, mr2, ir2 = ftup.get_all_chains(filename)
+        self.assertEqual([c.id for c in chains1], [c.id for c in chains2])
+        for c1, c2 in zip(chains1, chains2):
+            self.assertEqual([r.id for r in c1], [r.id for r in c2])
+        self.assertEqual(set(map(fgr.resid_from_biopython, ir1)),
+                         set(map(fgr.resid_from_biopython, ir2)))
+        return mr1, mr2
+
+    def test_get_all_chains_pdb(self):
+        for filename in ["1GID_native.pdb", "3siu.pdb", "1X8W.pdb"]:
+            mr1, mr2 = self.compare_to_biopython_parser(
+                "test/forgi/threedee/data/" + filename, bpdb.PDBParser())
+            self.assertEqual(mr1, mr2)
+
+    def test_get_all_chains_warns_about_models(self):
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            chains, _, _ = ftup.get_all_chains("test/forgi/threedee/data/1byj.pdb")
+        self.assertTrue(any("Multiple models" in str(warning.message) for warning in w))
+        first_model, _ = ftuaa.read_pdb("test/forgi/threedee/data/1byj.pdb")
+        self.assertEqual(sum(len(list(chain.get_atoms())) for chain in chains),
+                         len(ftuaa.clean_atoms(first_model)))
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            ftup.get_all_chains("test/forgi/threedee/data/1y26.pdb")
+        self.assertFalse(any("Multiple models" in str(warning.message) for warning in w))
+
+    def test_get_all_chains_cif(self):
+        _, mr = self.compare_to_biopython_parser(
+            "test/forgi/threedee/data/3DHS.cif", bpdb.MMCIFParser())
+        self.assertGreater(len(mr), 0)
+
+    def test_interacting_residues(self):
+        chains, mr, ir = ftup.get_all_chains("test/forgi/threedee/data/3siu.pdb")
+        self.assertGreater(len(ir), 0)
+        for res in ir:
+            self.assertIn(res.parent, chains)
+        chains, mr, ir_no_annotation = ftup.get_all_chains(
+            "test/forgi/threedee/data/3siu.pdb", no_annotation=True)
+        self.assertEqual(ir_no_annotation, set())
+        chains, mr, ir_skipped = ftup.get_all_chains(
+            "test/forgi/threedee/data/3siu.pdb", interactions=False)
+        self.assertEqual(ir_skipped, set())
+
+    def test_from_pdb_without_interactions(self):
+        cg, = ftmc.CoarseGrainRNA.from_pdb("test/forgi/threedee/data/3siu.pdb",
+                                          load_chains=["C"], annotation_tool="forgi")
+        self.assertGreater(len(cg.interacting_residues), 0)
+        cg, = ftmc.CoarseGrainRNA.from_pdb("test/forgi/threedee/data/3siu.pdb",
+                                          load_chains=["C"], annotation_tool="forgi",
+                                          interactions=False)
+        self.assertEqual(cg.interacting_residues, [])
+        self.assertEqual(cg.interacting_elements, set())
+
+    def test_interacting_residues_lazy(self):
+        chains, mr, ir = ftup.get_all_chains("test/forgi/threedee/data/3siu.pdb")
+        expected = set(fgr.resid_from_biopython(r) for r in ir)
+        chains, mr, ir = ftup.get_all_chains("test/forgi/threedee/data/3siu.pdb")
+        self.assertIsNone(ir._residues)
+        # Cleaning the chains does not change the result
+        for chain in chains:
+            ftup.clean_chain(chain)
+        self.assertEqual(set(fgr.resid_from_biopython(r) for r in ir), expected)
@@ -20,9 +20,25 @@
 import forgi.utilities.debug as fud
 
 import logging
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 log = logging.getLogger(__name__)
 
 
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
 class TestBrokenMlDeviation(unittest.TestCase):
     def setUp(self):
         self.cg = ftmc.CoarseGrainRNA.from_bg_file(
@@ -149,6 +165,20 @@ def verify_virtual_twist_angles(self, cg, s):
 
             prev_vec = vec
 
+    def test_virtual_res_twist_vectorized(self):
+        cg = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A.cg')
+        stems = list(cg.stem_iterator())
+        coords = np.array([cg.coords[s] for s in stems])
+        twists = np.array([cg.twists[s] for s in stems])
+        lengths = np.array([cg.stem_length(s) for s in stems])
+        pos = np.random.RandomState(0).uniform(0, 1, len(stems)) * (lengths - 1)
+        vecs = ftug.virtual_res_twist_vectorized(coords, twists, pos, lengths)
+        for i, s in enumerate(stems):
+            expected = ftug.virtual_res_3d_pos_core(cg.coords[s], cg.twists[s],
+                                                    pos[i], lengths[i])[1]
+            nptest.assert_allclose(vecs[i], expected, atol=1e-7)
+
     def test_first_virtual_res_basis(self):
         cg, = ftmc.CoarseGrainRNA.from_pdb('test/forgi/threedee/data/1y26.pdb')
         basis = ftug.virtual_res_basis(cg, "s0", 0)
@@ -243,6 +273,40 @@ def test_virtual_residue_atom_exact_match(self):
             [6.91170703,  2.35440312, -1.92080436]))
 
 
+class TestBasepairGeometryVectorized(unittest.TestCase):
+    def setUp(self):
+        self.cg = ftmc.CoarseGrainRNA.from_bg_file(
+            'test/forgi/threedee/data/1GID_A.cg')
+        self.positions = [nt for s in self.cg.stem_iterator()
+                          for nt in self.cg.define_residue_num_iterator(s)]
+
+    def test_get_basepair_centers(self):
+        centers, valid = ftug.get_basepair_centers(self.cg, self.positions)
+        self.assertEqual(centers.shape, (len(self.positions), 3))
+        for i, pos in enumerate(self.positions):
+            try:
+                center = ftug.get_basepair_center(self.cg, pos)
+            except KeyError:
+                self.assertFalse(valid[i])
+            else:
+                self.assertTrue(valid[i])
+                nptest.assert_allclose(centers[i], center)
+
+    def test_get_basepair_planes(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            planes = ftug.get_basepair_planes(self.cg, self.positions)
+            for i, pos in enumerate(self.positions):
+                nptest.assert_allclose(planes[i],
+                                       ftug.get_basepair_plane(self.cg, pos),
+                                       atol=1e-10)
+
+    def test_empty(self):
+        centers, valid = ftug.get_basepair_centers(self.cg, [])
+        self.assertEqual(centers.shape, (0, 3))
+        self.assertEqual(ftug.get_basepair_planes(self.cg, []).shape, (0, 3))
+
+
 class TestOrientation(unittest.TestCase):
     def setUp(self):
         pass
@@ -5,6 +5,9 @@
 import unittest
 import warnings
 
+import numpy as np
+
+import forgi.threedee.model.similarity as ftms
 import forgi.threedee.utilities.pdb as ftup
 import forgi.utilities.debug as fud
 
@@ -105,6 +108,20 @@ def test_pdb_file_rmsd(self):
         self.assertLess(r[1], 28)
         self.assertAlmostEqual(r[1], 27.700276108193787)
 
+    def test_atom_correspondence_like_residuelist_rmsd(self):
+        c1, mr, ir = ftup.get_biggest_chain('test/forgi/threedee/data/1GID_native.pdb')
+        c2, mr, ir = ftup.get_biggest_chain('test/forgi/threedee/data/1GID_rosetta.pdb')
+        l1 = [r for r in c1 if r.resname.strip() in ftup.RNA_RESIDUES]
+        l2 = list(c2)
+        for sidechains in [False, True]:
+            n, rmsd, _, _ = ftup.residuelist_rmsd(l1, l2, sidechains)
+            corr = ftup.AtomCorrespondence(l1, l2, sidechains)
+            self.assertEqual(len(corr), n)
+            self.assertEqual(corr.coords1.shape, (n, 3))
+            self.assertAlmostEqual(ftms.rmsd_batch(corr.coords1,
+                                                   corr.coords2[np.newaxis])[0],
+                                   rmsd, places=4)
+
     def test_is_protein(self):
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
@@ -124,3 +141,32 @@ def test_interchain_contacts(self):
             struct = bpdb.PDBParser().get_structure(
                 "temp", 'test/forgi/threedee/data/1MFQ.pdb')
         ftup.interchain_contacts(struct)
+
+
+class TestAnnotateFallback(unittest.TestCase):
+    def test_find_basepairs_like_is_basepair_pair(self):
+        chains, mr, ir = ftup.get_all_chains('test/forgi/threedee/data/1GID_native.pdb')
+        chains = [ftup.clean_chain(c)[0] for c in chains]
+        residues = [r for c in chains for r in c]
+        expected = []
+        for res1, res2 in sorted(bpdb.NeighborSearch(
+                [a for r in residues for a in r]).search_all(10, "R")):
+            try:
+                if ftup.is_basepair_pair(res1, res2):
+                    expected.append((res1, res2))
+            except KeyError:
+                pass
+        self.assertGreater(len(expected), 20)
+        self.assertEqual(ftup._find_basepairs(residues), expected)
+
+    def test_annotate_fallback(self):
+        chain, mr, ir = ftup.get_biggest_chain('test/forgi/threedee/data/1y26.pdb')
+        chain, _ = ftup.clean_chain(chain)
+        bpseq, seq_ids = ftup.annotate_fallback([chain])
+        lines = [line.split() for line in bpseq.splitlines()]
+        self.assertEqual(len(lines), len(seq_ids))
+        pairs = {int(i): int(j) for i, _, j in lines}
+        for i, j in pairs.items():
+            if j:
+                self.assertEqual(pairs[j], i)
+        self.assertGreater(sum(1 for j in pairs.values() if j), 20)
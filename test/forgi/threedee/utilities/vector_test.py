@@ -55,6 +55,22 @@ def test_line_segment_distance_real_world(self):
         self.assertLess(ftuv.vec_distance(
             *ftuv.line_segment_distance(a0, a1, b0, b1)), 25)
 
+    def test_line_segment_distance_vectorized(self):
+        rng = np.random.RandomState(0)
+        segments = list(rng.uniform(-10, 10, size=(200, 4, 3)))
+        # Special cases: parallel, collinear, touching, zero-length
+        segments.append(np.array([[0., 0, 1], [0, 0, 10], [0, 0, 11], [0, 0, 20]]))
+        segments.append(np.array([[0., 0, 1], [0, 0, 10], [0, 1, -5], [0, 1, -2]]))
+        segments.append(np.array([[0., 0, 1], [0, 0, 10], [0, -10, 5], [0, 10, 5]]))
+        segments.append(np.array([[0., 0, 1], [0, 0, 1], [0, -10, 12], [0, 10, 12]]))
+        segments = np.array(segments)
+        p1, p2 = ftuv.line_segment_distance_vectorized(segments[:, 0], segments[:, 1],
+                                                       segments[:, 2], segments[:, 3])
+        for i, seg in enumerate(segments):
+            s1, s2 = ftuv.line_segment_distance(*seg)
+            nptest.assert_allclose(p1[i], s1, atol=1e-10)
+            nptest.assert_allclose(p2[i], s2, atol=1e-10)
+
 
 class TestLineSegmentCollinearity(unittest.TestCase):
 
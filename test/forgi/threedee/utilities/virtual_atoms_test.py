@@ -3,6 +3,8 @@
 import unittest
 import forgi.threedee.model.coarse_grain as ftmc
 import forgi.threedee.model.similarity as ftme
+import forgi.threedee.utilities.atom_array as ftuaa
+import forgi.threedee.utilities.graph_pdb as ftug
 import forgi.threedee.utilities.pdb as ftup
 import Bio.PDB as bp
 import warnings
@@ -10,9 +12,26 @@
 import numpy as np
 import sys
 import logging
+import os
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 log = logging.getLogger(__name__)
 
 
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
+
 def realatom_vatom_rmsd(cg):
     """
     The RMSD between the real atoms and the virtual atoms of the stems.
@@ -73,3 +92,16 @@ def test_virtualatoms_close_to_pdb(self):
         #rmsd = realatom_vatom_rmsd(self.cg2)
         # print(rmsd)
         # self.assertLess(rmsd, 1.04) # 1.30
+
+    def test_virtual_atom_array(self):
+        positions = [i for stem in self.cg1.stem_iterator()
+                     for i in self.cg1.define_residue_num_iterator(stem)]
+        atoms = ftug.virtual_atom_array(self.cg1, positions)
+        self.assertEqual(len(atoms), sum(len(self.cg1.virtual_atoms(i))
+                                         for i in positions))
+        first = self.cg1.virtual_atoms(positions[0])
+        self.assertEqual(atoms.resids[0], self.cg1.seq.to_resid(positions[0]).resid[1])
+        np.testing.assert_allclose(atoms.coords[0], first[atoms.atom_names[0]])
+        pdb_lines = ftuaa.to_pdb_string(atoms).splitlines()
+        self.assertEqual(len([l for l in pdb_lines if l.startswith("ATOM")]),
+                         len(atoms))
@@ -1,5 +1,6 @@
 from __future__ import print_function, unicode_literals, division
 import unittest
+import os
 
 try:
     from io import StringIO
@@ -9,6 +10,25 @@
 import forgi.utilities.commandline_utils as fuc
 import forgi.threedee.model.coarse_grain as ftmc
 import forgi.graph.bulge_graph as fgb
+from forgi.utilities.commandline_utils import WrongFileFormat
+from forgi.utilities.stuff import make_temp_directory
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+
+# The tests neither read nor fill the user's annotation cache.
+_no_annotation_cache = patch.dict(os.environ, {"FORGI_ANNOTATION_CACHE_SIZE": "0"})
+
+
+def setUpModule():
+    _no_annotation_cache.start()
+
+
+def tearDownModule():
+    _no_annotation_cache.stop()
+
 
 class TestSniffFiletype(unittest.TestCase):
     def test_sniff_fasta(self):
@@ -148,3 +168,57 @@ def test_with_missing_refolded_pk(self):
     def test_insert_pk_into_stru(self):
         self.assertEqual(fuc.insert_pk_into_stru('((..(...)))]]', '(([[-----))]]'),
                             '(([[(...)))]]')
+
+
+class TestLoadRNAsParallel(unittest.TestCase):
+    files = ["test/forgi/threedee/data/1y26.pdb", "test/forgi/data/2hoj.fa",
+             "(((...)))", "test/forgi/threedee/data/1GID_native.pdb"]
+
+    def test_same_result_as_load_rna(self):
+        for processes in [1, 2]:
+            results = list(fuc.load_rnas_parallel(self.files, processes=processes,
+                                                  max_pending=2))
+            self.assertEqual([fn for fn, _ in results], self.files)
+            for filename, rnas in results:
+                expected = fuc.load_rna(filename, allow_many=True)
+                self.assertEqual(len(rnas), len(expected))
+                for rna, exp in zip(rnas, expected):
+                    self.assertIs(type(rna), type(exp))
+                    self.assertEqual(rna.defines, exp.defines)
+                    self.assertEqual(rna.seq, exp.seq)
+
+    def test_skip_errors(self):
+        files = ["test/forgi/threedee/data/1y26.pdb", "test/forgi/data/2hoj.fa"]
+        with self.assertRaises(WrongFileFormat):
+            list(fuc.load_rnas_parallel(files, processes=2, rna_type="pdb"))
+        results = list(fuc.load_rnas_parallel(files[::-1] + files, processes=2,
+                                              rna_type="pdb", skip_errors=True))
+        self.assertEqual([fn for fn, _ in results], [files[0], files[0]])
+
+    def test_convert_rnas_parallel(self):
+        with make_temp_directory() as d:
+            results = list(fuc.convert_rnas_parallel(self.files[:3], d, processes=2))
+            self.assertEqual([fn for fn, _ in results], self.files[:3])
+            out_files = [out for _, outs in results for out in outs]
+            self.assertEqual(sorted(out_files),
+                             sorted(os.path.join(d, fn) for fn in os.listdir(d)))
+            self.assertTrue(out_files[0].endswith(".cg"))
+            cg = ftmc.CoarseGrainRNA.from_bg_file(out_files[0])
+            self.assertEqual(cg.defines, fuc.load_rna(self.files[0], allow_many=False).defines)
+            self.assertEqual(os.path.basename(out_files[0]), "0_1y26_1y26_X.cg")
+
+    def test_convert_rnas_parallel_same_names(self):
+        with make_temp_directory() as d:
+            results = list(fuc.convert_rnas_parallel(["(((...)))", "((((....))))"],
+                                                     d, processes=1))
+            out_files = [out for _, outs in results for out in outs]
+            self.assertEqual(len(set(out_files)), 2)
+            self.assertEqual(len(os.listdir(d)), 2)
+            with self.assertRaises(FileExistsError):
+                list(fuc.convert_rnas_parallel(["(((...)))"], d, processes=1))
+
+    def test_single_process_keeps_chains(self):
+        (filename, rnas), = fuc.load_rnas_parallel(self.files[:1], processes=1)
+        expected, = fuc.load_rna(filename, allow_many=True)
+        self.assertEqual(list(rnas[0].chains), list(expected.chains))
+        self.assertGreater(len(rnas[0].chains), 0)